@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The package is run as a script, its modules are imported from its directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'universal-testing-machine'))
+# The load cells and the controller are created on the simulated machine
+os.environ.setdefault('UTM_BACKEND', 'simulation')
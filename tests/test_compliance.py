@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from controller import compliance
+
+def test_fit_recovers_the_deflection_polynomial():
+    force = np.linspace(0, 8, 500)
+    deflection = 0.01 * force + 0.002 * force ** 2
+    slack = 0.3
+    rng = np.random.default_rng(0)
+    displacement = slack + deflection + rng.normal(0, 1e-4, len(force))
+
+    my_compliance = compliance.fit(force, displacement, degree=2)
+
+    coefficients = my_compliance.get_calibration()['coefficients']
+    assert np.allclose(coefficients, [0.01, 0.002], atol=5e-4)
+    assert my_compliance.get_calibration()['max_force']['value'] == pytest.approx(8)
+    # The slack is not part of the deflection
+    assert my_compliance.get_deflection(0) == pytest.approx(0)
+
+def test_fit_discards_the_readings_below_the_minimum_force():
+    force = np.linspace(0, 8, 500)
+    displacement = np.where(force < 1, 0.5 * force, 0.5 + 0.02 * (force - 1))
+
+    my_compliance = compliance.fit(force, displacement, degree=1, min_force=1)
+
+    assert my_compliance.get_calibration()['coefficients'] == pytest.approx([0.02])
+
+def test_fit_needs_enough_readings():
+    with pytest.raises(ValueError):
+        compliance.fit(np.array([0, 1, 2]), np.array([0, 0.1, 0.2]), degree=2, min_force=1)
+
+def test_correct_subtracts_the_deflection():
+    my_compliance = compliance.Compliance({'coefficients': [0.01, 0.002]})
+    force = np.array([0, 5, 10])
+    displacement = np.array([1, 2, 3])
+
+    corrected = my_compliance.correct(displacement, force)
+
+    assert np.allclose(corrected, displacement - (0.01 * force + 0.002 * force ** 2))
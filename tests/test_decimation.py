@@ -0,0 +1,35 @@
+import numpy as np
+from utility.decimation import LogTimeDecimator
+
+def test_early_samples_are_kept_at_full_resolution():
+    storage = LogTimeDecimator(ratio=0.001)
+    timings = np.arange(100) / 80
+    storage.add(timings, np.ones(100))
+
+    data = storage.get_data()
+    assert len(data) == 100
+    assert np.allclose(data['t'], timings)
+
+def test_buckets_grow_with_the_logarithm_of_the_duration():
+    timings = np.arange(3600 * 80) / 80
+    storage = LogTimeDecimator(ratio=0.01)
+    storage.add(timings, np.sin(timings))
+
+    data = storage.get_data()
+    assert data['n'].sum() == len(timings)
+    assert len(data) < 2000
+    assert np.all(np.diff(data['t']) > 0)
+    assert np.all(data['F_min'] <= data['F'])
+    assert np.all(data['F'] <= data['F_max'])
+
+def test_change_restarts_full_resolution():
+    timings = np.arange(2000) / 80
+    values = np.where(timings < 20, 0, 10)
+    storage = LogTimeDecimator(ratio=0.1, change_threshold=1)
+    storage.add(timings, values)
+
+    data = storage.get_data()
+    # The step is not averaged into a bucket, and it is followed by single samples
+    assert np.all((data['F'] == 0) | (data['F'] == 10))
+    after_step = data[data['t'] >= 20]
+    assert np.all(after_step['n'].iloc[:10] == 1)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from loadcell import loadcell, group, timebase
+
+CALIBRATION = {
+    'loadcell_limit': {'value': 10, 'unit': 'N'},
+    'slope': 0.002380952380952381,
+    'y_intercept': -357.14285714285717,
+    'calibrating_mass': {'value': 361.606, 'unit': 'g'},
+    'date': '2026-10-19'
+}
+
+def _create_group():
+    return group.LoadCellGroup([loadcell.LoadCell(dat_pin=5, clk_pin=6, name='0'), loadcell.LoadCell(dat_pin=13, clk_pin=19, name='1')])
+
+def test_single_calibration_is_set_to_each_load_cell():
+    my_group = _create_group()
+    my_group.set_calibration(CALIBRATION)
+
+    assert my_group.is_calibrated
+    assert my_group.get_calibration()['loadcell_limit']['value'] == 20
+
+    # The calibration of the group is set back as it is
+    my_group.set_calibration(my_group.get_calibration())
+    assert my_group.is_calibrated
+
+def test_calibration_of_the_wrong_number_of_load_cells_is_rejected():
+    my_group = _create_group()
+
+    with pytest.raises(ValueError):
+        my_group.set_calibration({'loadcells': [CALIBRATION]})
+
+def test_forces_are_interpolated_in_the_corrected_time_base():
+    my_loadcell = loadcell.LoadCell(dat_pin=13, clk_pin=19, name='1')
+    my_loadcell.set_calibration(CALIBRATION)
+    rng = np.random.default_rng(0)
+    conversions = np.arange(2000)
+    readings = 150000 + 400 * conversions
+    timings = 100 + conversions / 80 + rng.uniform(0, 0.01, len(conversions))
+    # As set by the acquisition thread
+    my_loadcell._readings = list(readings)
+    my_loadcell._timings = list(timings)
+
+    clock_fit = timebase.ClockFit(rate=80)
+    clock_fit.add(timings)
+    corrected_timings = clock_fit.correct(timings)
+
+    forces = my_loadcell.get_forces_at(corrected_timings[1000:1010])
+
+    assert np.allclose(forces, my_loadcell._get_forces(readings[1000:1010].astype(float)))
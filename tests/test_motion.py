@@ -0,0 +1,37 @@
+import numpy as np
+from controller.motion import MotionLog
+
+def test_position_is_constant_before_any_motion():
+    motion_log = MotionLog(position=5)
+
+    assert np.allclose(motion_log.position_at([0, 1, 2]), 5)
+
+def test_position_is_interpolated_along_the_segments():
+    motion_log = MotionLog(position=0)
+    motion_log.start(10, direction=1, speed=2, step_frequency=100)
+    motion_log.stop(15)
+    # Pause, then back down
+    motion_log.start(20, direction=-1, speed=1, step_frequency=50)
+    motion_log.stop(24)
+
+    positions = motion_log.position_at([0, 10, 12.5, 15, 18, 20, 22, 24, 30])
+
+    assert np.allclose(positions, [0, 0, 5, 10, 10, 10, 8, 6, 6])
+
+def test_position_is_extrapolated_within_the_running_motion():
+    motion_log = MotionLog(position=1)
+    motion_log.start(0, direction=1, speed=0.5, step_frequency=100)
+
+    assert np.allclose(motion_log.position_at([0, 2, 4]), [1, 2, 3])
+    assert np.allclose(motion_log.position_at(4), 3)
+
+def test_segments_are_logged_with_their_steps():
+    motion_log = MotionLog()
+    motion_log.start(0, direction=1, speed=1, step_frequency=200)
+    motion_log.stop(1.5)
+
+    segments = motion_log.get_segments()
+
+    assert len(segments) == 1
+    assert segments[0]['steps'] == 300
+    assert motion_log.get_segments(since=2) == []
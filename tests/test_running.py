@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from loadcell.running import RunningStatistics
+
+def _add(statistics:RunningStatistics, values, rate:float = 80):
+    for idx, value in enumerate(values):
+        statistics.add(value, idx / rate)
+
+    return
+
+def test_statistics_match_the_values():
+    values = np.random.default_rng(0).normal(100, 5, 1000)
+    statistics = RunningStatistics()
+    _add(statistics, values)
+
+    result = statistics.get()
+    assert result['count'] == 1000
+    assert result['mean'] == pytest.approx(np.mean(values))
+    assert result['variance'] == pytest.approx(np.var(values, ddof=1))
+    assert result['min'] == np.min(values)
+    assert result['max'] == np.max(values)
+
+def test_weighted_mean_follows_the_latest_values():
+    statistics = RunningStatistics(time_constant=0.1)
+    _add(statistics, [0] * 400 + [10] * 400)
+
+    assert statistics.get()['ewm'] == pytest.approx(10, abs=1e-6)
+    assert statistics.get()['mean'] == pytest.approx(5)
+
+def _get_noise(n_values:int):
+    # Noise of a constant force, with no outlier
+    return [100 + (-1) ** idx for idx in range(n_values)]
+
+def test_single_outlier_is_rejected():
+    values = _get_noise(100)
+    statistics = RunningStatistics(rejection_threshold=6, confirming_values=2)
+    _add(statistics, values[:50] + [1000] + values[50:])
+
+    result = statistics.get()
+    assert result['rejected'] == 1
+    assert result['count'] == 100
+    assert result['max'] < 1000
+
+def test_confirmed_step_is_added_from_its_first_value():
+    values = _get_noise(100)
+    step = [200, 201, 199, 200]
+    statistics = RunningStatistics(rejection_threshold=6, confirming_values=2)
+    _add(statistics, values + step)
+
+    result = statistics.get()
+    assert result['rejected'] == 0
+    assert result['count'] == len(values) + len(step)
+    assert result['mean'] == pytest.approx(np.mean(values + step))
+    assert result['max'] == 201
+
+def test_invalid_parameters_are_rejected():
+    with pytest.raises(ValueError):
+        RunningStatistics(time_constant=0)
+    with pytest.raises(ValueError):
+        RunningStatistics(rejection_threshold=-1)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from loadcell import timebase
+
+def _simulate(seed:int, n_readings:int = 4000, rate:float = 80.3, dropped_ratio:float = 0.05, max_delay:float = 0.01):
+    '''
+    Return the timestamps of the readings of an ADC at the given rate,
+    with some conversions dropped and each reading late by up to max_delay.
+    '''
+    rng = np.random.default_rng(seed)
+    conversions = np.arange(int(n_readings * 1.2))
+    conversions = conversions[rng.random(len(conversions)) >= dropped_ratio][:n_readings]
+    timings = 3.7 + conversions / rate + rng.uniform(0, max_delay, len(conversions))
+
+    return np.sort(timings), conversions
+
+@pytest.mark.parametrize('seed', range(10))
+def test_live_fit_converges_with_dropouts_and_jitter(seed:int):
+    timings, _ = _simulate(seed)
+    clock_fit = timebase.ClockFit(rate=80)
+    # As the batches of the test loops
+    for start in range(0, len(timings), 15):
+        clock_fit.add(timings[start:start + 15])
+
+    assert clock_fit.is_locked()
+    assert clock_fit.get_rate() == pytest.approx(80.3, abs=0.05)
+    assert clock_fit.get_n_seeds() == 1
+
+@pytest.mark.parametrize('seed', range(10))
+def test_fit_skips_the_dropped_conversions(seed:int):
+    timings, conversions = _simulate(seed)
+
+    indexes, corrected_timings, clock_fit = timebase.fit(timings, rate=80)
+
+    assert clock_fit.is_locked()
+    assert clock_fit.get_rate() == pytest.approx(80.3, abs=0.05)
+    assert np.array_equal(np.diff(indexes), np.diff(conversions))
+    assert np.all(np.diff(corrected_timings) > 0)
+
+def test_fit_is_seeded_again_once_lost():
+    # The ADC restarts at a different phase and rate
+    first_timings, _ = _simulate(0, n_readings=2000)
+    second_timings, _ = _simulate(1, n_readings=2000, rate=80.5)
+    timings = np.concatenate([first_timings, second_timings - second_timings[0] + first_timings[-1] + 0.0071])
+
+    clock_fit = timebase.ClockFit(rate=80)
+    for start in range(0, len(timings), 15):
+        clock_fit.add(timings[start:start + 15])
+
+    assert clock_fit.get_n_seeds() == 2
+    assert clock_fit.is_locked()
+    assert clock_fit.get_rate() == pytest.approx(80.5, abs=0.05)
+
+    _, corrected_timings, _ = timebase.fit(timings, rate=80)
+    assert len(corrected_timings) == len(timings)
+    assert np.all(np.diff(corrected_timings) > 0)
+    # The readings before the restart are corrected by a fit of their own
+    assert np.max(np.abs(corrected_timings[:1500] - first_timings[:1500])) < 0.011
+    assert not np.allclose(corrected_timings[:1500], first_timings[:1500])
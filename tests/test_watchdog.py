@@ -0,0 +1,63 @@
+import constants
+from loadcell import watchdog
+
+CALIBRATION = {
+    'slope': 0.002380952380952381,
+    'y_intercept': -357.14285714285717,
+    'loadcell_limit': {'value': 10, 'unit': 'N'}
+}
+
+def _get_reading(force:float):
+    return round(((force / constants.STANDARD_GRAVITY) * 1000 - CALIBRATION['y_intercept']) / CALIBRATION['slope'])
+
+def _create_watchdog():
+    reasons = []
+    my_watchdog = watchdog.Watchdog(CALIBRATION, force_offset=0, on_trip=reasons.append)
+
+    return my_watchdog, reasons
+
+def test_overload_trips_once_confirmed():
+    my_watchdog, reasons = _create_watchdog()
+    my_watchdog.check(_get_reading(11))
+    assert reasons == []
+    my_watchdog.check(_get_reading(11))
+    assert reasons == [watchdog.OVERLOAD]
+
+def test_single_corrupted_reading_does_not_trip():
+    my_watchdog, reasons = _create_watchdog()
+    for force in [1, 2, 3, 20, 3, 0, 3, 3]:
+        my_watchdog.check(_get_reading(force))
+    assert reasons == []
+    # The corrupted reading is not taken as the peak
+    assert abs(my_watchdog.get_peak_force() - 3) < 0.01
+
+def test_failure_trips_on_a_drop_from_the_peak():
+    my_watchdog, reasons = _create_watchdog()
+    for force in [1, 2, 3, 4, 4, 1, 1]:
+        my_watchdog.check(_get_reading(force))
+    assert reasons == [watchdog.FAILURE]
+
+def test_disarmed_failure_detection_ignores_planned_unloading():
+    my_watchdog, reasons = _create_watchdog()
+    for force in [1, 2, 3, 4, 4]:
+        my_watchdog.check(_get_reading(force))
+    my_watchdog.set_failure_armed(False)
+    for force in [3, 2, 1, 1]:
+        my_watchdog.check(_get_reading(force))
+    assert reasons == []
+
+    # Once armed again, the drop is measured from the new peak
+    my_watchdog.set_failure_armed(True)
+    for force in [1, 2, 2]:
+        my_watchdog.check(_get_reading(force))
+    assert reasons == []
+    for force in [0.5, 0.5]:
+        my_watchdog.check(_get_reading(force))
+    assert reasons == [watchdog.FAILURE]
+
+def test_disarmed_failure_detection_still_detects_overloads():
+    my_watchdog, reasons = _create_watchdog()
+    my_watchdog.set_failure_armed(False)
+    my_watchdog.check(_get_reading(12))
+    my_watchdog.check(_get_reading(12))
+    assert reasons == [watchdog.OVERLOAD]
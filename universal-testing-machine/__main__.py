@@ -1,12 +1,126 @@
-from InquirerPy import inquirer, validator
+import os
+import sys
+import argparse
+
+# Allow the package to be run with python -m as well
+if os.path.dirname(os.path.abspath(__file__)) not in sys.path:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
 from rich.console import Console
 console = Console()
+import constants
+from instrumentation import instrumentation
+
+parser = argparse.ArgumentParser(prog='universal-testing-machine')
+subparsers = parser.add_subparsers(dest='command')
+run_parser = subparsers.add_parser('run', help='run a test without user interaction')
+run_parser.add_argument('spec', help='JSON file with the test parameters, as saved in test_parameters.json')
+run_parser.add_argument('--position', type=float, default=None, help='crossbar initial position [mm], by default taken from the initial gauge length of the spec')
+run_parser.add_argument('--replay', default=None, help='CSV file of a recorded test whose readings replace the load cell ones')
+run_parser.add_argument('--replay-speed', type=float, default=1, help='replay speed with respect to the recording, 0 for as fast as possible')
+run_parser.add_argument('--show-ui', action='store_true', help='keep the live plot and table enabled')
+run_parser.add_argument('--capture', action='store_true', help='save full-rate data around failures and stop-button presses, decimating the main record')
+analyze_parser = subparsers.add_parser('analyze', help='compute the mechanical properties of the saved tests')
+analyze_parser.add_argument('output_dir', nargs='?', default=os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output')), help='directory holding the test directories, by default the output directory')
+analyze_parser.add_argument('--workers', type=int, default=None, help='number of worker processes, by default one per core')
+analyze_parser.add_argument('--no-cache', action='store_true', help='analyze every test again, ignoring the cached results')
+analyze_parser.add_argument('--summary', default=None, help='CSV file to write the summary to, by default summary.csv in the output directory')
+catalogue_parser = subparsers.add_parser('catalogue', help='query the catalogue of the saved tests')
+catalogue_parser.add_argument('output_dir', nargs='?', default=os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output')), help='directory holding the test directories, by default the output directory')
+catalogue_parser.add_argument('--rebuild', action='store_true', help='rebuild the catalogue from the test and calibration directories')
+catalogue_parser.add_argument('--type', default=None, choices=['monotonic', 'cyclic', 'static'], help='test type')
+catalogue_parser.add_argument('--loadcell', type=float, default=None, help='load cell limit [N]')
+catalogue_parser.add_argument('--since', default=None, help='earliest test date, as YYYY-MM-DD')
+catalogue_parser.add_argument('--until', default=None, help='latest test date, as YYYY-MM-DD')
+catalogue_parser.add_argument('--min-cross-section', type=float, default=None, help='minimum cross section [mm²]')
+catalogue_parser.add_argument('--max-cross-section', type=float, default=None, help='maximum cross section [mm²]')
+catalogue_parser.add_argument('--where', default=None, help='additional SQL condition on the columns of the tests table')
+catalogue_parser.add_argument('--calibrations', action='store_true', help='list the load cell calibrations instead of the tests')
+parser.add_argument('--instrument', action='store_true', help='collect hot-path timings into instrumentation.json in the output directory')
+parser.add_argument('--trace', action='store_true', help='also export the thread activity as Chrome trace events into trace.json in the output directory')
+args = parser.parse_args()
+
+if args.instrument or args.trace or constants.IS_INSTRUMENTATION_ENABLED:
+    instrumentation.enable(is_tracing=args.trace)
+
+# The analysis needs no devices, nor their backend: it can run on any computer
+if args.command == 'analyze':
+    from analysis import analysis
+
+    if not os.path.isdir(args.output_dir):
+        console.print('[#e5c07b]>[/#e5c07b]', 'No output directory found at {}'.format(args.output_dir), '[red]:cross_mark:[/red]')
+        sys.exit(1)
+
+    with console.status('Analyzing tests...'):
+        summary = analysis.analyze(args.output_dir, workers=args.workers, is_cached=not args.no_cache)
+
+    summary_path = args.summary if args.summary is not None else os.path.join(args.output_dir, 'summary.csv')
+    summary.to_csv(summary_path, index=False)
+
+    from catalogue import catalogue
+    connection = catalogue.connect(args.output_dir)
+    catalogue.add_results(connection, summary.to_dict('records'))
+    connection.close()
+
+    console.print(analysis.get_summary_table(summary))
+    console.print('[#e5c07b]>[/#e5c07b]', 'Analyzing {} tests... ({})'.format(len(summary), summary_path), '[green]:heavy_check_mark:[/green]')
+    sys.exit(0)
+
+if args.command == 'catalogue':
+    import time
+    from catalogue import catalogue
+
+    if not os.path.isdir(args.output_dir):
+        console.print('[#e5c07b]>[/#e5c07b]', 'No output directory found at {}'.format(args.output_dir), '[red]:cross_mark:[/red]')
+        sys.exit(1)
+
+    if args.rebuild or not os.path.isfile(os.path.join(args.output_dir, catalogue.CATALOGUE_FILENAME)):
+        with console.status('Rebuilding the catalogue...'):
+            calibration_dir = os.path.join(os.path.dirname(os.path.normpath(args.output_dir)), '.calibration')
+            connection = catalogue.rebuild(args.output_dir, calibration_dir)
+        console.print('[#e5c07b]>[/#e5c07b]', 'Rebuilding the catalogue...', '[green]:heavy_check_mark:[/green]')
+    else:
+        connection = catalogue.connect(args.output_dir)
+
+    if args.calibrations:
+        for calibration in connection.execute('SELECT * FROM calibrations ORDER BY date DESC'):
+            console.print('[#e5c07b]>[/#e5c07b]', '{}: {:g} N load cell, slope {:.6g}, y-intercept {:.6g}'.format(calibration['date'], calibration['loadcell_limit'], calibration['slope'], calibration['y_intercept']))
+        sys.exit(0)
+
+    started_at = time.perf_counter()
+    rows = catalogue.query_tests(
+        connection,
+        test_type=args.type,
+        loadcell_limit=args.loadcell,
+        since=args.since,
+        until=args.until,
+        min_cross_section=args.min_cross_section,
+        max_cross_section=args.max_cross_section,
+        where=args.where
+    )
+    elapsed_time = time.perf_counter() - started_at
+    connection.close()
+
+    console.print(catalogue.get_tests_table(rows))
+    console.print('[#e5c07b]>[/#e5c07b]', 'Found {} tests... ({:.1f} ms)'.format(len(rows), elapsed_time * 1000), '[green]:heavy_check_mark:[/green]')
+    sys.exit(0)
+
 from controller import controller
-from loadcell import loadcell
+from loadcell import loadcell, group
 import helpers
 
-my_controller = controller.LinearController(
-    motor=controller.stepper.StepperMotor(
+# Devices are initialized concurrently
+loadcell_devices = {}
+for idx, (dat_pin, clk_pin) in enumerate(constants.LOADCELL_PINS):
+    loadcell_name = 'load cell' if len(constants.LOADCELL_PINS) == 1 else 'load cell {}'.format(idx)
+    loadcell_devices[loadcell_name] = lambda dat_pin=dat_pin, clk_pin=clk_pin, idx=idx: loadcell.LoadCell(
+        dat_pin=dat_pin,
+        clk_pin=clk_pin,
+        name=None if len(constants.LOADCELL_PINS) == 1 else str(idx)
+    )
+
+devices = helpers.initialize_devices({
+    'stepper motor': lambda: controller.stepper.StepperMotor(
         total_steps=200,
         dir_pin=20, step_pin=13,
         en_pin=23,
@@ -14,15 +128,47 @@ my_controller = controller.LinearController(
         mode=controller.stepper.ONE_THIRTYTWO,
         gear_ratio=5.18
     ),
+    **loadcell_devices
+})
+
+my_controller = controller.LinearController(
+    motor=devices['stepper motor'],
     screw_pitch=5,
     up_endstop_pin=25,
     down_endstop_pin=8
 )
 
-my_loadcell = loadcell.LoadCell(
-    dat_pin=5,
-    clk_pin=6
-)
+if len(loadcell_devices) == 1:
+    my_loadcell = devices['load cell']
+else:
+    my_loadcell = group.LoadCellGroup([devices[loadcell_name] for loadcell_name in loadcell_devices])
+my_loadcell.set_channels(constants.HX711_CHANNELS, settling_conversions=constants.HX711_SETTLING_CONVERSIONS)
+
+# Auxiliary sensors are joined onto the readings of the load cell
+from backend import backend
+from sensors import sensors
+if backend.encoder is not None:
+    encoder_stream = sensors.SensorStream('encoder', unit='mm')
+    sensors.SensorPoller(encoder_stream, backend.encoder.read, rate=backend.ENCODER_RATE).start()
+    sensor_hub = sensors.SensorHub()
+    sensor_hub.add_stream(encoder_stream, method=sensors.INTERPOLATE, tolerance=2 / backend.ENCODER_RATE)
+    my_loadcell.set_sensor_hub(sensor_hub)
+
+if args.command == 'run':
+    output_dir = helpers.start_headless_test(
+        my_controller,
+        my_loadcell,
+        spec_path=args.spec,
+        stop_button_pin=22,
+        adjustment_position=args.position,
+        replay_path=args.replay,
+        replay_speed=args.replay_speed,
+        is_headless=not args.show_ui,
+        is_capturing=args.capture or constants.IS_CAPTURE_ENABLED
+    )
+    sys.exit(0 if output_dir is not None else 1)
+
+from InquirerPy import inquirer, validator
 
 console.rule('[bold red]UNIVERSAL TESTING MACHINE')
 
@@ -33,6 +179,7 @@ while result is not None:
         message='Select a menu voice:',
         choices=[
                 {'name': 'Load Cell Calibration', 'value': 'loadcell_calibration'},
+                {'name': 'Machine Compliance Calibration', 'value': 'compliance_calibration'},
                 {'name': 'Manual Control', 'value': 'manual'},
                 {'name': 'Monotonic Test', 'value': 'monotonic'},
                 {'name': 'Cyclic Test', 'value': 'cyclic'},
@@ -47,6 +194,12 @@ while result is not None:
         helpers.check_existing_calibration(calibration_dir, my_loadcell)
         if my_loadcell.is_calibrated is not True:
             helpers.calibrate_loadcell(my_loadcell, calibration_dir)
+    elif result == 'compliance_calibration':
+        calibration_dir = helpers.create_calibration_dir()
+        helpers.check_existing_calibration(calibration_dir, my_loadcell)
+        if my_loadcell.is_calibrated is not True:
+            helpers.calibrate_loadcell(my_loadcell, calibration_dir)
+        helpers.calibrate_compliance(my_controller, my_loadcell, calibration_dir)
     elif result == 'manual':
         helpers.start_manual_mode(
             my_controller,
@@ -71,6 +224,7 @@ while result is not None:
             helpers.check_existing_calibration(calibration_dir, my_loadcell)
             if my_loadcell.is_calibrated is not True:
                 helpers.calibrate_loadcell(my_loadcell, calibration_dir)
+            helpers.load_existing_compliance(calibration_dir, my_controller)
 
             helpers.start_manual_mode(
                 my_controller,
@@ -90,7 +244,9 @@ while result is not None:
                 my_loadcell,
                 test_parameters,
                 output_dir=output_dir,
-                stop_button_pin=22
+                stop_button_pin=22,
+                is_plot_detached=constants.IS_PLOT_DETACHED,
+                is_capturing=constants.IS_CAPTURE_ENABLED
             )
     elif result == 'static':
         calibration_dir = helpers.create_calibration_dir()
@@ -116,7 +272,9 @@ while result is not None:
                 my_loadcell,
                 test_parameters,
                 output_dir=output_dir,
-                stop_button_pin=22
+                stop_button_pin=22,
+                is_plot_detached=constants.IS_PLOT_DETACHED,
+                is_capturing=constants.IS_CAPTURE_ENABLED
             )
     
     console.rule()
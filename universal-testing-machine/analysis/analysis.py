@@ -0,0 +1,299 @@
+'''
+Post-processing of the tests saved in the output directory.
+
+Each test directory holds its test_parameters.json and, for monotonic
+tests, the <test_id>.csv data file, from which the mechanical properties
+of the specimen are computed. Tests are analyzed in parallel on a
+process pool and summarized in a single table.
+
+Results are cached in the output directory, keyed by a hash of the
+parameters, the data and ANALYSIS_VERSION, so that only new or modified
+tests are analyzed again. As long as the size and modification time of
+their files are unchanged, tests are not even hashed.
+'''
+import os
+import json
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+PARAMETERS_FILENAME = 'test_parameters.json'
+CACHE_FILENAME = '.analysis_cache.json'
+
+# To be increased whenever the results of the analysis change
+ANALYSIS_VERSION = 1
+
+# Elastic region for the modulus fit, as ratios of the UTS
+ELASTIC_REGION = (0.1, 0.4)
+# Strain offset of the yield point (0.2% offset method)
+YIELD_OFFSET = 0.002
+# Stress below which, after the UTS, the specimen is considered broken, as a ratio of the UTS
+BREAK_RATIO = 0.1
+
+def find_tests(output_dir:str):
+    '''
+    Return the directories of the tests in the given output
+    directory, i.e. the ones holding a test_parameters.json.
+    '''
+    test_dirs = []
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            if entry.is_dir() and os.path.isfile(os.path.join(entry.path, PARAMETERS_FILENAME)):
+                test_dirs.append(entry.path)
+
+    return sorted(test_dirs)
+
+def get_data_path(test_dir:str, test_parameters:dict):
+    return os.path.join(test_dir, test_parameters['test_id'] + '.csv')
+
+def compute_properties(strain:np.ndarray, stress:np.ndarray, force:np.ndarray, displacement:np.ndarray):
+    '''
+    Compute the mechanical properties from a monotonic tensile curve.
+
+    Parameters
+    ----------
+    strain : ndarray
+        The strain, given in %.
+    stress : ndarray
+        The (filtered) stress, given in MPa.
+    force : ndarray
+        The force, given in N.
+    displacement : ndarray
+        The crossbar displacement, given in mm.
+
+    Returns
+    -------
+    properties : dict
+        The elastic modulus (MPa), the yield strength (MPa) and strain
+        (%), the UTS (MPa), the elongation at break (%) and the energy
+        absorbed until break (J). Properties that cannot be computed
+        are NaN.
+    '''
+    properties = dict.fromkeys(['modulus', 'yield_strength', 'yield_strain', 'uts', 'elongation_at_break', 'energy'], np.nan)
+    if len(stress) < 2:
+        return properties
+
+    uts_idx = int(np.argmax(stress))
+    uts = stress[uts_idx]
+    properties['uts'] = uts
+    if uts <= 0:
+        return properties
+
+    # Break: first point after the UTS where the stress falls below a fraction of it
+    is_broken = stress[uts_idx:] < BREAK_RATIO * uts
+    break_idx = uts_idx + int(np.argmax(is_broken)) - 1 if is_broken.any() else len(stress) - 1
+    properties['elongation_at_break'] = strain[break_idx]
+    # Trapezoidal rule, as np.trapz is not available on every NumPy version
+    f = force[:break_idx + 1]
+    properties['energy'] = np.sum((f[1:] + f[:-1]) * np.diff(displacement[:break_idx + 1])) / 2 / 1000 # N·mm to J
+
+    # Modulus: least squares line over the elastic region, before the UTS
+    eps = strain[:uts_idx + 1] / 100
+    sigma = stress[:uts_idx + 1]
+    is_elastic = (sigma >= ELASTIC_REGION[0] * uts) & (sigma <= ELASTIC_REGION[1] * uts)
+    if np.count_nonzero(is_elastic) < 2 or np.ptp(eps[is_elastic]) == 0:
+        return properties
+    modulus, intercept = np.polyfit(eps[is_elastic], sigma[is_elastic], 1)
+    properties['modulus'] = modulus
+
+    # Yield: first point past the elastic region below the offset line
+    first_elastic_idx = int(np.argmax(is_elastic))
+    is_yielded = sigma[first_elastic_idx:] < modulus * (eps[first_elastic_idx:] - YIELD_OFFSET) + intercept
+    if is_yielded.any():
+        yield_idx = first_elastic_idx + int(np.argmax(is_yielded))
+        properties['yield_strength'] = sigma[yield_idx]
+        properties['yield_strain'] = strain[yield_idx]
+
+    return properties
+
+def analyze_test(test_dir:str):
+    '''
+    Analyze a single test directory.
+
+    Returns
+    -------
+    result : dict
+        The test id, type and directory, the analysis status and,
+        for monotonic tests, the mechanical properties.
+    '''
+    import pandas as pd
+
+    with open(os.path.join(test_dir, PARAMETERS_FILENAME)) as f:
+        test_parameters = json.load(f)
+
+    result = {
+        'test_id': test_parameters.get('test_id'),
+        'test_type': test_parameters.get('test_type'),
+        'date': test_parameters.get('date'),
+        'test_dir': os.path.basename(test_dir)
+    }
+
+    if test_parameters.get('test_type') != 'monotonic':
+        result['status'] = 'skipped'
+        return result
+
+    data_path = get_data_path(test_dir, test_parameters)
+    if not os.path.isfile(data_path):
+        result['status'] = 'missing data'
+        return result
+
+    try:
+        data = pd.read_csv(data_path, usecols=['strain', 'stress_med20', 'F_med20', 'displacement'])
+    except ValueError as error:
+        result['status'] = 'invalid data: {}'.format(error)
+        return result
+
+    data = data.dropna()
+    result.update(compute_properties(
+        strain=data['strain'].to_numpy(dtype=float),
+        stress=data['stress_med20'].to_numpy(dtype=float),
+        force=data['F_med20'].to_numpy(dtype=float),
+        displacement=data['displacement'].to_numpy(dtype=float)
+    ))
+    result['status'] = 'ok'
+
+    return result
+
+def get_test_key(test_dir:str):
+    '''
+    Return the hash of the parameters and the data of a test,
+    together with the analysis version, and the data file path.
+    '''
+    with open(os.path.join(test_dir, PARAMETERS_FILENAME), 'rb') as f:
+        parameters = f.read()
+    data_path = get_data_path(test_dir, json.loads(parameters))
+
+    key = hashlib.sha256()
+    key.update(str(ANALYSIS_VERSION).encode())
+    key.update(parameters)
+    if os.path.isfile(data_path):
+        with open(data_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                key.update(chunk)
+
+    return key.hexdigest(), data_path
+
+def _get_signature(test_dir:str, data_filename:str):
+    '''
+    Return the size and modification time of the test files,
+    or None if any of them is missing.
+    '''
+    signature = []
+    for filename in [PARAMETERS_FILENAME, data_filename]:
+        try:
+            stat = os.stat(os.path.join(test_dir, filename))
+        except (OSError, TypeError):
+            return None
+        signature.extend([stat.st_size, stat.st_mtime_ns])
+
+    return signature
+
+def _analyze_test_if_changed(test_dir:str, cached_key:str = None):
+    key, data_path = get_test_key(test_dir)
+    result = analyze_test(test_dir) if key != cached_key else None
+
+    return key, os.path.basename(data_path), result
+
+def _load_cache(output_dir:str):
+    try:
+        with open(os.path.join(output_dir, CACHE_FILENAME)) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if cache.get('version') != ANALYSIS_VERSION:
+        return {}
+
+    return cache['entries']
+
+def _save_cache(output_dir:str, entries:dict):
+    path = os.path.join(output_dir, CACHE_FILENAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'version': ANALYSIS_VERSION, 'entries': entries}, f)
+    os.replace(path + '.tmp', path)
+
+    return
+
+def analyze(output_dir:str, workers:int = None, is_cached:bool = True):
+    '''
+    Analyze all the tests in the given output directory on a pool of
+    processes, one per core by default, and return the summary table.
+
+    Parameters
+    ----------
+    output_dir : str
+        The directory holding the test directories.
+    workers : int, default=None
+        The number of worker processes. If None, one per core.
+    is_cached : bool, default=True
+        If True, the results of the tests unchanged since the
+        last analysis are taken from the cache.
+    '''
+    import pandas as pd
+
+    test_dirs = find_tests(output_dir)
+    cache = _load_cache(output_dir) if is_cached else {}
+
+    entries = {}
+    changed_test_dirs = []
+    for test_dir in test_dirs:
+        name = os.path.basename(test_dir)
+        entry = cache.get(name)
+        if entry is not None and entry['signature'] is not None and _get_signature(test_dir, entry['data_filename']) == entry['signature']:
+            entries[name] = entry
+        else:
+            changed_test_dirs.append(test_dir)
+
+    # Changed files are hashed by the workers too, in case their content is the same
+    cached_keys = [cache[os.path.basename(test_dir)]['key'] if os.path.basename(test_dir) in cache else None for test_dir in changed_test_dirs]
+    if workers == 1 or len(changed_test_dirs) <= 1:
+        keys_and_results = [_analyze_test_if_changed(test_dir, cached_key) for test_dir, cached_key in zip(changed_test_dirs, cached_keys)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(changed_test_dirs) // (4 * (workers or os.cpu_count() or 1)))
+            keys_and_results = list(executor.map(_analyze_test_if_changed, changed_test_dirs, cached_keys, chunksize=chunksize))
+
+    for test_dir, (key, data_filename, result) in zip(changed_test_dirs, keys_and_results):
+        name = os.path.basename(test_dir)
+        if result is None:
+            result = cache[name]['result']
+        entries[name] = {
+            'key': key,
+            'data_filename': data_filename,
+            'signature': _get_signature(test_dir, data_filename),
+            'result': result
+        }
+
+    if is_cached:
+        _save_cache(output_dir, entries)
+
+    results = [entries[os.path.basename(test_dir)]['result'] for test_dir in test_dirs]
+
+    return pd.DataFrame(results, columns=[
+        'test_id', 'test_type', 'date', 'test_dir', 'status',
+        'modulus', 'yield_strength', 'yield_strain', 'uts', 'elongation_at_break', 'energy'
+    ])
+
+def get_summary_table(summary):
+    '''
+    Return the summary as a rich Table, to be printed.
+    '''
+    from rich.table import Table
+
+    summary_table = Table(box=None)
+    for column in ['Test ID', 'Type', 'Status']:
+        summary_table.add_column(column)
+    for column in ['E [MPa]', 'σ_y [MPa]', 'UTS [MPa]', 'ε_b [%]', 'Energy [J]']:
+        summary_table.add_column(column, justify='right')
+
+    for row in summary.itertuples():
+        summary_table.add_row(
+            str(row.test_id), str(row.test_type), str(row.status),
+            '{:.1f}'.format(row.modulus),
+            '{:.2f}'.format(row.yield_strength),
+            '{:.2f}'.format(row.uts),
+            '{:.2f}'.format(row.elongation_at_break),
+            '{:.4f}'.format(row.energy)
+        )
+
+    return summary_table
@@ -0,0 +1,56 @@
+'''
+Hardware backend selection.
+
+The backend is chosen through the UTM_BACKEND environment variable:
+'hardware' (default) employs RPi.GPIO, pigpio and gpiozero, while
+'simulation' employs the simulated machine in backend.simulation,
+running UTM_SIMULATION_SPEED times faster than real time, with the
+HX711 output data rate given by UTM_SIMULATION_ADC_RATE. A simulated
+optical encoder of the crossbar is polled at UTM_SIMULATION_ENCODER_RATE,
+if given, as an auxiliary sensor stream.
+'''
+import os
+import constants
+from backend.clock import Clock, ScaledClock
+
+BACKEND = os.environ.get('UTM_BACKEND', 'hardware')
+
+if BACKEND == 'simulation':
+    clock = ScaledClock(speed=float(os.environ.get('UTM_SIMULATION_SPEED', 1)))
+
+    from backend import simulation
+    machine = simulation.SimulatedMachine(clock=clock, hx711_pins=constants.LOADCELL_PINS, adc_rate=float(os.environ.get('UTM_SIMULATION_ADC_RATE', 80)))
+    GPIO = simulation.GPIO(machine)
+    pigpio = simulation.Pigpio(machine)
+    Button = machine.create_button
+    ENCODER_RATE = float(os.environ.get('UTM_SIMULATION_ENCODER_RATE', 0))
+    encoder = simulation.SimulatedEncoder(machine) if ENCODER_RATE > 0 else None
+
+    def start_pigpio_daemon():
+        return
+elif BACKEND == 'hardware':
+    clock = Clock()
+
+    machine = None
+    ENCODER_RATE = 0
+    encoder = None
+    import RPi.GPIO as GPIO
+    import pigpio
+    from gpiozero import Button
+
+    def start_pigpio_daemon():
+        '''
+        Start the pigpio daemon, if it is not running yet.
+        '''
+        try:
+            n = int(os.popen('pidof pigpiod').read().splitlines()[0])
+        except:
+            n = 0
+
+        if not bool(n):
+            os.system("sudo pigpiod")
+
+        return
+else:
+    raise ValueError('UTM_BACKEND has to be "hardware" or "simulation". '
+                     'Received: {}'.format(BACKEND))
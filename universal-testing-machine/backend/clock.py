@@ -0,0 +1,56 @@
+import time
+import threading
+
+class Clock():
+    '''
+    Class providing the time base used by the devices and the tests.
+    '''
+    def time(self):
+        '''
+        Return the current time in seconds since the epoch.
+        '''
+        return time.time()
+
+    def sleep(self, interval:float):
+        '''
+        Suspend the calling thread for the given interval, in seconds.
+        '''
+        time.sleep(interval)
+
+        return
+
+    def Timer(self, interval:float, function):
+        '''
+        Return a threading.Timer calling function after the given
+        interval, in seconds.
+        '''
+        return threading.Timer(interval, function)
+
+class ScaledClock(Clock):
+    '''
+    Class providing a time base running faster (or slower) than real time.
+    '''
+    def __init__(self, speed:float = 1):
+        '''
+        Parameters
+        ----------
+        speed : float, default=1
+            How many seconds of the scaled clock elapse
+            during one second of real time.
+        '''
+        self._speed = speed
+        self._started_at = time.time()
+
+    def get_speed(self):
+        return self._speed
+
+    def time(self):
+        return self._started_at + (time.time() - self._started_at) * self._speed
+
+    def sleep(self, interval:float):
+        time.sleep(interval / self._speed)
+
+        return
+
+    def Timer(self, interval:float, function):
+        return threading.Timer(interval / self._speed, function)
@@ -0,0 +1,423 @@
+'''
+Simulated machine, standing in for the Raspberry Pi hardware.
+
+A physics-based model of the machine is shared by simulated versions of
+RPi.GPIO, pigpio and gpiozero.Button: the crossbar is moved by the PWM
+driving the stepper motor, a specimen produces a force depending on the
+crossbar position, the HX711 chips convert it with noise at their
+output data rate and the endstops are pressed at the ends of the stroke.
+Pins and mechanics default to the ones employed in __main__.py.
+'''
+import math
+import random
+import weakref
+import threading
+import time
+import constants
+from backend.clock import Clock
+
+# Screw pitch / (gear ratio * microsteps per revolution), in mm
+MM_PER_STEP = 5 / (5.18 * 200 / (1/32))
+
+class Specimen():
+    '''
+    Class representing a tensile specimen as an elastic-plastic
+    force vs. displacement curve with a brittle failure.
+    '''
+    def __init__(self, length:float = 50, stiffness:float = 2, yield_force:float = 5, ultimate_force:float = 7, hardening_length:float = 2, elongation_at_break:float = 8):
+        '''
+        Parameters
+        ----------
+        length : float, default=50
+            The absolute position of the crossbar at which the specimen
+            becomes taut, given in mm. Below it no force is produced.
+        stiffness : float, default=2
+            The elastic stiffness, given in N/mm.
+        yield_force : float, default=5
+            The force at which the elastic region ends, given in N.
+        ultimate_force : float, default=7
+            The force approached by the hardening region, given in N.
+        hardening_length : float, default=2
+            The elongation over which hardening takes place, given in mm.
+        elongation_at_break : float, default=8
+            The elongation at which the specimen fails, given in mm.
+        '''
+        self._length = length
+        self._stiffness = stiffness
+        self._yield_force = yield_force
+        self._ultimate_force = ultimate_force
+        self._hardening_length = hardening_length
+        self._elongation_at_break = elongation_at_break
+        self.is_broken = False
+
+    def get_force(self, position:float):
+        '''
+        Return the force produced by the specimen, given in N,
+        for the given absolute position of the crossbar.
+        '''
+        elongation = position - self._length
+        if self.is_broken or elongation <= 0:
+            return 0
+        elif elongation >= self._elongation_at_break:
+            self.is_broken = True
+            return 0
+
+        yield_elongation = self._yield_force / self._stiffness
+        if elongation <= yield_elongation:
+            force = self._stiffness * elongation
+        else:
+            hardening = 1 - math.exp(-(elongation - yield_elongation) / self._hardening_length)
+            force = self._yield_force + (self._ultimate_force - self._yield_force) * hardening
+
+        return force
+
+class SimulatedHX711():
+    '''
+    Class simulating an HX711 chip at the pin level.
+
+    Conversions become ready at the output data rate. Each one is
+    shifted out MSB first on the rising edges of PD_SCK, and the
+    25th to 27th pulses select channel and gain of the next conversion.
+    '''
+    def __init__(self, machine, dout_pin:int, pd_sck_pin:int, rate:float = 80, zero:int = 150000, counts_per_gram:float = 420, noise:float = 80, channel_B_value:int = -30000, seed:int = 0):
+        '''
+        Parameters
+        ----------
+        machine : SimulatedMachine
+            The machine providing the force on channel A.
+        dout_pin : int
+            The data (DOUT) pin.
+        pd_sck_pin : int
+            The clock (PD_SCK) pin.
+        rate : float, default=80
+            The output data rate in samples per second (10 or 80).
+        zero : int, default=150000
+            The reading at zero load on channel A with gain 128.
+        counts_per_gram : float, default=420
+            The sensitivity on channel A with gain 128.
+        noise : float, default=80
+            The standard deviation of the reading noise, in counts.
+        channel_B_value : int, default=-30000
+            The reading of the bridge connected to channel B.
+        seed : int, default=0
+            The seed of the noise generator.
+        '''
+        self._machine = machine
+        self.dout_pin = dout_pin
+        self.pd_sck_pin = pd_sck_pin
+        self._period = 1 / rate
+        self._zero = zero
+        self._counts_per_gram = counts_per_gram
+        self._noise = noise
+        self._channel_B_value = channel_B_value
+        self._random = random.Random(seed)
+
+        self._sck = 0
+        self._pulses = 0
+        self._data = 0
+        self._gain_pulses = 1 # channel A, gain 128 at power up
+        self._converted_gain_pulses = 1
+        self._phase = machine.clock.time()
+        self._next_ready_at = self._phase + self._period
+
+    def _get_next_ready_at(self, now:float):
+        return self._phase + math.ceil((now - self._phase) / self._period) * self._period
+
+    def _convert(self):
+        if self._gain_pulses == 2:
+            value = self._channel_B_value
+        else:
+            grams = constants.CLAMP_GRAMS + (self._machine.get_force() / self._machine.n_hx711s / constants.STANDARD_GRAVITY) * 1000
+            value = self._zero + self._counts_per_gram * grams
+            if self._gain_pulses == 3:
+                value = value / 2
+
+        value = value + self._random.gauss(0, self._noise)
+
+        # The first conversion after a change of channel or gain has not settled yet
+        if self._gain_pulses != self._converted_gain_pulses:
+            value = value * 0.5
+            self._converted_gain_pulses = self._gain_pulses
+
+        value = int(min(max(value, -0x7fffff), 0x7ffffe))
+
+        return value & 0xffffff
+
+    def read_dout(self):
+        if self._pulses >= 25:
+            # The previous read is over: store the selected channel and gain
+            self._gain_pulses = self._pulses - 24
+            self._pulses = 0
+            self._next_ready_at = self._get_next_ready_at(self._machine.clock.time())
+
+        if self._pulses == 0:
+            return 0 if self._machine.clock.time() >= self._next_ready_at else 1
+        elif self._pulses <= 24:
+            return (self._data >> (24 - self._pulses)) & 1
+        else:
+            return 1
+
+    def write_sck(self, value:int):
+        if value and not self._sck:
+            if self._pulses > 0:
+                self._pulses += 1
+            elif self._machine.clock.time() >= self._next_ready_at:
+                self._data = self._convert()
+                self._pulses = 1
+        self._sck = value
+
+        return
+
+class SimulatedButton():
+    '''
+    Class simulating a gpiozero.Button. Endstops are pressed depending
+    on the crossbar position, while other buttons are pressed and
+    released through press() and release().
+    '''
+    def __init__(self, machine, pin:int):
+        self.pin = pin
+        self.when_pressed = None
+        self.when_released = None
+        self._machine = machine
+        self._is_forced = False
+        self._was_pressed = self.is_pressed
+
+    @property
+    def is_pressed(self):
+        return self._is_forced or self._machine.is_endstop_pressed(self.pin)
+
+    @property
+    def is_active(self):
+        return self.is_pressed
+
+    def press(self):
+        self._is_forced = True
+
+        return
+
+    def release(self):
+        self._is_forced = False
+
+        return
+
+class SimulatedEncoder():
+    '''
+    Class simulating an optical encoder measuring the absolute
+    position of the crossbar, quantized to its resolution.
+    '''
+    def __init__(self, machine, resolution:float = 0.001):
+        '''
+        Parameters
+        ----------
+        machine : SimulatedMachine
+            The machine whose crossbar is measured.
+        resolution : float, default=0.001
+            The distance between two counts, given in mm.
+        '''
+        self._machine = machine
+        self._resolution = resolution
+
+    def read(self):
+        return round(self._machine.get_position() / self._resolution) * self._resolution
+
+class SimulatedMachine():
+    '''
+    Class simulating the universal testing machine.
+    '''
+    def __init__(self, clock:Clock, stroke:float = 130, position:float = 20, mm_per_step:float = MM_PER_STEP, dir_pin:int = 20, step_pin:int = 13, en_pin:int = 23, up_endstop_pin:int = 25, down_endstop_pin:int = 8, hx711_pins:list = [(5, 6)], adc_rate:float = 80):
+        '''
+        Parameters
+        ----------
+        clock : Clock
+            The time base of the simulation.
+        stroke : float, default=130
+            The position of the up endstop, given in mm. The down
+            endstop is at position 0.
+        position : float, default=20
+            The initial position of the crossbar, given in mm.
+        mm_per_step : float, default=MM_PER_STEP
+            The crossbar travel for each PWM pulse, given in mm.
+        dir_pin, step_pin, en_pin : int
+            The stepper driver pins.
+        up_endstop_pin, down_endstop_pin : int
+            The endstop pins.
+        hx711_pins : list, default=[(5, 6)]
+            The (DOUT, PD_SCK) pins of each HX711 chip. The force
+            is shared equally among their load cells.
+        adc_rate : float, default=80
+            The output data rate of the HX711 chips (10 or 80).
+        '''
+        self.clock = clock
+        self.specimen = Specimen()
+        self._stroke = stroke
+        self._position = position
+        self._mm_per_step = mm_per_step
+        self._dir_pin = dir_pin
+        self._step_pin = step_pin
+        self._en_pin = en_pin
+        self._up_endstop_pin = up_endstop_pin
+        self._down_endstop_pin = down_endstop_pin
+
+        self._lock = threading.RLock()
+        self._levels = {en_pin: 1}
+        self._frequency = 0
+        self._updated_at = clock.time()
+
+        self.n_hx711s = len(hx711_pins)
+        self._hx711s_by_dout = {}
+        self._hx711s_by_sck = {}
+        for idx, (dout_pin, pd_sck_pin) in enumerate(hx711_pins):
+            hx711 = SimulatedHX711(self, dout_pin, pd_sck_pin, rate=adc_rate, seed=idx)
+            self._hx711s_by_dout[dout_pin] = hx711
+            self._hx711s_by_sck.setdefault(pd_sck_pin, []).append(hx711)
+
+        self._buttons = weakref.WeakSet()
+        self._watcher = None
+
+    def _get_velocity(self):
+        if self._levels.get(self._en_pin, 1) == 1:
+            return 0
+        # Direction 0 (CW) moves the crossbar up
+        direction = 1 if self._levels.get(self._dir_pin, 0) == 0 else -1
+        return direction * self._frequency * self._mm_per_step
+
+    def _update(self):
+        now = self.clock.time()
+        self._position += self._get_velocity() * (now - self._updated_at)
+        # Hard mechanical limits slightly beyond the endstops
+        self._position = min(max(self._position, -2), self._stroke + 2)
+        self._updated_at = now
+
+        return
+
+    def get_position(self):
+        with self._lock:
+            self._update()
+            return self._position
+
+    def get_force(self):
+        return self.specimen.get_force(self.get_position())
+
+    def write(self, pin:int, level:int):
+        if pin in self._hx711s_by_sck:
+            for hx711 in self._hx711s_by_sck[pin]:
+                hx711.write_sck(level)
+        else:
+            with self._lock:
+                self._update()
+                self._levels[pin] = level
+
+        return
+
+    def read(self, pin:int):
+        if pin in self._hx711s_by_dout:
+            return self._hx711s_by_dout[pin].read_dout()
+        else:
+            return self._levels.get(pin, 1)
+
+    def set_pwm(self, pin:int, frequency:int):
+        if pin == self._step_pin:
+            with self._lock:
+                self._update()
+                self._frequency = frequency
+
+        return
+
+    def is_endstop_pressed(self, pin:int):
+        if pin == self._down_endstop_pin:
+            return self.get_position() <= 0
+        elif pin == self._up_endstop_pin:
+            return self.get_position() >= self._stroke
+        else:
+            return False
+
+    def create_button(self, pin:int, **kwargs):
+        button = SimulatedButton(self, pin)
+        self._buttons.add(button)
+
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch_buttons, daemon=True)
+            self._watcher.start()
+
+        return button
+
+    def _watch_buttons(self):
+        '''
+        Fire the button callbacks on state changes, as the
+        gpiozero callback threads do.
+        '''
+        while True:
+            for button in list(self._buttons):
+                is_pressed = button.is_pressed
+                if is_pressed != button._was_pressed:
+                    button._was_pressed = is_pressed
+                    callback = button.when_pressed if is_pressed else button.when_released
+                    if callback is not None:
+                        callback()
+            time.sleep(0.001)
+
+class GPIO():
+    '''
+    Simulated RPi.GPIO module.
+    '''
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+
+    def __init__(self, machine:SimulatedMachine):
+        self._machine = machine
+
+    def setmode(self, mode:int):
+        return
+
+    def setup(self, pin:int, mode:int):
+        return
+
+    def output(self, pin:int, value:bool):
+        self._machine.write(pin, 1 if value else 0)
+
+        return
+
+    def input(self, pin:int):
+        return self._machine.read(pin)
+
+class _Pi():
+    '''
+    Simulated connection to the pigpio daemon.
+    '''
+    def __init__(self, machine:SimulatedMachine):
+        self._machine = machine
+        self.connected = True
+
+    def set_mode(self, pin:int, mode:int):
+        return
+
+    def write(self, pin:int, level:int):
+        self._machine.write(pin, level)
+
+        return
+
+    def read(self, pin:int):
+        return self._machine.read(pin)
+
+    def hardware_PWM(self, pin:int, frequency:int, dutycycle:int):
+        self._machine.set_pwm(pin, frequency if dutycycle > 0 else 0)
+
+        return
+
+    def stop(self):
+        return
+
+class Pigpio():
+    '''
+    Simulated pigpio module.
+    '''
+    OUTPUT = 1
+    INPUT = 0
+
+    def __init__(self, machine:SimulatedMachine):
+        self._machine = machine
+
+    def pi(self, show_errors:bool = True):
+        return _Pi(self._machine)
@@ -0,0 +1,248 @@
+'''
+Benchmark of the acquisition-to-display pipeline on the simulated machine.
+
+Each stage (HX711 acquisition, LoadCell.get_batch, data table rendering,
+plot update) and the whole monotonic test loop are run in isolation,
+reporting samples per second, per-call latency percentiles, CPU usage
+and peak Python memory. Table and plot calls are counted as one batch
+of samples each.
+
+Usage:
+    python3 universal-testing-machine/benchmark/pipeline.py [--speed N] [--output FILE]
+'''
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+import tracemalloc
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PACKAGE_DIR)
+
+BATCH_SIZE = 15
+
+def _get_latency_percentiles(latencies:list):
+    import numpy as np
+
+    latencies = np.array(latencies) / 1e6 # in ms
+    if len(latencies) == 0:
+        return None
+
+    return {
+        'p50': float(np.percentile(latencies, 50)),
+        'p90': float(np.percentile(latencies, 90)),
+        'p99': float(np.percentile(latencies, 99)),
+        'max': float(np.max(latencies))
+    }
+
+def _run_stage(stage, *args):
+    '''
+    Run a stage once for timing and once more with tracemalloc
+    enabled for its peak memory, since tracing slows it down.
+    '''
+    started_at = time.perf_counter()
+    cpu_started_at = time.process_time()
+    n_samples, latencies = stage(*args)
+    wall_time = time.perf_counter() - started_at
+    cpu_time = time.process_time() - cpu_started_at
+
+    tracemalloc.start()
+    stage(*args)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'samples': n_samples,
+        'wall_time': wall_time,
+        'samples_per_second': n_samples / wall_time,
+        'latency_ms': _get_latency_percentiles(latencies),
+        'cpu_time': cpu_time,
+        'cpu_usage': cpu_time / wall_time,
+        'peak_memory': peak_memory
+    }
+
+def _create_devices():
+    from controller import controller
+    from loadcell import loadcell
+
+    my_controller = controller.LinearController(
+        motor=controller.stepper.StepperMotor(
+            total_steps=200,
+            dir_pin=20, step_pin=13,
+            en_pin=23,
+            mode_pins=(14, 15, 18),
+            mode=controller.stepper.ONE_THIRTYTWO,
+            gear_ratio=5.18
+        ),
+        screw_pitch=5,
+        up_endstop_pin=25,
+        down_endstop_pin=8
+    )
+    my_loadcell = loadcell.LoadCell(dat_pin=5, clk_pin=6)
+
+    # Calibration matching the simulated HX711 (zero 150000 counts, 420 counts/g)
+    my_loadcell.set_calibration({
+        'loadcell_limit': {'value': 10, 'unit': 'N'},
+        'slope': 1 / 420,
+        'y_intercept': -150000 / 420,
+        'calibrating_mass': {'value': 361.606, 'unit': 'g'}
+    })
+
+    return my_controller, my_loadcell
+
+def _benchmark_acquisition(my_loadcell, duration:float):
+    latencies = []
+    hx711_read = my_loadcell._hx711._read
+
+    class _TimedSource():
+        def _read(self):
+            started_at = time.perf_counter_ns()
+            reading = hx711_read()
+            latencies.append(time.perf_counter_ns() - started_at)
+            return reading
+
+    my_loadcell.set_source(_TimedSource())
+    my_loadcell.start_reading()
+    time.sleep(duration)
+    data = my_loadcell.stop_reading()
+    my_loadcell.set_source(None)
+
+    return len(data), latencies
+
+def _benchmark_get_batch(my_loadcell, n_batches:int):
+    import numpy as np
+    # Imported by get_batch on its first call
+    import scipy.signal
+    import pandas
+
+    rng = np.random.default_rng(0)
+    my_loadcell._readings = list((150000 + 420 * 500 + rng.normal(0, 80, n_batches * BATCH_SIZE)).astype(int))
+    my_loadcell._timings = list(np.arange(n_batches * BATCH_SIZE) / 80)
+
+    latencies = []
+    batch_index = 0
+    while my_loadcell.is_batch_ready(batch_index, BATCH_SIZE):
+        started_at = time.perf_counter_ns()
+        _, batch_index = my_loadcell.get_batch(batch_index, BATCH_SIZE)
+        latencies.append(time.perf_counter_ns() - started_at)
+
+    my_loadcell._reset_reading_attributes()
+
+    return n_batches * BATCH_SIZE, latencies
+
+def _benchmark_table(n_renders:int):
+    from rich.console import Console
+    from display import table
+
+    console = Console(file=io.StringIO(), width=120)
+    live_table = table.LiveTable(loadcell_limit=10, force_offset=0.6)
+
+    latencies = []
+    for i in range(n_renders):
+        started_at = time.perf_counter_ns()
+        console.print(live_table._generate_table(live_table._get_values(i / 1000, i / 100)))
+        latencies.append(time.perf_counter_ns() - started_at)
+
+    return n_renders * BATCH_SIZE, latencies
+
+def _benchmark_plot(n_updates:int):
+    import numpy as np
+    from display import plot
+
+    live_plot = plot.LivePlot(xlim=20, ylim=10, xlabel='Strain (%)', ylabel='Force (N)', title='Force vs. Strain')
+    live_plot.start()
+
+    latencies = []
+    for i in range(n_updates):
+        x = (i * BATCH_SIZE + np.arange(BATCH_SIZE)) / (n_updates * BATCH_SIZE) * 20
+        started_at = time.perf_counter_ns()
+        live_plot.update(x, np.sqrt(x))
+        latencies.append(time.perf_counter_ns() - started_at)
+    live_plot.stop()
+
+    import matplotlib.pyplot as plt
+    plt.close('all')
+
+    return n_updates * BATCH_SIZE, latencies
+
+def _benchmark_test_loop(my_controller, my_loadcell, displacement:float):
+    import helpers
+    from backend.backend import machine
+    from backend import simulation
+
+    machine.specimen = simulation.Specimen(length=my_controller.get_absolute_position())
+    test_parameters = {
+        'test_id': 'benchmark',
+        'test_type': 'monotonic',
+        'cross_section': {'value': 2, 'unit': 'mm²'},
+        'clamps_distance': {'value': 8.18, 'unit': 'mm'},
+        'displacement': {'value': displacement, 'unit': 'mm'},
+        'linear_speed': {'value': 1, 'unit': 'mm/s'},
+        'initial_gauge_length': {'value': 8.18 + my_controller.get_absolute_position(), 'unit': 'mm'}
+    }
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = helpers._start_monotonic_test(my_controller, my_loadcell, test_parameters, stop_button_pin=22)
+
+    # Move back to the starting position for the next run
+    my_controller.run(speed=5, distance=displacement, direction=helpers.controller.DOWN)
+    while my_controller.is_running:
+        time.sleep(0.01)
+
+    import matplotlib.pyplot as plt
+    plt.close('all')
+
+    return len(data), []
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the acquisition-to-display pipeline on the simulated machine.')
+    parser.add_argument('--speed', type=float, default=10, help='speed of the simulated clock with respect to real time')
+    parser.add_argument('--adc-rate', type=float, default=80, help='output data rate of the simulated HX711 (10 or 80)')
+    parser.add_argument('--duration', type=float, default=2, help='duration of the acquisition stage [s]')
+    parser.add_argument('--batches', type=int, default=2000, help='number of batches of the get_batch stage')
+    parser.add_argument('--renders', type=int, default=1000, help='number of renders of the table stage')
+    parser.add_argument('--updates', type=int, default=300, help='number of updates of the plot stage')
+    parser.add_argument('--displacement', type=float, default=5, help='displacement of the test loop stage [mm]')
+    parser.add_argument('--output', default='bench_output.json', help='JSON file to write the results to')
+    args = parser.parse_args()
+
+    # The backend is selected when first imported
+    os.environ['UTM_BACKEND'] = 'simulation'
+    os.environ['UTM_SIMULATION_SPEED'] = str(args.speed)
+    os.environ['UTM_SIMULATION_ADC_RATE'] = str(args.adc_rate)
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import helpers
+        my_controller, my_loadcell = _create_devices()
+        my_controller.calibrate(speed=0.75, is_linear=False)
+    helpers.adjust_crossbar_position(my_controller, adjustment_position=50)
+
+    results = {
+        'config': vars(args),
+        'stages': {
+            'acquisition': _run_stage(_benchmark_acquisition, my_loadcell, args.duration),
+            'get_batch': _run_stage(_benchmark_get_batch, my_loadcell, args.batches),
+            'table': _run_stage(_benchmark_table, args.renders),
+            'plot': _run_stage(_benchmark_plot, args.updates),
+            'test_loop': _run_stage(_benchmark_test_loop, my_controller, my_loadcell, args.displacement)
+        }
+    }
+
+    print('{:<12} {:>12} {:>10} {:>10} {:>10} {:>8} {:>12}'.format('stage', 'samples/s', 'p50 [ms]', 'p99 [ms]', 'max [ms]', 'CPU', 'peak [KiB]'))
+    for name, stage in results['stages'].items():
+        latency = stage['latency_ms'] or {'p50': float('nan'), 'p99': float('nan'), 'max': float('nan')}
+        print('{:<12} {:>12.1f} {:>10.3f} {:>10.3f} {:>10.3f} {:>7.0%} {:>12.1f}'.format(
+            name, stage['samples_per_second'], latency['p50'], latency['p99'], latency['max'], stage['cpu_usage'], stage['peak_memory'] / 1024
+        ))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
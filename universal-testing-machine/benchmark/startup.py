@@ -0,0 +1,112 @@
+'''
+Startup benchmark, reporting the time spent importing each module
+before the menu is shown.
+
+Usage:
+    python3 universal-testing-machine/benchmark/startup.py [--top N] [--budget SECONDS] [--output FILE]
+
+The exit status is 1 if the total import time exceeds the budget.
+'''
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+import subprocess
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PACKAGE_DIR)
+import constants
+
+MAIN_PATH = os.path.join(PACKAGE_DIR, '__main__.py')
+
+_IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def get_startup_imports(main_path:str = MAIN_PATH):
+    '''
+    Return the import statements run by __main__.py before the menu is
+    shown, i.e. the ones at its top level, so that they are kept in sync
+    with it. The imports of a command only, e.g. of the analysis, are not.
+    '''
+    with open(main_path) as f:
+        tree = ast.parse(f.read())
+
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+def measure_import_times(imports:list = None, env:dict = None):
+    '''
+    Run the given import statements in a fresh interpreter and collect
+    the import time of every module.
+
+    Parameters
+    ----------
+    imports : list, default=None
+        The import statements to run. By default the ones of the startup.
+    env : dict, default=None
+        The environment of the interpreter. By default the current one.
+
+    Returns
+    -------
+    import_times : list
+        A list of dicts with the module name, its own import time and
+        its cumulative import time in seconds, and its nesting level.
+    error : str | None
+        The error raised while importing, if any.
+    '''
+    if imports is None:
+        imports = get_startup_imports()
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '\n'.join(imports)],
+        cwd=PACKAGE_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+    import_times = []
+    error = None
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_PATTERN.match(line)
+        if match is not None:
+            import_times.append({
+                'module': match.group(4),
+                'self': int(match.group(1)) / 1e6,
+                'cumulative': int(match.group(2)) / 1e6,
+                'level': len(match.group(3)) // 2
+            })
+        elif not line.startswith('import time:'):
+            error = line if error is None else error + '\n' + line
+
+    if result.returncode == 0:
+        error = None
+
+    return import_times, error
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the per-module import time of the startup sequence.')
+    parser.add_argument('--top', type=int, default=20, help='number of modules to report')
+    parser.add_argument('--budget', type=float, default=constants.STARTUP_IMPORT_BUDGET, help='maximum total import time [s]')
+    parser.add_argument('--output', default=None, help='JSON file to write the results to')
+    args = parser.parse_args()
+
+    import_times, error = measure_import_times()
+    total = sum(item['cumulative'] for item in import_times if item['level'] == 0)
+
+    print('{:>10} {:>10}  {}'.format('self [s]', 'cum. [s]', 'module'))
+    for item in sorted(import_times, key=lambda item: item['cumulative'], reverse=True)[:args.top]:
+        print('{:>10.4f} {:>10.4f}  {}'.format(item['self'], item['cumulative'], '  ' * item['level'] + item['module']))
+    print('Total import time: {:.4f} s (budget {:.4f} s)'.format(total, args.budget))
+
+    if error is not None:
+        print('Import failed:\n' + error)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'total': total, 'budget': args.budget, 'error': error, 'modules': import_times}, f, indent=2)
+
+    return 1 if error is not None or total > args.budget else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
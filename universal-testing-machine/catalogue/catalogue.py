@@ -0,0 +1,256 @@
+'''
+SQLite catalogue of the tests and of the load cell calibrations.
+
+The catalogue is kept in the output directory: tests are added when
+their parameters are saved, calibrations when they are performed and
+the mechanical properties when the tests are analyzed. It can be
+rebuilt at any time from the test directories on disk.
+'''
+import os
+import json
+import sqlite3
+from datetime import datetime
+
+CATALOGUE_FILENAME = 'catalogue.sqlite'
+
+TEST_COLUMNS = [
+    'test_dir', 'test_id', 'test_type', 'date', 'loadcell_limit',
+    'cross_section', 'clamps_distance', 'initial_gauge_length', 'linear_speed', 'displacement',
+    'parameters'
+]
+RESULT_COLUMNS = ['status', 'modulus', 'yield_strength', 'yield_strain', 'uts', 'elongation_at_break', 'energy']
+CALIBRATION_COLUMNS = ['date', 'loadcell_limit', 'slope', 'y_intercept', 'calibrating_mass']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tests (
+    test_dir TEXT PRIMARY KEY,
+    test_id TEXT,
+    test_type TEXT,
+    date TEXT,
+    loadcell_limit REAL,
+    cross_section REAL,
+    clamps_distance REAL,
+    initial_gauge_length REAL,
+    linear_speed REAL,
+    displacement REAL,
+    parameters TEXT,
+    status TEXT,
+    modulus REAL,
+    yield_strength REAL,
+    yield_strain REAL,
+    uts REAL,
+    elongation_at_break REAL,
+    energy REAL
+);
+CREATE INDEX IF NOT EXISTS tests_type_date ON tests (test_type, date);
+CREATE INDEX IF NOT EXISTS tests_date ON tests (date);
+CREATE INDEX IF NOT EXISTS tests_loadcell_limit ON tests (loadcell_limit, date);
+CREATE TABLE IF NOT EXISTS calibrations (
+    date TEXT,
+    loadcell_limit REAL,
+    slope REAL,
+    y_intercept REAL,
+    calibrating_mass REAL,
+    UNIQUE (loadcell_limit, slope, y_intercept)
+);
+'''
+
+def connect(output_dir:str):
+    '''
+    Open the catalogue of the given output directory,
+    creating it if it does not exist yet.
+    '''
+    connection = sqlite3.connect(os.path.join(output_dir, CATALOGUE_FILENAME))
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+
+    return connection
+
+def _get_date(date:str):
+    '''
+    Convert the dates saved by the tests (%Y_%m_%d-%H_%M_%S)
+    to ISO ones, so that they can be compared as strings.
+    '''
+    try:
+        return datetime.strptime(date, '%Y_%m_%d-%H_%M_%S').isoformat(sep=' ')
+    except (TypeError, ValueError):
+        return date
+
+def _get_value(parameters:dict, key:str):
+    value = parameters.get(key)
+    if isinstance(value, dict):
+        value = value.get('value')
+
+    return value
+
+def _get_test_row(test_dir:str, test_parameters:dict):
+    calibration = test_parameters.get('calibration') or {}
+    row = {
+        'test_dir': os.path.basename(os.path.normpath(test_dir)),
+        'test_id': test_parameters.get('test_id'),
+        'test_type': test_parameters.get('test_type'),
+        'date': _get_date(test_parameters.get('date')),
+        'loadcell_limit': _get_value(calibration, 'loadcell_limit'),
+        'cross_section': _get_value(test_parameters, 'cross_section'),
+        'clamps_distance': _get_value(test_parameters, 'clamps_distance'),
+        'initial_gauge_length': _get_value(test_parameters, 'initial_gauge_length'),
+        'linear_speed': _get_value(test_parameters, 'linear_speed'),
+        'displacement': _get_value(test_parameters, 'displacement'),
+        'parameters': json.dumps(test_parameters)
+    }
+
+    return [row[column] for column in TEST_COLUMNS]
+
+def _get_calibration_row(calibration:dict):
+    return [
+        _get_date(calibration.get('date')),
+        _get_value(calibration, 'loadcell_limit'),
+        calibration.get('slope'),
+        calibration.get('y_intercept'),
+        _get_value(calibration, 'calibrating_mass')
+    ]
+
+INSERT_TEST = 'INSERT INTO tests ({}) VALUES ({}) ON CONFLICT (test_dir) DO UPDATE SET {}'.format(
+    ', '.join(TEST_COLUMNS),
+    ', '.join('?' * len(TEST_COLUMNS)),
+    ', '.join('{0} = excluded.{0}'.format(column) for column in TEST_COLUMNS[1:])
+)
+# As the calibrations saved with the tests are dated by the tests, the earliest date of each one is kept
+INSERT_CALIBRATION = 'INSERT INTO calibrations ({}) VALUES ({}) ON CONFLICT (loadcell_limit, slope, y_intercept) DO UPDATE SET date = min(date, excluded.date)'.format(
+    ', '.join(CALIBRATION_COLUMNS),
+    ', '.join('?' * len(CALIBRATION_COLUMNS))
+)
+UPDATE_RESULTS = 'UPDATE tests SET {} WHERE test_dir = ?'.format(', '.join('{} = ?'.format(column) for column in RESULT_COLUMNS))
+
+def add_test(connection:sqlite3.Connection, test_dir:str, test_parameters:dict):
+    '''
+    Add a test, or update it if it is already in the catalogue,
+    keeping its analysis results.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        The catalogue, as returned by connect().
+    test_dir : str
+        The directory of the test, identified by its name.
+    test_parameters : dict
+        The test parameters, as saved in test_parameters.json.
+    '''
+    with connection:
+        connection.execute(INSERT_TEST, _get_test_row(test_dir, test_parameters))
+
+    return
+
+def add_results(connection:sqlite3.Connection, results:list):
+    '''
+    Store the analysis results of the tests, given as dicts holding
+    the test_dir and the mechanical properties, as returned by the
+    analysis module.
+    '''
+    with connection:
+        connection.executemany(UPDATE_RESULTS, [[result.get(column) for column in RESULT_COLUMNS] + [result['test_dir']] for result in results])
+
+    return
+
+def add_calibration(connection:sqlite3.Connection, calibration:dict):
+    with connection:
+        connection.execute(INSERT_CALIBRATION, _get_calibration_row(calibration))
+
+    return
+
+def rebuild(output_dir:str, calibration_dir:str = None):
+    '''
+    Rebuild the catalogue from the test directories, the cached
+    analysis results and the calibration directory, if given.
+    Everything is written in a single transaction.
+    '''
+    from analysis import analysis
+
+    path = os.path.join(output_dir, CATALOGUE_FILENAME)
+    if os.path.isfile(path):
+        os.remove(path)
+    connection = connect(output_dir)
+
+    test_rows = []
+    calibrations = []
+    for test_dir in analysis.find_tests(output_dir):
+        with open(os.path.join(test_dir, analysis.PARAMETERS_FILENAME)) as f:
+            test_parameters = json.load(f)
+        test_rows.append(_get_test_row(test_dir, test_parameters))
+        if test_parameters.get('calibration') is not None:
+            calibrations.append(test_parameters['calibration'])
+
+    if calibration_dir is not None and os.path.isdir(calibration_dir):
+        for filename in os.listdir(calibration_dir):
+            if filename.endswith('.json'):
+                with open(os.path.join(calibration_dir, filename)) as f:
+                    calibrations.append(json.load(f))
+
+    results = [entry['result'] for entry in analysis._load_cache(output_dir).values()]
+
+    with connection:
+        connection.executemany(INSERT_TEST, test_rows)
+        connection.executemany(INSERT_CALIBRATION, [_get_calibration_row(calibration) for calibration in calibrations])
+        connection.executemany(UPDATE_RESULTS, [[result.get(column) for column in RESULT_COLUMNS] + [result['test_dir']] for result in results])
+
+    return connection
+
+def query_tests(connection:sqlite3.Connection, test_type:str = None, loadcell_limit:float = None, since:str = None, until:str = None, min_cross_section:float = None, max_cross_section:float = None, where:str = None):
+    '''
+    Return the tests matching all the given conditions, newest first.
+    Dates are given as ISO strings (e.g. 2022-03-01), both included,
+    while where is an additional SQL condition on the columns of the
+    tests table.
+    '''
+    # Dates without a time include the whole day
+    if until is not None and len(until) == len('YYYY-MM-DD'):
+        until = until + ' 23:59:59'
+
+    conditions = []
+    values = []
+    for condition, value in [
+        ('test_type = ?', test_type),
+        ('loadcell_limit = ?', loadcell_limit),
+        ('date >= ?', since),
+        ('date <= ?', until),
+        ('cross_section >= ?', min_cross_section),
+        ('cross_section <= ?', max_cross_section)
+    ]:
+        if value is not None:
+            conditions.append(condition)
+            values.append(value)
+    if where is not None:
+        conditions.append('({})'.format(where))
+
+    sql = 'SELECT * FROM tests'
+    if len(conditions) > 0:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY date DESC'
+
+    return connection.execute(sql, values).fetchall()
+
+def get_tests_table(rows:list):
+    '''
+    Return the tests, as returned by query_tests(), as a rich Table, to be printed.
+    '''
+    from rich.table import Table
+
+    def _format(value, format:str):
+        return format.format(value) if value is not None else '-'
+
+    tests_table = Table(box=None)
+    for column in ['Directory', 'Type', 'Date', 'Status']:
+        tests_table.add_column(column)
+    for column in ['Load Cell [N]', 'A [mm²]', 'E [MPa]', 'UTS [MPa]']:
+        tests_table.add_column(column, justify='right')
+
+    for row in rows:
+        tests_table.add_row(
+            row['test_dir'], str(row['test_type']), str(row['date']), _format(row['status'], '{}'),
+            _format(row['loadcell_limit'], '{:g}'),
+            _format(row['cross_section'], '{:g}'),
+            _format(row['modulus'], '{:.1f}'),
+            _format(row['uts'], '{:.2f}')
+        )
+
+    return tests_table
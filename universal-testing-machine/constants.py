@@ -4,4 +4,49 @@ CLAMP_GRAMS = 63.352
 CALIBRATING_MASS_10_N = CLAMP_GRAMS + CALIBRATING_MASS_GRAMS
 CALIBRATING_MASS_1_N = CLAMP_GRAMS
 
-DEFAULT_CLAMPS_DISTANCE = 8.18
\ No newline at end of file
+DEFAULT_CLAMPS_DISTANCE = 8.18
+
+STANDARD_GRAVITY = 9.80665 # m/s², same as scipy.constants.g
+
+IS_PLOT_DETACHED = False
+IS_INSTRUMENTATION_ENABLED = False
+
+# Full-rate capture around failures and stop-button presses, with the main record decimated
+IS_CAPTURE_ENABLED = False
+CAPTURE_PRE_SAMPLES = 800 # 10 s at 80 SPS
+CAPTURE_POST_SAMPLES = 400 # 5 s at 80 SPS
+CAPTURE_DECIMATION = 10
+
+# Static tests also store, apart, buckets as wide as this ratio of the time elapsed since the start,
+# or since the force changed by more than STATIC_CHANGE_RATIO of the load cell limit
+IS_STATIC_DECIMATION_ENABLED = False
+STATIC_DECIMATION_RATIO = 0.001
+STATIC_CHANGE_RATIO = 0.05
+
+# The compliance of the machine is measured by loading a rigid specimen at this speed
+# up to a ratio of the load cell limit, discarding the readings below COMPLIANCE_MIN_FORCE_RATIO
+COMPLIANCE_SPEED = 0.05 # mm/s
+COMPLIANCE_MAX_DISPLACEMENT = 2 # mm
+COMPLIANCE_FORCE_RATIO = 0.8
+COMPLIANCE_MIN_FORCE_RATIO = 0.05
+COMPLIANCE_DEGREE = 2
+
+# The (data, clock) pins of each HX711. Several load cells are read as a group, each
+# HX711 by its own acquisition thread, so that each one needs a clock pin of its own
+LOADCELL_PINS = [(5, 6)]
+# The nominal output data rate of the HX711 (RATE pin high), refined by fitting the timestamps
+HX711_RATE = 80 # SPS
+# The channels of the HX711 read in turn, e.g. {'A': 16, 'B': 4} to read a compensation
+# bridge on channel B, discarding HX711_SETTLING_CONVERSIONS after each change. None for A only
+HX711_CHANNELS = None
+HX711_SETTLING_CONVERSIONS = 1
+# The time constant of the exponentially weighted mean and variance of the readings
+STATISTICS_TIME_CONSTANT = 0.25 # s
+# Readings farther than STATISTICS_REJECTION_THRESHOLD weighted standard deviations from the weighted
+# mean are left out of the statistics as corrupted, unless STATISTICS_CONFIRMING_READINGS in a row are
+STATISTICS_REJECTION_THRESHOLD = 5
+STATISTICS_CONFIRMING_READINGS = 2
+# Monotonic test readings are resampled onto a uniform grid at the fitted rate of the ADC
+IS_RESAMPLING_ENABLED = False
+
+STARTUP_IMPORT_BUDGET = 1.5 # in seconds, until the menu is shown
@@ -0,0 +1,131 @@
+import os
+import json
+import numpy as np
+from datetime import datetime
+
+CALIBRATION_FILENAME = 'compliance_calibration.json'
+
+class Compliance():
+    '''
+    Class modelling the compliance of the machine (frame, screw, clamps
+    and load cell), i.e. the deflection of the crossbar under load, as a
+    polynomial of the force with no constant term.
+
+    The displacement commanded to the crossbar is corrected by
+    subtracting the deflection, evaluated on whole arrays at once.
+    '''
+    def __init__(self, calibration:dict):
+        '''
+        Parameters
+        ----------
+        calibration : dict
+            The compliance calibration, as returned by get_calibration(),
+            holding the polynomial coefficients from the first degree
+            up, given in mm/N, mm/N², and so on.
+        '''
+        coefficients = calibration['coefficients']
+        if len(coefficients) == 0:
+            raise ValueError('The compliance needs at least one coefficient. '
+                             'Received: {}'.format(coefficients))
+
+        self._coefficients = [float(coefficient) for coefficient in coefficients]
+        self._max_force = calibration.get('max_force', {}).get('value')
+        self._date = calibration.get('date')
+
+    def get_calibration(self):
+        calibration = {
+            'coefficients': self._coefficients,
+            'max_force': {
+                'value': self._max_force,
+                'unit': 'N'
+            },
+            'date': self._date
+        }
+
+        return calibration
+
+    def save(self, calibration_dir:str):
+        with open(os.path.join(calibration_dir, CALIBRATION_FILENAME), 'w') as f:
+            json.dump(self.get_calibration(), f)
+
+        return
+
+    def get_deflection(self, force):
+        '''
+        Compute the deflection of the machine, given in mm, for
+        a force, or an array of forces, given in N.
+        '''
+        force = np.asarray(force, dtype=float)
+
+        # Horner's scheme, with the constant term being zero
+        deflection = np.zeros_like(force)
+        for coefficient in reversed(self._coefficients):
+            deflection = (deflection + coefficient) * force
+
+        return deflection
+
+    def correct(self, displacement, force):
+        '''
+        Return the displacement of the specimen, given in mm, from
+        the displacement of the crossbar, given in mm, and the force
+        read at the same time, given in N.
+        '''
+        return np.asarray(displacement, dtype=float) - self.get_deflection(force)
+
+def fit(force:np.ndarray, displacement:np.ndarray, degree:int = 2, min_force:float = 0):
+    '''
+    Fit the compliance of the machine to the force and displacement
+    recorded while loading a rigid specimen, whose deformation is
+    negligible with respect to the deflection of the machine.
+
+    Parameters
+    ----------
+    force : ndarray
+        The force, given in N.
+    displacement : ndarray
+        The crossbar displacement, given in mm.
+    degree : int, default=2
+        The degree of the polynomial.
+    min_force : float, default=0
+        The force, given in N, below which the readings are discarded,
+        so that the take-up of the slack is not mistaken for a deflection.
+
+    Returns
+    -------
+    compliance : Compliance
+        The fitted compliance.
+    '''
+    force = np.asarray(force, dtype=float)
+    displacement = np.asarray(displacement, dtype=float)
+    is_loaded = force >= min_force
+    if np.count_nonzero(is_loaded) <= degree + 1:
+        raise ValueError('Not enough readings above the minimum force to fit the compliance. '
+                         'Received: {}'.format(np.count_nonzero(is_loaded)))
+    force = force[is_loaded]
+    displacement = displacement[is_loaded]
+
+    # The constant term absorbs the slack, which is not part of the deflection
+    powers = np.vander(force, degree + 1, increasing=True)
+    coefficients, _, _, _ = np.linalg.lstsq(powers, displacement, rcond=None)
+
+    compliance = Compliance({
+        'coefficients': coefficients[1:].tolist(),
+        'max_force': {
+            'value': float(np.max(force)),
+            'unit': 'N'
+        },
+        'date': datetime.now().strftime('%Y_%m_%d-%H_%M_%S')
+    })
+
+    return compliance
+
+def load(calibration_dir:str):
+    '''
+    Load the compliance saved in the calibration directory,
+    returning None if there is none.
+    '''
+    try:
+        with open(os.path.join(calibration_dir, CALIBRATION_FILENAME)) as f:
+            return Compliance(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
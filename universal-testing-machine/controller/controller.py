@@ -1,7 +1,8 @@
+import threading
 from controller.stepper import stepper
-import time
-from threading import Timer
-from gpiozero import Button
+from controller import compliance, motion
+from backend.backend import Button, clock
+from instrumentation import instrumentation
 
 UP = stepper.CW
 DOWN = stepper.CCW
@@ -27,6 +28,8 @@ class LinearController():
         self.is_calibrated = False
         self._absolute_position = None
         self._calibration_direction = None
+        self._compliance = None
+        self._motion_log = motion.MotionLog()
 
         # Running attributes
         self.is_running = False
@@ -35,6 +38,8 @@ class LinearController():
         self._running_timer = None
         self._rotational_speed = None   
         self._started_at = None  
+        # Stops may come from the timer, the endstops and the load cell watchdog at once
+        self._lock = threading.RLock()
 
         # Other
         self._up_endstop = Button(pin=up_endstop_pin)
@@ -159,6 +164,7 @@ class LinearController():
 
         return
 
+    @instrumentation.instrumented('controller.stop')
     def _stop(self):
         '''
         Stop the running motor.
@@ -172,28 +178,40 @@ class LinearController():
             The distance travelled by the motor,
             given in mm.
         '''
-        if self.is_running:
-            # Stop the motor
-            run_interval = self._motor.stop()
-            run_distance = self._get_distance_from_interval(self._rotational_speed, run_interval, is_linear=False)
+        with self._lock:
+            if self.is_running:
+                # Stop the motor
+                run_interval = self._motor.stop()
+                run_distance = self._get_distance_from_interval(self._rotational_speed, run_interval, is_linear=False)
+                self._motion_log.stop(self._started_at + run_interval)
 
-            if self.is_calibrated:
-                self._update_absolute_position(run_distance)
+                if self.is_calibrated:
+                    self._update_absolute_position(run_distance)
 
-            # Reset running attributes
-            self._reset_running_attributes()
+                # Reset running attributes
+                self._reset_running_attributes()
 
-            # Disable endstops
-            if self._up_endstop.when_pressed is not None:
-                self._up_endstop.when_pressed = None
-            if self._down_endstop.when_pressed is not None:
-                self._down_endstop.when_pressed = None            
-        else:
-            run_interval = None
-            run_distance = None
+                # Disable endstops
+                if self._up_endstop.when_pressed is not None:
+                    self._up_endstop.when_pressed = None
+                if self._down_endstop.when_pressed is not None:
+                    self._down_endstop.when_pressed = None            
+            else:
+                run_interval = None
+                run_distance = None
 
         return run_interval, run_distance
     
+    def _log_motion_start(self, started_at:float, rotational_speed:float, direction:stepper.Direction):
+        self._motion_log.start(
+            started_at,
+            direction=1 if direction.get_value() is UP.get_value() else -1,
+            speed=self._get_linear_speed(rotational_speed),
+            step_frequency=self._motor.get_step_frequency()
+        )
+
+        return
+
     def _update_absolute_position(self, run_distance:float):
         if self._running_direction.get_value() is self._calibration_direction.get_value():
             self._absolute_position -= run_distance
@@ -202,18 +220,54 @@ class LinearController():
         
         return
 
+    @instrumentation.instrumented('controller.get_absolute_position')
     def get_absolute_position(self):
         if self.is_running:
             linear_speed = self._get_linear_speed(rotational_speed=self._rotational_speed)
             if self._running_direction.get_value() is UP.get_value():
-                absolute_position = self._absolute_position + (time.time() - self._started_at) * linear_speed
+                absolute_position = self._absolute_position + (clock.time() - self._started_at) * linear_speed
             elif self._running_direction.get_value() is DOWN.get_value():
-                absolute_position = self._absolute_position - (time.time() - self._started_at) * linear_speed
+                absolute_position = self._absolute_position - (clock.time() - self._started_at) * linear_speed
         else:
             absolute_position = self._absolute_position
 
         return absolute_position
     
+    def position_at(self, timestamps):
+        '''
+        Reconstruct the position of the crossbar at the given
+        timestamps from the motion log, in a single interpolation.
+
+        Parameters
+        ----------
+        timestamps : float | ndarray
+            The timestamps, given in seconds, as returned by clock.time().
+
+        Returns
+        -------
+        position : float | ndarray
+            The position of the crossbar at each timestamp, given in mm.
+            Once the controller is calibrated, it is the absolute position.
+        '''
+        return self._motion_log.position_at(timestamps)
+
+    def get_motion_log(self):
+        return self._motion_log
+
+    def set_compliance(self, my_compliance:compliance.Compliance):
+        '''
+        Set the compliance of the machine, used to correct the
+        displacement of the crossbar for its deflection under load.
+        None disables the correction.
+        '''
+        self._compliance = my_compliance
+
+        return
+
+    def get_compliance(self):
+        return self._compliance
+
+    @instrumentation.instrumented('controller.abort')
     def abort(self):
         '''
         Stop the running motor before it has completed a previously specified task.
@@ -227,15 +281,18 @@ class LinearController():
             The distance travelled by the motor before being aborted,
             given in mm.
         '''
-        if self.is_running:
-            # Stop running timer
-            self._running_timer.cancel()
+        with self._lock:
+            if self.is_running:
+                instrumentation.checkpoint('abort')
 
-            # Stop the current run
-            run_interval, run_distance = self._stop()
-        else:
-            run_interval = None
-            run_distance = None
+                # Stop running timer
+                self._running_timer.cancel()
+
+                # Stop the current run
+                run_interval, run_distance = self._stop()
+            else:
+                run_interval = None
+                run_distance = None
 
         return run_interval, run_distance
     
@@ -253,7 +310,7 @@ class LinearController():
             if has_timeout is True:
                 max_distance = 130
                 timeout = self._get_interval_from_distance(speed, max_distance, is_linear)
-                timeout_timer = Timer(timeout, lambda: None)
+                timeout_timer = clock.Timer(timeout, lambda: None)
                 timeout_timer.start()
 
                 while not selected_endstop.is_pressed and timeout_timer.is_alive():
@@ -273,17 +330,20 @@ class LinearController():
             if self.is_calibrated:
                 self._absolute_position = 0
                 self._calibration_direction = direction
+                self._motion_log.reset(self._absolute_position)
         else:
             self.is_calibrated = False
 
         return self.is_calibrated
     
+    @instrumentation.instrumented('controller.motor_start')
     def motor_start(self, speed:float, direction:stepper.Direction = DOWN, is_linear:bool=True):
         if not self.is_running:
             if is_linear:
                 speed = self._get_rotational_speed(speed)
 
             self._started_at = self._motor.start(speed, direction)
+            self._log_motion_start(self._started_at, speed, direction)
 
             self.is_running = True
             self._running_direction = direction
@@ -291,10 +351,12 @@ class LinearController():
             
         return
     
+    @instrumentation.instrumented('controller.motor_stop')
     def motor_stop(self):
         run_interval, run_distance = self._stop()
         return run_interval, run_distance
     
+    @instrumentation.instrumented('controller.run')
     def run(self, speed:float, distance:float, direction:stepper.Direction, is_linear:bool=True):
         '''
         Run the motor for a specified task
@@ -337,7 +399,8 @@ class LinearController():
             interval = self._get_interval_from_distance(speed, distance, is_linear)
             
             # Init the timer
-            self._running_timer = Timer(interval, self._stop)
+            self._running_timer = clock.Timer(interval, self._stop)
+            self._running_timer.name = 'run timer'
 
             # Get the rotational speed, if necessary
             if is_linear:
@@ -347,6 +410,7 @@ class LinearController():
 
             # Start the motor
             started_at = self._motor.start(speed, direction)
+            self._log_motion_start(started_at, speed, direction)
 
             # Start the timer
             self._running_timer.start()
@@ -360,8 +424,10 @@ class LinearController():
             # Set endstops check
             def handle_endstop(endstop_direction:stepper.Direction):
                 nonlocal self
+                instrumentation.mark('controller.endstop')
                 if self.is_calibrated:
                     if self._running_direction.get_value() == endstop_direction.get_value():
+                        instrumentation.trigger('endstop')
                         self.abort()
                 return
 
@@ -374,13 +440,15 @@ class LinearController():
         
         return interval, distance, started_at
 
+    @instrumentation.instrumented('controller.hold_torque')
     def hold_torque(self):
         self._motor.hold_torque()
         self.is_holding = True
-        self._started_at = time.time()
+        self._started_at = clock.time()
 
         return self._started_at
 
+    @instrumentation.instrumented('controller.release_torque')
     def release_torque(self):
         self._motor.release_torque()
         self._reset_running_attributes()
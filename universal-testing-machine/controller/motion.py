@@ -0,0 +1,120 @@
+import threading
+from bisect import bisect_right
+import numpy as np
+
+class MotionLog():
+    '''
+    Class logging the motions of the crossbar as segments, each one with
+    its start and stop times, direction, speed and step count.
+
+    The position is piecewise linear in time: it is reconstructed at
+    any timestamp by interpolating between the ends of the segments,
+    so that pauses, aborted runs and changes of direction are accounted
+    for without querying the controller at each reading.
+    '''
+    def __init__(self, position:float = 0):
+        '''
+        Parameters
+        ----------
+        position : float, default=0
+            The position of the crossbar when the log starts, given in mm.
+        '''
+        # Segments and positions are appended by the timer and endstop threads as well
+        self._lock = threading.Lock()
+        self.reset(position)
+
+    def reset(self, position:float = 0):
+        '''
+        Clear the log, setting the current position of the crossbar, given in mm.
+        '''
+        with self._lock:
+            self.segments = []
+            self._times = []
+            self._positions = []
+            self._position = position
+            self._running_segment = None
+
+        return
+
+    def start(self, started_at:float, direction:int, speed:float, step_frequency:float):
+        '''
+        Log the start of a motion.
+
+        Parameters
+        ----------
+        started_at : float
+            The time at which the motor started, given in seconds.
+        direction : int
+            1 if the crossbar moves up, -1 if it moves down.
+        speed : float
+            The linear speed, given in mm/s.
+        step_frequency : float
+            The step frequency of the motor, given in Hz.
+        '''
+        with self._lock:
+            self._running_segment = {
+                'started_at': started_at,
+                'stopped_at': None,
+                'direction': direction,
+                'speed': speed,
+                'step_frequency': step_frequency,
+                'steps': None
+            }
+            self._times.append(started_at)
+            self._positions.append(self._position)
+
+        return
+
+    def stop(self, stopped_at:float):
+        '''
+        Log the stop of the running motion, if any, at the given time, given in seconds.
+        '''
+        with self._lock:
+            segment = self._running_segment
+            if segment is not None:
+                interval = stopped_at - segment['started_at']
+                segment['stopped_at'] = stopped_at
+                segment['steps'] = round(segment['step_frequency'] * interval)
+                self._position = self._position + segment['direction'] * segment['speed'] * interval
+                self._times.append(stopped_at)
+                self._positions.append(self._position)
+                self.segments.append(segment)
+                self._running_segment = None
+
+        return
+
+    def position_at(self, timestamps):
+        '''
+        Reconstruct the position of the crossbar, given in mm, at a
+        timestamp or an array of timestamps, given in seconds, in a
+        single interpolation. Timestamps within a running motion are
+        extrapolated at its speed.
+        '''
+        timestamps = np.asarray(timestamps, dtype=float)
+
+        with self._lock:
+            if len(self._times) == 0:
+                return np.full(timestamps.shape, self._position)
+
+            # Only the segments spanning the timestamps are interpolated
+            first_idx = max(bisect_right(self._times, np.min(timestamps)) - 1, 0)
+            last_idx = bisect_right(self._times, np.max(timestamps)) + 1
+            times = self._times[first_idx:last_idx]
+            positions = self._positions[first_idx:last_idx]
+
+            segment = self._running_segment
+            if segment is not None and last_idx >= len(self._times):
+                last_time = max(np.max(timestamps), segment['started_at'])
+                times = times + [last_time]
+                positions = positions + [self._position + segment['direction'] * segment['speed'] * (last_time - segment['started_at'])]
+
+        return np.interp(timestamps, times, positions)
+
+    def get_segments(self, since:float = None):
+        '''
+        Return the completed segments, as dicts, stopped at or after the given time.
+        '''
+        with self._lock:
+            segments = [segment for segment in self.segments if since is None or segment['stopped_at'] >= since]
+
+        return segments
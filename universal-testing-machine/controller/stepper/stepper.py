@@ -1,6 +1,5 @@
-import os
-import time
-import pigpio
+from backend.backend import pigpio, clock, start_pigpio_daemon
+from instrumentation import instrumentation
 
 class Direction():
     '''
@@ -100,22 +99,12 @@ class StepperMotor():
         self._mode = mode
         self._gear_ratio = gear_ratio
         self._started_at = None
+        self._step_frequency = None
 
-        def is_pigpiod_running():
-            try:
-                n = int(os.popen('pidof pigpiod').read().splitlines()[0])
-            except:
-                n = 0
-            return bool(n)
+        start_pigpio_daemon()
 
-        try:
-            if not is_pigpiod_running():
-                os.system("sudo pigpiod")
-        finally:
-            time.sleep(0.5)
-
-        # Connect to pigpio daemon
-        self._pi = pigpio.pi()
+        # Connect to pigpio daemon, as soon as it accepts connections
+        self._pi = self._connect(timeout=5)
 
         # Set up pins as an output
         self._pi.set_mode(self._dir_pin, pigpio.OUTPUT)
@@ -128,6 +117,38 @@ class StepperMotor():
         # Set the given mode
         self.set_mode(mode)
         
+    def _connect(self, timeout:float, interval:float = 0.05):
+        '''
+        Connect to the pigpio daemon, retrying until it is ready.
+
+        Parameters
+        ----------
+        timeout : float
+            The maximum time to wait for the daemon, in seconds.
+        interval : float, default=0.05
+            The time between two connection attempts, in seconds.
+
+        Returns
+        -------
+        pi : pigpio.pi
+            The connection to the pigpio daemon.
+
+        Raises
+        ------
+        RuntimeError
+            If the daemon cannot be reached within the timeout.
+        '''
+        started_at = clock.time()
+        pi = pigpio.pi(show_errors=False)
+        while not pi.connected:
+            if clock.time() - started_at >= timeout:
+                raise RuntimeError('Cannot connect to the pigpio daemon '
+                                   'within {} s'.format(timeout))
+            clock.sleep(interval)
+            pi = pigpio.pi(show_errors=False)
+
+        return pi
+
     def _get_RPS_from_RPM(self, RPM:float):
         ''' 
         Return the RPS (revolutions-per-second)
@@ -256,7 +277,7 @@ class StepperMotor():
         self._pi.write(self._dir_pin, direction.get_value())  # Set direction. 0 DOWN, 1 UP
         
         # Let the driver to settle
-        time.sleep(0.01)
+        clock.sleep(0.01)
 
         # Set duty cycle and frequency
         if is_RPM:
@@ -265,9 +286,10 @@ class StepperMotor():
             PWMfreq = self._get_PWMfreq_from_RPS(speed)
 
         self._pi.hardware_PWM(self._step_pin, PWMfreq, 500000) # 2000Hz 50% dutycycle
+        self._step_frequency = PWMfreq
         
         # Set start time
-        self._started_at = time.time()
+        self._started_at = clock.time()
 
         return self._started_at
 
@@ -284,16 +306,18 @@ class StepperMotor():
         '''
         # Turn off the PWM
         self._pi.hardware_PWM(self._step_pin, 0, 0)
+        instrumentation.checkpoint('pwm_off', is_final=True)
         
         # Get running time
         run_interval = self.get_running_interval()
         self._started_at = None
+        self._step_frequency = None
         
         # Disable the stepper motor (active-low logic)
         self._pi.write(self._en_pin, 1)
         
         # Let the driver to settle
-        time.sleep(0.01)
+        clock.sleep(0.01)
 
         return run_interval
 
@@ -308,11 +332,18 @@ class StepperMotor():
             If the motor is not running, None is returned.
         '''
         if self._started_at is not None:
-            running_interval = time.time() - self._started_at
+            running_interval = clock.time() - self._started_at
         else:
             running_interval = None
         return running_interval
 
+    def get_step_frequency(self):
+        '''
+        Get the frequency of the steps, given in Hz, as rounded for the PWM.
+        If the motor is not running, None is returned.
+        '''
+        return self._step_frequency
+
     def hold_torque(self):
         self._pi.write(self._en_pin, 0)
 
@@ -320,5 +351,6 @@ class StepperMotor():
 
     def release_torque(self):
         self._pi.write(self._en_pin, 1)
+        instrumentation.checkpoint('torque_off', is_final=True)
 
         return
\ No newline at end of file
@@ -0,0 +1,281 @@
+import time
+import queue
+import bisect
+import multiprocessing
+import numpy as np
+from instrumentation import instrumentation
+
+# The renderer processes of the previous tests, whose windows may still be open
+_viewer_processes = []
+
+class LivePlot():
+    '''
+    Class drawing a live plot in the same process as the test loop.
+    '''
+    def __init__(self, xlim:float, ylim:float, xlabel:str, ylabel:str, title:str, is_scrolling:bool = False, max_points:int = 5000):
+        '''
+        Parameters
+        ----------
+        xlim : float
+            The upper limit of the x axis.
+        ylim : float
+            The upper limit of the y axis.
+        xlabel : str
+            The label of the x axis.
+        ylabel : str
+            The label of the y axis.
+        title : str
+            The title of the plot.
+        is_scrolling : bool, default=False
+            If True the x axis follows the latest data once
+            they exceed the given limit.
+        max_points : int, default=5000
+            The number of points above which the samples scrolled
+            out of view are dropped and the others are halved,
+            so that the memory employed is bounded.
+        '''
+        self._xlim = xlim
+        self._ylim = ylim
+        self._xlabel = xlabel
+        self._ylabel = ylabel
+        self._title = title
+        self._is_scrolling = is_scrolling
+        self._max_points = max_points
+
+        self._x = []
+        self._y = []
+        self._fig = None
+        self._ax = None
+        self._line = None
+
+    def start(self):
+        '''
+        Create the figure and show it without blocking.
+        '''
+        import matplotlib.pyplot as plt
+
+        self._fig = plt.figure(facecolor='#DEDEDE')
+        self._ax = plt.axes()
+        self._line, = self._ax.plot(self._x, self._y, lw=3)
+
+        self._ax.set_xlim([0, self._xlim])
+        self._ax.set_ylim([0, self._ylim])
+        self._ax.set_xlabel(self._xlabel)
+        self._ax.set_ylabel(self._ylabel)
+        self._ax.set_title(self._title)
+
+        self._fig.canvas.draw()
+        plt.show(block=False)
+
+        return
+
+    def update(self, x, y):
+        '''
+        Append new samples to the plot and redraw it.
+
+        Parameters
+        ----------
+        x : array_like
+            The new samples along the x axis.
+        y : array_like
+            The new samples along the y axis.
+        '''
+        self._x.extend(x)
+        self._y.extend(y)
+
+        if self._is_scrolling and len(self._x) > 0 and self._x[-1] > self._xlim:
+            self._ax.set_xlim([(self._xlim / 2), (self._xlim / 2) + self._x[-1]])
+            self._xlim = (self._xlim / 2) + self._x[-1]
+
+        if len(self._x) > self._max_points:
+            self._reduce()
+
+        with instrumentation.span('plot.blit'):
+            self._line.set_data(self._x, self._y)
+            self._ax.redraw_in_frame()
+            self._fig.canvas.blit(self._ax.bbox)
+            self._fig.canvas.flush_events()
+
+        return
+
+    def _reduce(self):
+        if self._is_scrolling:
+            # Samples scrolled out of view are dropped (x is the time, i.e. sorted)
+            n_hidden = bisect.bisect_left(self._x, self._ax.get_xlim()[0])
+            del self._x[:n_hidden]
+            del self._y[:n_hidden]
+
+        if len(self._x) > self._max_points:
+            # A decimated overview is kept
+            self._x = self._x[::2]
+            self._y = self._y[::2]
+
+        return
+
+    def stop(self):
+        return
+
+def _run_viewer(samples_queue:multiprocessing.Queue, config:dict, frame_rate:float):
+    '''
+    Entry point of the renderer process. Samples are drained
+    from the queue and the plot is redrawn at most at the
+    given frame rate, until None is received.
+    '''
+    plot = LivePlot(**config)
+    plot.start()
+
+    frame_interval = 1 / frame_rate
+    last_frame_at = 0
+    x = []
+    y = []
+    is_running = True
+
+    while is_running:
+        try:
+            while True:
+                samples = samples_queue.get_nowait()
+                if samples is None:
+                    is_running = False
+                    break
+                x.extend(samples[0])
+                y.extend(samples[1])
+        except queue.Empty:
+            pass
+
+        if len(x) > 0 and (time.time() - last_frame_at >= frame_interval or not is_running):
+            plot.update(x, y)
+            x = []
+            y = []
+            last_frame_at = time.time()
+        else:
+            plot._fig.canvas.flush_events()
+            time.sleep(frame_interval / 4)
+
+    # Keep the window open until it is closed by the operator
+    import matplotlib.pyplot as plt
+    plt.show()
+
+    return
+
+class PlotViewer():
+    '''
+    Class drawing a live plot in a separate renderer process.
+
+    Samples are decimated and sent to the renderer through a bounded
+    queue. If the renderer falls behind, frames are dropped, so that
+    the test loop never blocks on the plot.
+
+    The renderer is started from a fork server rather than forked from
+    the test process, whose acquisition and GPIO threads are running,
+    and it is not a daemon, so that its window is left open, even once
+    the test process is done, until it is closed by the operator.
+    '''
+    def __init__(self, xlim:float, ylim:float, xlabel:str, ylabel:str, title:str, is_scrolling:bool = False, decimation:int = 5, frame_rate:float = 10, queue_size:int = 8):
+        '''
+        Parameters
+        ----------
+        xlim, ylim, xlabel, ylabel, title, is_scrolling
+            See LivePlot.
+        decimation : int, default=5
+            Only one sample every decimation samples is sent
+            to the renderer.
+        frame_rate : float, default=10
+            The maximum number of redraws per second performed
+            by the renderer.
+        queue_size : int, default=8
+            The number of frames the renderer is allowed to fall
+            behind before new frames are dropped.
+        '''
+        self._config = {
+            'xlim': xlim,
+            'ylim': ylim,
+            'xlabel': xlabel,
+            'ylabel': ylabel,
+            'title': title,
+            'is_scrolling': is_scrolling
+        }
+        self._decimation = decimation
+        self._frame_rate = frame_rate
+        self._phase = 0
+        self.dropped_frames = 0
+
+        _reap_viewers()
+
+        # The fork server only preloads the plot module, so that the main script is not run again
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['display.plot'])
+        self._queue = context.Queue(maxsize=queue_size)
+        self._process = context.Process(target=_run_viewer, args=(self._queue, self._config, self._frame_rate), daemon=False)
+
+    def start(self):
+        '''
+        Start the renderer process.
+        '''
+        self._process.start()
+        _viewer_processes.append(self._process)
+
+        return
+
+    def update(self, x, y):
+        '''
+        Send new samples to the renderer, without waiting for it.
+
+        Parameters
+        ----------
+        x : array_like
+            The new samples along the x axis.
+        y : array_like
+            The new samples along the y axis.
+        '''
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        # Keep the decimation phase across consecutive batches
+        start = (-self._phase) % self._decimation
+        self._phase = (self._phase + len(x)) % self._decimation
+        x = x[start::self._decimation]
+        y = y[start::self._decimation]
+
+        if len(x) > 0:
+            try:
+                self._queue.put_nowait((x, y))
+            except queue.Full:
+                self.dropped_frames += 1
+                instrumentation.count('plot.dropped_frames')
+
+        return
+
+    def stop(self):
+        '''
+        Ask the renderer to draw the last frame. The window is
+        then left open until it is closed by the operator, and the
+        renderer is joined once it is, at the next test or at exit.
+        '''
+        try:
+            self._queue.put(None, timeout=1)
+        except queue.Full:
+            self._process.terminate()
+
+        return
+
+def _reap_viewers():
+    # The renderers whose window has been closed are joined, so that they do not pile up
+    for process in list(_viewer_processes):
+        if not process.is_alive():
+            process.join()
+            _viewer_processes.remove(process)
+
+    return
+
+class NullPlot():
+    '''
+    Class standing in for a live plot when no plot is to be drawn.
+    '''
+    def start(self):
+        return
+
+    def update(self, x, y):
+        return
+
+    def stop(self):
+        return
@@ -0,0 +1,159 @@
+import time
+from instrumentation import instrumentation
+from rich import box
+from rich.table import Table
+from rich.live import Live
+
+class LiveTable():
+    '''
+    Class displaying the live data table of a test.
+
+    The latest values are kept and the table is rebuilt only at
+    the refresh rate, and only if the displayed values changed.
+    '''
+    def __init__(self, loadcell_limit:float = None, force_offset:float = None, test_parameters:dict = None, refresh_per_second:float = 12):
+        '''
+        Parameters
+        ----------
+        loadcell_limit : float, default=None
+            The load cell limit, given in N. If None the load cell
+            usage is not displayed.
+        force_offset : float, default=None
+            The force offset of the load cell, given in N.
+        test_parameters : dict, default=None
+            The parameters of the running test. If given, the test
+            progress is displayed as well.
+        refresh_per_second : float, default=12
+            The maximum number of times per second the table is rendered.
+        '''
+        self._loadcell_limit = loadcell_limit
+        self._force_offset = force_offset if force_offset is not None else 0
+        self._test_type = test_parameters['test_type'] if test_parameters is not None else None
+        self._refresh_interval = 1 / refresh_per_second
+
+        if self._test_type == 'monotonic':
+            self._initial_absolute_position = test_parameters['initial_gauge_length']['value'] - test_parameters['clamps_distance']['value']
+            self._displacement = test_parameters['displacement']['value']
+
+        self._values = None
+        self._pending_values = None
+        self._rendered_at = 0
+        self._live = Live(self._generate_table(self._get_values(None, None)), auto_refresh=False, transient=True)
+
+    def __enter__(self):
+        self._live.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        self._live.stop()
+        return
+
+    def _get_values(self, force:float, absolute_position:float):
+        '''
+        Compute the values to display, rounded as they are shown.
+        '''
+        if force is None:
+            loadcell_usage = None
+        else:
+            if self._loadcell_limit is None:
+                loadcell_usage = None
+            else:
+                loadcell_usage = abs(round(((force + self._force_offset) / self._loadcell_limit) * 100, 2))
+            force = round(force, 5)
+
+        if absolute_position is None:
+            test_progress = None
+        else:
+            absolute_position = round(absolute_position, 2)
+            if self._test_type == 'monotonic':
+                test_progress = round(((absolute_position - self._initial_absolute_position) / self._displacement) * 100, 1)
+            else:
+                test_progress = None
+
+        return force, absolute_position, loadcell_usage, test_progress
+
+    def _generate_table(self, values:tuple):
+        force, absolute_position, loadcell_usage, test_progress = values
+        loadcell_usage_style = 'red' if loadcell_usage is not None and loadcell_usage > 85 else None
+
+        table = Table(box=box.ROUNDED)
+        table.add_column('Force', justify='center', min_width=12)
+        table.add_column('Absolute position', justify='center', min_width=20)
+        table.add_column('Load Cell usage', justify='center', min_width=12, style=loadcell_usage_style)
+
+        row = [
+            f'{_format(force)} N',
+            f'{_format(absolute_position)} mm',
+            f'{_format(loadcell_usage)} %'
+        ]
+
+        if self._test_type == 'monotonic':
+            table.add_column('Test progress', justify='center', min_width=12)
+            row.append(f'{_format(test_progress)} %')
+
+        table.add_row(*row)
+
+        return table
+
+    def update(self, force:float = None, absolute_position:float = None):
+        '''
+        Update the displayed values. They are always kept, while the
+        table is rendered only if the refresh interval has elapsed since
+        the last rendering and the displayed values changed.
+
+        Parameters
+        ----------
+        force : float, default=None
+            The current force, given in N.
+        absolute_position : float, default=None
+            The current absolute position of the crossbar, given in mm.
+        '''
+        self._pending_values = (force, absolute_position)
+
+        now = time.time()
+        if now - self._rendered_at >= self._refresh_interval:
+            self._render()
+            self._rendered_at = now
+
+        return
+
+    def flush(self):
+        '''
+        Render the latest values, if they have not been rendered yet.
+        '''
+        if self._pending_values is not None:
+            self._render()
+
+        return
+
+    def _render(self):
+        values = self._get_values(*self._pending_values)
+        if values != self._values:
+            with instrumentation.span('table.render'):
+                self._live.update(self._generate_table(values), refresh=True)
+            self._values = values
+        else:
+            instrumentation.count('table.unchanged')
+        self._pending_values = None
+
+        return
+
+def _format(value):
+    return '-' if value is None else value
+
+class NullTable():
+    '''
+    Class standing in for the live data table when nothing is to be displayed.
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return
+
+    def update(self, force:float = None, absolute_position:float = None):
+        return
+
+    def flush(self):
+        return
@@ -1,22 +1,37 @@
 import os
-from statistics import mean
-from InquirerPy import inquirer, validator
-from rich import box
 from rich.console import Console
-from rich.table import Table
-from rich.live import Live
 console = Console()
 from datetime import datetime
-from utility import utility
-from controller import controller
-from loadcell import loadcell
+from utility import utility, stream, decimation
+from controller import controller, compliance
+from loadcell import loadcell, watchdog, group
+from display import plot, table
+from instrumentation import instrumentation
+from catalogue import catalogue
 import json
-import scipy.signal
-from gpiozero import Button
-import matplotlib.pyplot as plt
+from backend.backend import Button, clock
 import constants
 import time
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+def initialize_devices(devices:dict):
+    timings = {}
+
+    def _initialize(name:str, constructor):
+        started_at = time.time()
+        device = constructor()
+        timings[name] = time.time() - started_at
+        return device
+
+    with console.status('Initializing devices...'):
+        with ThreadPoolExecutor(max_workers=len(devices)) as executor:
+            futures = {name: executor.submit(_initialize, name, constructor) for name, constructor in devices.items()}
+            initialized_devices = {name: future.result() for name, future in futures.items()}
+
+    for name in devices:
+        console.print('[#e5c07b]>[/#e5c07b]', f'Initializing {name}... ({timings[name]:.2f} s)', '[green]:heavy_check_mark:[/green]')
+
+    return initialized_devices
 
 def create_calibration_dir():
     dir = os.path.dirname(__file__)
@@ -26,25 +41,52 @@ def create_calibration_dir():
 
     return calibration_dir
 
-def create_output_dir(test_parameters:dict):
+def get_output_root():
     dir = os.path.dirname(__file__)
     path = '../output'
-    output_dir = os.path.join(dir, path)
-    os.makedirs(output_dir, exist_ok=True)
+    output_root = os.path.join(dir, path)
+    os.makedirs(output_root, exist_ok=True)
+
+    return output_root
 
+def create_output_dir(test_parameters:dict):
+    output_root = get_output_root()
+
+    # A single listing of the output directory, rather than a lookup for each copy
     test_id = test_parameters['test_id']
-    output_dir = os.path.join(dir, path, test_id)
+    existing_names = set(os.listdir(output_root))
     copy_idx = ''
     idx = 0
-    while os.path.isdir(output_dir + copy_idx):
+    while test_id + copy_idx in existing_names:
         idx = idx + 1
         copy_idx = '(' + str(idx) + ')'
-    output_dir = output_dir + copy_idx
+    output_dir = os.path.join(output_root, test_id + copy_idx)
     os.makedirs(output_dir)
 
     return output_dir
 
+def load_existing_calibration(calibration_dir:str, my_loadcell:loadcell.LoadCell):
+    if isinstance(my_loadcell, group.LoadCellGroup):
+        for member in my_loadcell.get_loadcells():
+            load_existing_calibration(calibration_dir, member)
+        return my_loadcell.is_calibrated
+
+    try:
+        with open(calibration_dir + r'/' + my_loadcell._calibration_filename) as f:
+            my_loadcell.set_calibration(json.load(f))
+    except:
+        my_loadcell.is_calibrated = False
+
+    return my_loadcell.is_calibrated
+
 def check_existing_calibration(calibration_dir:str, my_loadcell:loadcell.LoadCell):
+    from InquirerPy import inquirer
+
+    if isinstance(my_loadcell, group.LoadCellGroup):
+        for member in my_loadcell.get_loadcells():
+            check_existing_calibration(calibration_dir, member)
+        return
+
     try:
         with open(calibration_dir + r'/' + my_loadcell._calibration_filename) as f:
             calibration = json.load(f)
@@ -62,7 +104,24 @@ def check_existing_calibration(calibration_dir:str, my_loadcell:loadcell.LoadCel
 
     return
 
+def _print_reading_noise(my_loadcell:loadcell.LoadCell):
+    statistics = my_loadcell.get_statistics(is_force=False)
+    if statistics['variance'] is not None:
+        console.print('[#e5c07b]>[/#e5c07b]', 'Noise: {:.1f} counts (std), {:.0f} counts (range), over {} readings ({} rejected)'.format(statistics['variance'] ** 0.5, statistics['max'] - statistics['min'], statistics['count'], statistics['rejected']))
+
+    return
+
 def calibrate_loadcell(my_loadcell:loadcell.LoadCell, calibration_dir:str):
+    from InquirerPy import inquirer, validator
+
+    # The load cells of a group are calibrated one by one
+    if isinstance(my_loadcell, group.LoadCellGroup):
+        for member in my_loadcell.get_loadcells():
+            if member.is_calibrated is not True:
+                console.print('[#e5c07b]>[/#e5c07b]', 'Calibrating the load cell {}...'.format(member.name))
+                calibrate_loadcell(member, calibration_dir)
+        return
+
     loadcell_type = inquirer.select(
         message='Select the desired loadcell:',
         choices=[
@@ -97,17 +156,81 @@ def calibrate_loadcell(my_loadcell:loadcell.LoadCell, calibration_dir:str):
         ready_zero = inquirer.confirm(
             message='Zero-mass point calibration. Ready?'
         ).execute()
-    zero_raw = my_loadcell._get_raw_data_mean(n_readings=100, fake=False) #HACK#
+    zero_raw = my_loadcell._get_raw_data_mean(n_readings=100)
+    _print_reading_noise(my_loadcell)
 
     ready_mass = False
     while ready_mass is False:
         ready_mass = inquirer.confirm(
             message='Known-mass point calibration. Add the known mass. Ready?'
         ).execute()
-    mass_raw = my_loadcell._get_raw_data_mean(n_readings=100, fake=False) #HACK#
+    mass_raw = my_loadcell._get_raw_data_mean(n_readings=100)
+    _print_reading_noise(my_loadcell)
 
     my_loadcell.calibrate(loadcell_type, zero_raw, mass_raw, calibrating_mass, calibration_dir)
 
+    connection = catalogue.connect(get_output_root())
+    catalogue.add_calibration(connection, my_loadcell.get_calibration())
+    connection.close()
+
+    return
+
+def load_existing_compliance(calibration_dir:str, my_controller:controller.LinearController):
+    my_compliance = compliance.load(calibration_dir)
+    my_controller.set_compliance(my_compliance)
+    if my_compliance is not None:
+        console.print('[#e5c07b]>[/#e5c07b]', 'Loading the machine compliance...', '[green]:heavy_check_mark:[/green]')
+
+    return my_compliance is not None
+
+def calibrate_compliance(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, calibration_dir:str):
+    from InquirerPy import inquirer
+
+    if not my_loadcell.is_calibrated:
+        console.print('[#e5c07b]>[/#e5c07b]', 'The load cell has to be calibrated first', '[red]:cross_mark:[/red]')
+        return
+
+    loadcell_limit = my_loadcell.get_calibration()['loadcell_limit']['value']
+
+    is_ready = False
+    while is_ready is False:
+        is_ready = inquirer.confirm(
+            message='Clamp a rigid specimen (e.g. a steel plate). Ready?'
+        ).execute()
+
+    # Imported before the motor is started, rather than by the first batch
+    import scipy.signal
+    import pandas
+
+    batch_index = 0
+    last_force = None
+    with console.status('Loading the rigid specimen...'):
+        _, _, t0 = my_controller.run(constants.COMPLIANCE_SPEED, constants.COMPLIANCE_MAX_DISPLACEMENT, controller.UP)
+        my_loadcell.start_reading()
+        while my_controller.is_running:
+            if last_force is not None and last_force >= constants.COMPLIANCE_FORCE_RATIO * loadcell_limit:
+                my_controller.abort()
+            while my_loadcell.is_batch_ready(batch_index):
+                batch, batch_index = my_loadcell.get_batch(batch_index)
+                last_force = batch['F'].iloc[-1]
+        data = my_loadcell.stop_reading()
+
+    try:
+        my_compliance = compliance.fit(
+            force=data['F'],
+            # The run ends with an abort, so the displacement is taken from the motion log
+            displacement=my_controller.position_at(data['t'].to_numpy()) - my_controller.position_at(t0),
+            degree=constants.COMPLIANCE_DEGREE,
+            min_force=constants.COMPLIANCE_MIN_FORCE_RATIO * loadcell_limit
+        )
+    except ValueError:
+        console.print('[#e5c07b]>[/#e5c07b]', 'Calibrating the machine compliance... (the specimen has not been loaded)', '[red]:cross_mark:[/red]')
+        return
+
+    my_compliance.save(calibration_dir)
+    my_controller.set_compliance(my_compliance)
+    console.print('[#e5c07b]>[/#e5c07b]', 'Calibrating the machine compliance... ({:.4f} mm at {:.2f} N)'.format(float(my_compliance.get_deflection(loadcell_limit)), loadcell_limit), '[green]:heavy_check_mark:[/green]')
+
     return
 
 def calibrate_controller(my_controller:controller.LinearController):
@@ -134,52 +257,6 @@ def adjust_crossbar_position(my_controller:controller.LinearController, adjustme
 
     return
 
-def _generate_data_table(force:float, absolute_position:float, loadcell_limit:float, force_offset:float, test_parameters:dict = None):
-    if force is None:
-        force = '-'
-        loadcell_usage = '-'
-        loadcell_usage_style = None
-    elif loadcell_limit is None:
-        force = round(force, 5)
-        loadcell_usage = '-'
-        loadcell_usage_style = None
-    else:
-        force = round(force, 5)
-        if force_offset is None:
-            force_offset = 0
-        loadcell_usage = abs(round(((force + force_offset) / loadcell_limit) * 100, 2))
-        loadcell_usage_style = 'red' if loadcell_usage > 85 else None
-
-    if absolute_position is None:
-        absolute_position = '-'
-        test_progress = '-'
-    else:
-        absolute_position = round(absolute_position, 2)
-
-        if test_parameters is None:
-            test_progress = None
-        elif test_parameters['test_type'] is 'monotonic':
-            initial_absolute_position = test_parameters['initial_gauge_length']['value'] - test_parameters['clamps_distance']['value']
-            test_progress = ((absolute_position - initial_absolute_position) / test_parameters['displacement']['value']) * 100
-            test_progress = round(test_progress, 1)
-        elif test_parameters['test_type'] is 'cyclic':
-            pass
-
-    table = Table(box=box.ROUNDED)
-    table.add_column('Force', justify='center', min_width=12)
-    table.add_column('Absolute position', justify='center', min_width=20)
-    table.add_column('Load Cell usage', justify='center', min_width=12, style=loadcell_usage_style)
-
-    if test_parameters is None:
-        table.add_row(f'{force} N', f'{absolute_position} mm', f'{loadcell_usage} %')
-    elif test_parameters['test_type'] is 'monotonic':
-        table.add_column('Test progress', justify='center', min_width=12)        
-        table.add_row(f'{force} N', f'{absolute_position} mm', f'{loadcell_usage} %', f'{test_progress} %')
-    elif test_parameters['test_type'] is 'cyclic':
-        pass
-
-    return table
-
 def start_manual_mode(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, speed:float, mode_button_pin:int, up_button_pin:int, down_button_pin:int):
     mode = 0
     def _switch_mode():
@@ -211,14 +288,16 @@ def start_manual_mode(my_controller:controller.LinearController, my_loadcell:loa
     batch_index = 0
     batch_size = 25
 
-    live_table = Live(_generate_data_table(force, absolute_position, loadcell_limit, force_offset), refresh_per_second=12, transient=True)
+    live_table = table.LiveTable(loadcell_limit=loadcell_limit, force_offset=force_offset)
     
     with live_table:
         while mode == 0:            
             if my_loadcell.is_calibrated:
-                while my_loadcell.is_batch_ready(batch_index, batch_size):                
-                    batch, batch_index = my_loadcell.get_batch(batch_index, batch_size)
-                    force = mean(batch['F'])
+                # The force is followed by the running statistics, the readings are only discarded
+                while my_loadcell.is_batch_ready(batch_index, batch_size):
+                    batch_index += batch_size
+                    my_loadcell.discard_readings(batch_index, is_spilling=False)
+                force = my_loadcell.get_statistics()['ewm']
             else:
                 force = None
 
@@ -230,7 +309,7 @@ def start_manual_mode(my_controller:controller.LinearController, my_loadcell:loa
             else:
                 absolute_position = None
 
-            live_table.update(_generate_data_table(force, absolute_position, loadcell_limit, force_offset))
+            live_table.update(force=force, absolute_position=absolute_position)
 
             if down_button.is_active and my_controller._down_endstop.is_active:
                 my_controller.motor_stop()
@@ -252,6 +331,8 @@ def start_manual_mode(my_controller:controller.LinearController, my_loadcell:loa
     return
 
 def _read_monotonic_test_parameters():
+    from InquirerPy import inquirer, validator
+
     test_parameters = {}
 
     test_parameters['cross_section'] = {
@@ -298,6 +379,8 @@ def _read_monotonic_test_parameters():
     return test_parameters
 
 def _read_cyclic_test_parameters():
+    from InquirerPy import inquirer, validator
+
     test_parameters = {}
 
     test_parameters['cross_section'] = {
@@ -486,6 +569,8 @@ def _read_cyclic_test_parameters():
     return test_parameters
 
 def read_test_parameters(test_type:bool):
+    from InquirerPy import inquirer, validator
+
     is_confirmed = False
 
     timestamp = datetime.now().strftime('%Y_%m_%d-%H_%M_%S')
@@ -496,10 +581,10 @@ def read_test_parameters(test_type:bool):
     }
 
     while not is_confirmed:
-        if test_type is 'monotonic':
+        if test_type == 'monotonic':
             monotonic_test_parameters = _read_monotonic_test_parameters()
             test_parameters = {**test_parameters, **monotonic_test_parameters}
-        elif test_type is 'cyclic':
+        elif test_type == 'cyclic':
             cyclic_test_parameters = _read_cyclic_test_parameters()
             test_parameters = {**test_parameters, **cyclic_test_parameters}
         elif test_type == 'static':
@@ -525,6 +610,9 @@ def save_test_parameters(my_controller:controller.LinearController, my_loadcell:
         test_parameters['calibration'] = calibration
         test_parameters['loadcell_type'] = '{} {}'.format(calibration['loadcell_limit']['value'], calibration['loadcell_limit']['unit'])
     
+    if my_controller.get_compliance() is not None:
+        test_parameters['compliance'] = my_controller.get_compliance().get_calibration()
+
     if my_controller.is_calibrated:
         if test_parameters['test_type'] == 'monotonic' or test_parameters['test_type'] == 'cyclic':
             test_parameters['initial_gauge_length'] = {
@@ -536,9 +624,93 @@ def save_test_parameters(my_controller:controller.LinearController, my_loadcell:
     with open(output_dir + r'/' + filename, 'w') as f:
         json.dump(test_parameters, f)
 
+    connection = catalogue.connect(os.path.dirname(os.path.normpath(output_dir)))
+    catalogue.add_test(connection, output_dir, test_parameters)
+    connection.close()
+
     return
 
-def _start_monotonic_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, test_parameters:dict, stop_button_pin:int):
+def load_test_parameters(spec_path:str):
+    with open(spec_path) as f:
+        test_parameters = json.load(f)
+
+    if test_parameters.get('test_type') not in ['monotonic', 'cyclic', 'static']:
+        raise ValueError('Parameter "test_type" has to be "monotonic", "cyclic" or "static". '
+                         'Received: {}'.format(test_parameters.get('test_type')))
+
+    timestamp = datetime.now().strftime('%Y_%m_%d-%H_%M_%S')
+    test_parameters['date'] = timestamp
+    if 'test_id' not in test_parameters:
+        test_parameters['test_id'] = timestamp
+
+    return test_parameters
+
+def _create_plot(is_headless:bool, is_plot_detached:bool, **kwargs):
+    if is_headless:
+        live_plot = plot.NullPlot()
+    elif is_plot_detached:
+        live_plot = plot.PlotViewer(**kwargs)
+    else:
+        live_plot = plot.LivePlot(**kwargs)
+
+    return live_plot
+
+def _create_table(is_headless:bool, **kwargs):
+    if is_headless:
+        live_table = table.NullTable()
+    else:
+        live_table = table.LiveTable(**kwargs)
+
+    return live_table
+
+def _create_watchdog(my_loadcell:loadcell.LoadCell, on_trip):
+    if isinstance(my_loadcell, group.LoadCellGroup):
+        my_watchdog = watchdog.WatchdogGroup(
+            calibrations=[member.get_calibration() for member in my_loadcell.get_loadcells()],
+            force_offsets=[member.get_offset(is_force=True) for member in my_loadcell.get_loadcells()],
+            on_trip=on_trip
+        )
+    else:
+        my_watchdog = watchdog.Watchdog(
+            calibration=my_loadcell.get_calibration(),
+            force_offset=my_loadcell.get_offset(is_force=True),
+            on_trip=on_trip
+        )
+    my_loadcell.set_watchdog(my_watchdog)
+
+    return my_watchdog
+
+def _print_watchdog_trip(my_watchdog:watchdog.Watchdog):
+    if my_watchdog.reason == watchdog.OVERLOAD:
+        console.print('[#e5c07b]>[/#e5c07b]', '[red]Load cell overload: the test has been stopped[/red]')
+    elif my_watchdog.reason == watchdog.FAILURE:
+        console.print('[#e5c07b]>[/#e5c07b]', 'Specimen failure at {:.2f} N: the test has been stopped'.format(my_watchdog.get_peak_force()))
+
+    return
+
+def _print_channel_rates(my_loadcell:loadcell.LoadCell):
+    rates = my_loadcell.get_channel_rates()
+    if rates is not None:
+        console.print('[#e5c07b]>[/#e5c07b]', 'Effective rates: {}'.format(', '.join('channel {} {:.1f} SPS'.format(channel, rate) for channel, rate in rates.items())))
+
+    return
+
+def _wait_for_capture(my_loadcell:loadcell.LoadCell):
+    '''
+    Keep reading until the post-trigger window of the
+    captured event, if any, is completed.
+    '''
+    if my_loadcell.is_capture_pending():
+        with console.status('Capturing post-trigger data...'):
+            # The post-trigger window of a replayed recording may end with it
+            while my_loadcell.is_capture_pending() and not my_loadcell.is_exhausted():
+                clock.sleep(0.01)
+
+    return
+
+def _start_monotonic_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, test_parameters:dict, stop_button_pin:int, is_plot_detached:bool = False, is_headless:bool = False, batch_writer:stream.BatchWriter = None):
+    import scipy.signal
+
     console.print('[#e5c07b]>[/#e5c07b]', 'Collecting data...')
     printed_lines = 1
     
@@ -548,89 +720,118 @@ def _start_monotonic_test(my_controller:controller.LinearController, my_loadcell
     initial_gauge_length = test_parameters['initial_gauge_length']['value']
     initial_absolute_position = my_controller.get_absolute_position()
     loadcell_limit = my_loadcell.get_calibration()['loadcell_limit']['value']
+    my_compliance = my_controller.get_compliance()
 
     stop_flag = False
     def _switch_stop_flag():
         nonlocal stop_flag
+        instrumentation.mark('test.stop_button')
+        instrumentation.trigger('stop_button')
+        my_loadcell.trigger_capture('stop_button')
         stop_flag = True
         return
 
     stop_button = Button(pin=stop_button_pin)
     stop_button.when_released = lambda: _switch_stop_flag()
 
-    strains = []
-    forces = []
+    def _handle_watchdog_trip(reason:str):
+        nonlocal stop_flag
+        stop_flag = True
+        my_controller.abort()
+        my_loadcell.trigger_capture(reason)
+        return
+
+    my_watchdog = _create_watchdog(my_loadcell, on_trip=_handle_watchdog_trip)
+
+    # Only the latest values are kept, the readings are spilled to disk by the load cell
+    last_position = None
+    last_force = None
     batch_index = 0
 
-    fig = plt.figure(facecolor='#DEDEDE')
-    ax = plt.axes()
-    line, = ax.plot(forces, strains, lw=3)
-
-    xlim = round((displacement / initial_gauge_length) * 1.1 * 100) # 10% margin
-    ylim = loadcell_limit
-    ax.set_xlim([0, xlim])
-    ax.set_ylim([0, ylim])
-    ax.set_xlabel('Strain (%)')
-    ax.set_ylabel('Force (N)')
-    ax.set_title('Force vs. Strain')
-    
-    fig.canvas.draw()
-    plt.show(block=False)
+    live_plot = _create_plot(
+        is_headless,
+        is_plot_detached,
+        xlim=round((displacement / initial_gauge_length) * 1.1 * 100), # 10% margin
+        ylim=loadcell_limit,
+        xlabel='Strain (%)',
+        ylabel='Force (N)',
+        title='Force vs. Strain'
+    )
+    live_plot.start()
 
-    live_table = Live(_generate_data_table(None, None, None, None), refresh_per_second=12, transient=True)
+    live_table = _create_table(
+        is_headless,
+        loadcell_limit=loadcell_limit,
+        force_offset=my_loadcell.get_offset(is_force=True),
+        test_parameters=test_parameters
+    )
 
     _, _, t0 = my_controller.run(linear_speed, displacement, controller.UP)
+    initial_position = my_controller.position_at(t0)
+    my_loadcell.set_capture_origin(t0)
     my_loadcell.start_reading()
 
     with live_table:
         while my_controller.is_running:
+            # The recording replayed in place of the load cell is over
+            if my_loadcell.is_exhausted():
+                stop_flag = True
             if stop_flag:
                 my_controller.abort()
             else:
                 while my_loadcell.is_batch_ready(batch_index):
                     batch, batch_index = my_loadcell.get_batch(batch_index)
+                    positions = my_controller.position_at(batch['t'].to_numpy())
                     batch['t'] = batch['t'] - t0
-                    batch['strain'] = (batch['t'] * linear_speed / initial_gauge_length) * 100
-
-                    forces.extend(batch['F'])
-                    strains.extend(batch['strain'])
-
-                    line.set_data(strains, forces)
-                    ax.redraw_in_frame()
-                    fig.canvas.blit(ax.bbox)
-                    fig.canvas.flush_events()
+                    batch['displacement'] = positions - initial_position
+                    if my_compliance is not None:
+                        batch['displacement'] = my_compliance.correct(batch['displacement'].to_numpy(), batch['F'].to_numpy())
+                    batch['strain'] = (batch['displacement'] / initial_gauge_length) * 100
+
+                    last_force = batch['F'].iloc[-1]
+                    last_position = positions[-1]
+                    my_loadcell.discard_readings(batch_index)
+                    if batch_writer is not None:
+                        batch_writer.write(batch)
+
+                    live_plot.update(batch['strain'], batch['F'])
                 else:
                     pass
                     
                 live_table.update(
-                    _generate_data_table(
-                        force=forces[-1] if len(forces) > 0 else None, 
-                        absolute_position=(initial_absolute_position + (strains[-1] * initial_gauge_length / 100)) if len(strains) > 0 else None,
-                        loadcell_limit=loadcell_limit,
-                        force_offset=my_loadcell.get_offset(is_force=True),
-                        test_parameters=test_parameters
-                    )
+                    force=last_force,
+                    absolute_position=(initial_absolute_position + last_position - initial_position) if last_position is not None else None
                 )
 
     utility.delete_last_lines(printed_lines)
     console.print('[#e5c07b]>[/#e5c07b]', 'Collecting data...', '[green]:heavy_check_mark:[/green]')
 
-    data = my_loadcell.stop_reading()
+    _print_watchdog_trip(my_watchdog)
+    _wait_for_capture(my_loadcell)
+
+    data = my_loadcell.stop_reading(is_resampled=constants.IS_RESAMPLING_ENABLED)
+    my_loadcell.set_watchdog(None)
+    _print_channel_rates(my_loadcell)
     stop_button.when_released = None
+    live_plot.stop()
 
+    data['displacement'] = my_controller.position_at(data['t'].to_numpy()) - initial_position
     data['t'] = data['t'] - t0
-    data['displacement'] = data['t'] * linear_speed
     data['F_raw'] = data['F']
     data['F_med20'] = scipy.signal.medfilt(data['F'], 21)
+    if my_compliance is not None:
+        # The filtered force keeps the noise of the readings out of the displacement
+        data['displacement_raw'] = data['displacement']
+        data['displacement'] = my_compliance.correct(data['displacement_raw'], data['F_med20'])
     data['stress_raw'] = data['F_raw'] / cross_section
     data['stress_med20'] = data['F_med20'] / cross_section
-    data['strain'] = (data['t'] * linear_speed / initial_gauge_length) * 100
+    data['strain'] = (data['displacement'] / initial_gauge_length) * 100
     data.loc[data.index[0], 'cross_section'] = cross_section
     data.loc[data.index[0], 'initial_gauge_length'] = initial_gauge_length
 
     return data
 
-def _start_cyclic_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, test_parameters:dict, stop_button_pin:int):
+def _start_cyclic_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, test_parameters:dict, stop_button_pin:int, is_plot_detached:bool = False, is_headless:bool = False, batch_writer:stream.BatchWriter = None):
     console.print('[#e5c07b]>[/#e5c07b]', 'Collecting data...')
     printed_lines = 1
     
@@ -640,6 +841,7 @@ def _start_cyclic_test(my_controller:controller.LinearController, my_loadcell:lo
     initial_gauge_length = test_parameters['initial_gauge_length']['value']
     initial_absolute_position = my_controller.get_absolute_position()
     loadcell_limit = my_loadcell.get_calibration()['loadcell_limit']['value']
+    my_compliance = my_controller.get_compliance()
 
     # CYCLIC PHASE PARAMETERS
     cyclic_upper_limit = test_parameters['cyclic_upper_limit']['value']
@@ -665,105 +867,127 @@ def _start_cyclic_test(my_controller:controller.LinearController, my_loadcell:lo
     stop_flag = False
     def _switch_stop_flag():
         nonlocal stop_flag
+        instrumentation.mark('test.stop_button')
+        instrumentation.trigger('stop_button')
+        my_loadcell.trigger_capture('stop_button')
         stop_flag = True
         return
 
     stop_button = Button(pin=stop_button_pin)
     stop_button.when_released = lambda: _switch_stop_flag()
 
-    strains = []
-    forces = []
+    def _handle_watchdog_trip(reason:str):
+        nonlocal stop_flag
+        stop_flag = True
+        my_controller.abort()
+        my_loadcell.trigger_capture(reason)
+        return
+
+    my_watchdog = _create_watchdog(my_loadcell, on_trip=_handle_watchdog_trip)
 
-    fig = plt.figure(facecolor='#DEDEDE')
-    ax = plt.axes()
-    line, = ax.plot(forces, strains, lw=3)
+    # Only the latest values are kept, the readings are spilled to disk by the load cell
+    last_position = None
+    last_force = None
 
-    xlim = round((cyclic_upper_limit / initial_gauge_length) * 1.1 * 100) # 10% margin
-    ylim = loadcell_limit
-    ax.set_xlim([0, xlim])
-    ax.set_ylim([0, ylim])
-    ax.set_xlabel('Strain (%)')
-    ax.set_ylabel('Force (N)')
-    ax.set_title('Force vs. Strain')
-    
-    fig.canvas.draw()
-    plt.show(block=False)
+    live_plot = _create_plot(
+        is_headless,
+        is_plot_detached,
+        xlim=round((cyclic_upper_limit / initial_gauge_length) * 1.1 * 100), # 10% margin
+        ylim=loadcell_limit,
+        xlabel='Strain (%)',
+        ylabel='Force (N)',
+        title='Force vs. Strain'
+    )
+    live_plot.start()
 
-    t0 = time.time()
+    t0 = clock.time()
+    initial_position = my_controller.position_at(t0)
+    my_loadcell.set_capture_origin(t0)
 
     data_list = []
     
     if is_pretensioning_set:
         # PRETENSIONING PHASE - RUN
-        live_table = Live(_generate_data_table(None, None, None), refresh_per_second=12, transient=True)
+        live_table = _create_table(is_headless, loadcell_limit=loadcell_limit, force_offset=my_loadcell.get_offset(is_force=True))
         batch_index = 0
         if stop_flag is False:
+            # Failures are only detected while loading, the force dropping as planned otherwise
+            my_watchdog.set_failure_armed(True)
             my_controller.run(pretensioning_speed, cyclic_upper_limit, controller.UP)
             my_loadcell.start_reading()
 
             with live_table:
                 while my_controller.is_running:
+                    # The recording replayed in place of the load cell is over
+                    if my_loadcell.is_exhausted():
+                        stop_flag = True
                     if stop_flag:
                         my_controller.abort()
                     else:
                         while my_loadcell.is_batch_ready(batch_index):
                             batch, batch_index = my_loadcell.get_batch(batch_index)
+                            positions = my_controller.position_at(batch['t'].to_numpy())
                             batch['t'] = batch['t'] - t0
-                            batch['strain'] = (batch['t'] * pretensioning_speed / initial_gauge_length) * 100
-
-                            forces.extend(batch['F'])
-                            strains.extend(batch['strain'])
-
-                            line.set_data(strains, forces)
-                            ax.redraw_in_frame()
-                            fig.canvas.blit(ax.bbox)
-                            fig.canvas.flush_events()
+                            batch['displacement'] = positions - initial_position
+                            if my_compliance is not None:
+                                batch['displacement'] = my_compliance.correct(batch['displacement'].to_numpy(), batch['F'].to_numpy())
+                            batch['strain'] = (batch['displacement'] / initial_gauge_length) * 100
+
+                            last_force = batch['F'].iloc[-1]
+                            last_position = positions[-1]
+                            my_loadcell.discard_readings(batch_index)
+                            if batch_writer is not None:
+                                batch_writer.write(batch)
+
+                            live_plot.update(batch['strain'], batch['F'])
                         else:
                             pass
                             
                         live_table.update(
-                            _generate_data_table(
-                                force=forces[-1] if len(forces) > 0 else None, 
-                                absolute_position=(initial_absolute_position + (strains[-1] * initial_gauge_length / 100)) if len(strains) > 0 else None,
-                                loadcell_limit=loadcell_limit
-                            )
+                            force=last_force,
+                            absolute_position=(initial_absolute_position + last_position - initial_position) if last_position is not None else None
                         )
 
             data_list.append(my_loadcell.stop_reading())
 
         # PRETENSIONING PHASE - RETURN DELAY
-        live_table = Live(_generate_data_table(None, None, None), refresh_per_second=12, transient=True)
+        live_table = _create_table(is_headless, loadcell_limit=loadcell_limit, force_offset=my_loadcell.get_offset(is_force=True))
         batch_index = 0
         if stop_flag is False:
+            my_watchdog.set_failure_armed(False)
             t0_delay = my_controller.hold_torque()
             my_loadcell.start_reading()
 
             with live_table:
                 while my_controller.is_holding:
-                    if stop_flag or time.time() - t0_delay >= pretensioning_return_delay:
+                    # The recording replayed in place of the load cell is over
+                    if my_loadcell.is_exhausted():
+                        stop_flag = True
+                    if stop_flag or clock.time() - t0_delay >= pretensioning_return_delay:
                         my_controller.release_torque()
                     else:
                         while my_loadcell.is_batch_ready(batch_index):
                             batch, batch_index = my_loadcell.get_batch(batch_index)
+                            positions = my_controller.position_at(batch['t'].to_numpy())
                             batch['t'] = batch['t'] - t0
-                            batch['strain'] = ((my_controller.get_absolute_position() - initial_absolute_position) / initial_gauge_length) * 100
-
-                            forces.extend(batch['F'])
-                            strains.extend(batch['strain'])
-
-                            line.set_data(strains, forces)
-                            ax.redraw_in_frame()
-                            fig.canvas.blit(ax.bbox)
-                            fig.canvas.flush_events()
+                            batch['displacement'] = positions - initial_position
+                            if my_compliance is not None:
+                                batch['displacement'] = my_compliance.correct(batch['displacement'].to_numpy(), batch['F'].to_numpy())
+                            batch['strain'] = (batch['displacement'] / initial_gauge_length) * 100
+
+                            last_force = batch['F'].iloc[-1]
+                            last_position = positions[-1]
+                            my_loadcell.discard_readings(batch_index)
+                            if batch_writer is not None:
+                                batch_writer.write(batch)
+
+                            live_plot.update(batch['strain'], batch['F'])
                         else:
                             pass
                             
                         live_table.update(
-                            _generate_data_table(
-                                force=forces[-1] if len(forces) > 0 else None, 
-                                absolute_position=(initial_absolute_position + (strains[-1] * initial_gauge_length / 100)) if len(strains) > 0 else None,
-                                loadcell_limit=loadcell_limit
-                            )
+                            force=last_force,
+                            absolute_position=(initial_absolute_position + last_position - initial_position) if last_position is not None else None
                         )
 
             data_list.append(my_loadcell.stop_reading())
@@ -771,10 +995,17 @@ def _start_cyclic_test(my_controller:controller.LinearController, my_loadcell:lo
     utility.delete_last_lines(printed_lines)
     console.print('[#e5c07b]>[/#e5c07b]', 'Collecting data...', '[green]:heavy_check_mark:[/green]')
 
+    _print_watchdog_trip(my_watchdog)
+
+    my_loadcell.set_watchdog(None)
     stop_button.when_released = None
+    live_plot.stop()
+
     return
 
-def _start_static_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, stop_button_pin:int):
+def _start_static_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, stop_button_pin:int, is_plot_detached:bool = False, is_headless:bool = False, batch_writer:stream.BatchWriter = None):
+    import scipy.signal
+
     console.print('[#e5c07b]>[/#e5c07b]', 'Collecting data...')
     printed_lines = 1
 
@@ -783,38 +1014,42 @@ def _start_static_test(my_controller:controller.LinearController, my_loadcell:lo
     stop_flag = False
     def _switch_stop_flag():
         nonlocal stop_flag
+        instrumentation.mark('test.stop_button')
+        instrumentation.trigger('stop_button')
+        my_loadcell.trigger_capture('stop_button')
         stop_flag = True
         return
 
     stop_button = Button(pin=stop_button_pin)
     stop_button.when_released = lambda: _switch_stop_flag()
 
-    timings = []
-    forces = []
+    # Static tests may last for days: the consumed readings are spilled to disk
+    last_force = None
     batch_index = 0
 
-    fig = plt.figure(facecolor='#DEDEDE')
-    ax = plt.axes()
-    line, = ax.plot(timings, forces, lw=3)
-
-    xlim = 30 # in seconds
-    ylim = loadcell_limit
-    ax.set_xlim([0, xlim])
-    ax.set_ylim([0, ylim])
-    ax.set_xlabel('Time (s)')
-    ax.set_ylabel('Force (N)')
-    ax.set_title('Force vs. Time')
-    
-    fig.canvas.draw()
-    plt.show(block=False)
+    live_plot = _create_plot(
+        is_headless,
+        is_plot_detached,
+        xlim=30, # in seconds
+        ylim=loadcell_limit,
+        xlabel='Time (s)',
+        ylabel='Force (N)',
+        title='Force vs. Time',
+        is_scrolling=True
+    )
+    live_plot.start()
 
-    live_table = Live(_generate_data_table(None, None, None, None), refresh_per_second=12, transient=True)
+    live_table = _create_table(is_headless, loadcell_limit=loadcell_limit, force_offset=my_loadcell.get_offset(is_force=True))
 
     t0 = my_controller.hold_torque()
+    my_loadcell.set_capture_origin(t0)
     my_loadcell.start_reading()
 
     with live_table:
         while my_controller.is_holding:
+            # The recording replayed in place of the load cell is over
+            if my_loadcell.is_exhausted():
+                stop_flag = True
             if stop_flag:
                 my_controller.release_torque()
             else:
@@ -822,34 +1057,26 @@ def _start_static_test(my_controller:controller.LinearController, my_loadcell:lo
                     batch, batch_index = my_loadcell.get_batch(batch_index)
                     batch['t'] = batch['t'] - t0
 
-                    forces.extend(batch['F'])
-                    timings.extend(batch['t'])
-
-                    if batch['t'].iloc[-1] > xlim:
-                        ax.set_xlim([(xlim / 2), (xlim / 2) + batch['t'].iloc[-1]])
-                        xlim = (xlim / 2) + batch['t'].iloc[-1]
+                    last_force = batch['F'].iloc[-1]
+                    my_loadcell.discard_readings(batch_index)
+                    if batch_writer is not None:
+                        batch_writer.write(batch)
 
-                    line.set_data(timings, forces)
-                    ax.redraw_in_frame()
-                    fig.canvas.blit(ax.bbox)
-                    fig.canvas.flush_events()
+                    live_plot.update(batch['t'], batch['F'])
                 else:
                     pass
 
-                live_table.update(
-                    _generate_data_table(
-                        force=forces[-1] if len(forces) > 0 else None,
-                        absolute_position=None,
-                        loadcell_limit=loadcell_limit,
-                        force_offset=my_loadcell.get_offset(is_force=True)
-                    )
-                )
+                live_table.update(force=last_force)
 
     utility.delete_last_lines(printed_lines)
     console.print('[#e5c07b]>[/#e5c07b]', 'Collecting data...', '[green]:heavy_check_mark:[/green]')
 
+    _wait_for_capture(my_loadcell)
+
     data = my_loadcell.stop_reading()
     stop_button.when_released = None
+    _print_channel_rates(my_loadcell)
+    live_plot.stop()
 
     data['t'] = data['t'] - t0
     data['F_raw'] = data['F']
@@ -857,35 +1084,178 @@ def _start_static_test(my_controller:controller.LinearController, my_loadcell:lo
 
     return data
 
-def start_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, test_parameters:dict, output_dir:str, stop_button_pin:int):
+def _decimate_static_data(data, loadcell_limit:float):
+    '''
+    Return the force of a static test stored with a density decaying
+    logarithmically with the time, as LogTimeDecimator does.
+    '''
+    storage = decimation.LogTimeDecimator(
+        ratio=constants.STATIC_DECIMATION_RATIO,
+        change_threshold=constants.STATIC_CHANGE_RATIO * loadcell_limit
+    )
+    storage.add(data['t'].to_numpy(dtype=float), data['F'].to_numpy(dtype=float))
+
+    return storage.get_data()
+
+def start_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, test_parameters:dict, output_dir:str, stop_button_pin:int, is_plot_detached:bool = False, is_headless:bool = False, is_capturing:bool = False):
     data = None
+    started_at = clock.time()
+
+    # The modules processing the batches are imported before the motor is started, rather than by the first batch
+    import scipy.signal
+    import pandas
+
+    instrumentation.reset()
+
+    # The readings are spilled next to the test data while running
+    my_loadcell.set_spill_path(output_dir + r'/' + test_parameters['test_id'] + '_readings.bin')
+
+    if is_capturing:
+        my_loadcell.start_capture(pre_samples=constants.CAPTURE_PRE_SAMPLES, post_samples=constants.CAPTURE_POST_SAMPLES)
+
+    # Headless tests stream the consumed batches, as no live view is available
+    if is_headless:
+        batch_writer = stream.BatchWriter(output_dir + r'/' + test_parameters['test_id'] + '_stream.csv')
+    else:
+        batch_writer = None
 
     if test_parameters['test_type'] == 'monotonic':
         data = _start_monotonic_test(
             my_controller=my_controller,
             my_loadcell=my_loadcell,
             test_parameters=test_parameters,
-            stop_button_pin=stop_button_pin
+            stop_button_pin=stop_button_pin,
+            is_plot_detached=is_plot_detached,
+            is_headless=is_headless,
+            batch_writer=batch_writer
         )
     elif test_parameters['test_type'] == 'cyclic':
         data = _start_cyclic_test(
             my_controller=my_controller,
             my_loadcell=my_loadcell,
             test_parameters=test_parameters,
-            stop_button_pin=stop_button_pin
+            stop_button_pin=stop_button_pin,
+            is_plot_detached=is_plot_detached,
+            is_headless=is_headless,
+            batch_writer=batch_writer
         )
     elif test_parameters['test_type'] == 'static':
         data = _start_static_test(
             my_controller=my_controller,
             my_loadcell=my_loadcell,
-            stop_button_pin=stop_button_pin
+            stop_button_pin=stop_button_pin,
+            is_plot_detached=is_plot_detached,
+            is_headless=is_headless,
+            batch_writer=batch_writer
         )
 
+    if batch_writer is not None:
+        batch_writer.close()
+
+    if instrumentation.is_enabled():
+        _print_latencies()
+        instrumentation.save(output_dir)
+    if instrumentation.is_tracing():
+        instrumentation.save_trace(output_dir)
+
+    my_loadcell.set_spill_path(None)
+    captured_data = my_loadcell.stop_capture()
+
     with console.status('Saving test data...'):
         filename = test_parameters['test_id'] + '.csv'
         if data is not None:
+            # The whole record is decimated at once, in the time base of the final fit
+            if test_parameters['test_type'] == 'static' and constants.IS_STATIC_DECIMATION_ENABLED:
+                decimated_data = _decimate_static_data(data, my_loadcell.get_calibration()['loadcell_limit']['value'])
+                decimated_data.to_csv(output_dir + r'/' + test_parameters['test_id'] + '_decimated.csv', index=False)
+            # The full rate data around the triggers is saved apart
+            if captured_data is not None and len(captured_data) > 0:
+                data = data.iloc[::constants.CAPTURE_DECIMATION]
             data.to_csv(output_dir + r'/' + filename, index=False)
+        if captured_data is not None:
+            captured_data.to_csv(output_dir + r'/' + test_parameters['test_id'] + '_capture.csv', index=False)
+        # The motions of the crossbar during the test, from which its position can be reconstructed
+        motion_segments = my_controller.get_motion_log().get_segments(since=started_at)
+        if len(motion_segments) > 0:
+            import pandas as pd
+            pd.DataFrame(motion_segments).to_csv(output_dir + r'/' + test_parameters['test_id'] + '_motion.csv', index=False)
 
     console.print('[#e5c07b]>[/#e5c07b]', 'Saving test data...', '[green]:heavy_check_mark:[/green]')
     
-    return
\ No newline at end of file
+    return
+
+def _print_latencies():
+    for name, histogram in instrumentation.get_latencies().items():
+        console.print(
+            '[#e5c07b]>[/#e5c07b]',
+            'Latency {}: p50 {:.3f} ms, p90 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms ({} samples)'.format(
+                name.replace('_', ' '),
+                histogram.get_percentile(50) / 1e6,
+                histogram.get_percentile(90) / 1e6,
+                histogram.get_percentile(99) / 1e6,
+                histogram.max / 1e6,
+                histogram.count
+            )
+        )
+
+    return
+
+def start_headless_test(my_controller:controller.LinearController, my_loadcell:loadcell.LoadCell, spec_path:str, stop_button_pin:int, adjustment_position:float = None, replay_path:str = None, replay_speed:float = 1, is_headless:bool = True, is_capturing:bool = False):
+    from loadcell import replay
+
+    test_parameters = load_test_parameters(spec_path)
+
+    # Replayed forces are joined to the positions of the live crossbar, which moves in real time
+    if replay_path is not None and replay_speed != 1 and test_parameters['test_type'] != 'static':
+        console.print('[#e5c07b]>[/#e5c07b]', 'Only static tests can be replayed at a speed other than 1. Received: {}'.format(replay_speed), '[red]:cross_mark:[/red]')
+        return None
+
+    # The calibration stored with the test parameters takes precedence over the saved one
+    if 'calibration' in test_parameters and test_parameters['calibration'] is not None:
+        my_loadcell.set_calibration(test_parameters['calibration'])
+    else:
+        load_existing_calibration(create_calibration_dir(), my_loadcell)
+
+    if not my_loadcell.is_calibrated:
+        console.print('[#e5c07b]>[/#e5c07b]', 'No load cell calibration available', '[red]:cross_mark:[/red]')
+        return None
+
+    if 'compliance' in test_parameters and test_parameters['compliance'] is not None:
+        my_controller.set_compliance(compliance.Compliance(test_parameters['compliance']))
+    else:
+        load_existing_compliance(create_calibration_dir(), my_controller)
+
+    if test_parameters['test_type'] == 'monotonic' or test_parameters['test_type'] == 'cyclic':
+        if adjustment_position is None:
+            if 'initial_gauge_length' not in test_parameters:
+                console.print('[#e5c07b]>[/#e5c07b]', 'No crossbar initial position available', '[red]:cross_mark:[/red]')
+                return None
+            adjustment_position = test_parameters['initial_gauge_length']['value'] - test_parameters['clamps_distance']['value']
+
+        calibrate_controller(my_controller=my_controller)
+        if not my_controller.is_calibrated:
+            return None
+        adjust_crossbar_position(my_controller=my_controller, adjustment_position=adjustment_position)
+
+    output_dir = create_output_dir(test_parameters)
+    save_test_parameters(my_controller, my_loadcell, test_parameters, output_dir)
+
+    # Readings of a recorded test are fed through the same pipeline as the HX711 ones
+    if replay_path is not None:
+        my_loadcell.set_source(replay.ReplaySource(replay_path, speed=replay_speed))
+
+    try:
+        start_test(
+            my_controller,
+            my_loadcell,
+            test_parameters,
+            output_dir=output_dir,
+            stop_button_pin=stop_button_pin,
+            is_plot_detached=constants.IS_PLOT_DETACHED,
+            is_headless=is_headless,
+            is_capturing=is_capturing
+        )
+    finally:
+        my_loadcell.set_source(None)
+
+    return output_dir
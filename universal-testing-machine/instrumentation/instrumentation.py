@@ -0,0 +1,325 @@
+'''
+Low-overhead instrumentation of the hot paths.
+
+Spans (and instrumented functions) measure durations with
+time.perf_counter_ns and aggregate them into histograms with
+power-of-two buckets, while counters count events.
+Instrumentation is disabled by default and can be switched on and off
+at runtime: while disabled, span() returns a shared no-op context manager.
+
+Latency chains measure reaction times across threads: a chain is started
+by trigger() when an event occurs (e.g. an endstop is hit) and each
+checkpoint() reached afterwards (e.g. the PWM being turned off) records
+the elapsed time into the latency.<chain>_to_<stage> histogram.
+
+When tracing is enabled too, each span is also kept as a complete event
+of the thread it ran on, and the events can be exported as Chrome trace
+event JSON, to be opened with chrome://tracing or ui.perfetto.dev.
+'''
+import os
+import json
+import time
+import functools
+import threading
+
+_is_enabled = False
+_is_tracing = False
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_trace_events = []
+_thread_names = {}
+_chains = {}
+_trace_started_at = time.perf_counter_ns()
+
+class Histogram():
+    '''
+    Class aggregating durations, given in ns, into power-of-two buckets.
+    '''
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * 64
+
+    def add(self, duration:int):
+        self.count += 1
+        self.total += duration
+        if self.min is None or duration < self.min:
+            self.min = duration
+        if self.max is None or duration > self.max:
+            self.max = duration
+        # Bucket i holds durations in [2^(i-1), 2^i) ns
+        self.buckets[min(max(duration, 0).bit_length(), 63)] += 1
+
+        return
+
+    def get_percentile(self, q:float):
+        '''
+        Return an upper bound of the q-th percentile, given in ns.
+        '''
+        if self.count == 0:
+            return None
+
+        threshold = self.count * q / 100
+        cumulative = 0
+        for idx, n in enumerate(self.buckets):
+            cumulative += n
+            if cumulative >= threshold:
+                return min(2 ** idx, self.max)
+
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ns': self.total,
+            'mean_ns': self.total / self.count if self.count > 0 else None,
+            'min_ns': self.min,
+            'max_ns': self.max,
+            'p50_ns': self.get_percentile(50),
+            'p90_ns': self.get_percentile(90),
+            'p99_ns': self.get_percentile(99),
+            'buckets': {str(2 ** idx): n for idx, n in enumerate(self.buckets) if n > 0}
+        }
+
+class _Span():
+    __slots__ = ('_name', '_started_at')
+
+    def __init__(self, name:str):
+        self._name = name
+
+    def __enter__(self):
+        self._started_at = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self._name, time.perf_counter_ns() - self._started_at, self._started_at)
+        return False
+
+class _NullSpan():
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def enable(is_tracing:bool = False):
+    '''
+    Parameters
+    ----------
+    is_tracing : bool, default=False
+        If True, the spans are also kept as trace events.
+    '''
+    global _is_enabled, _is_tracing
+    _is_enabled = True
+    _is_tracing = is_tracing
+
+    return
+
+def disable():
+    global _is_enabled, _is_tracing
+    _is_enabled = False
+    _is_tracing = False
+
+    return
+
+def is_enabled():
+    return _is_enabled
+
+def is_tracing():
+    return _is_tracing
+
+def reset():
+    '''
+    Discard all the collected histograms, counters and trace events.
+    '''
+    global _trace_started_at
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _trace_events.clear()
+        _thread_names.clear()
+        _chains.clear()
+        _trace_started_at = time.perf_counter_ns()
+
+    return
+
+def span(name:str):
+    '''
+    Return a context manager measuring the duration of its body
+    under the given name.
+    '''
+    if _is_enabled:
+        return _Span(name)
+    else:
+        return _NULL_SPAN
+
+def instrumented(name:str):
+    '''
+    Return a decorator measuring each call of the decorated
+    function under the given name.
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _is_enabled:
+                return function(*args, **kwargs)
+
+            started_at = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter_ns() - started_at, started_at)
+
+        return wrapper
+
+    return decorator
+
+def record(name:str, duration:int, started_at:int = None):
+    '''
+    Add a duration, given in ns, to the histogram with the given name.
+    If tracing, a trace event of the calling thread is added as well,
+    provided that the time.perf_counter_ns() at which it started is given.
+    '''
+    if _is_enabled:
+        with _lock:
+            histogram = _histograms.get(name)
+            if histogram is None:
+                histogram = _histograms[name] = Histogram()
+            histogram.add(duration)
+
+            if _is_tracing and started_at is not None:
+                thread = threading.current_thread()
+                _thread_names[thread.ident] = thread.name
+                _trace_events.append((name, thread.ident, started_at, duration))
+
+    return
+
+def mark(name:str):
+    '''
+    Add an instant trace event of the calling thread, if tracing.
+    '''
+    if _is_tracing:
+        with _lock:
+            thread = threading.current_thread()
+            _thread_names[thread.ident] = thread.name
+            _trace_events.append((name, thread.ident, time.perf_counter_ns(), None))
+
+    return
+
+def count(name:str, n:int = 1):
+    '''
+    Increase the counter with the given name.
+    '''
+    if _is_enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+    return
+
+def trigger(name:str):
+    '''
+    Start the latency chain with the given name. If it is
+    already pending, its first trigger is kept.
+    '''
+    if _is_enabled:
+        with _lock:
+            _chains.setdefault(name, time.perf_counter_ns())
+
+    return
+
+def checkpoint(stage:str, is_final:bool = False):
+    '''
+    Record the latency from the trigger of each pending chain
+    to the given stage.
+
+    Parameters
+    ----------
+    stage : str
+        The name of the stage reached.
+    is_final : bool, default=False
+        If True, the pending chains are completed.
+    '''
+    if _is_enabled and len(_chains) > 0:
+        now = time.perf_counter_ns()
+        with _lock:
+            chains = list(_chains.items())
+            if is_final:
+                _chains.clear()
+
+        for name, started_at in chains:
+            record('latency.{}_to_{}'.format(name, stage), now - started_at)
+
+    return
+
+def get_latencies():
+    '''
+    Return the latency histograms, keyed by <chain>_to_<stage>.
+    '''
+    with _lock:
+        latencies = {
+            name[len('latency.'):]: histogram
+            for name, histogram in _histograms.items() if name.startswith('latency.')
+        }
+
+    return latencies
+
+def get_summary():
+    with _lock:
+        summary = {
+            'spans': {name: histogram.to_dict() for name, histogram in _histograms.items()},
+            'counters': dict(_counters)
+        }
+
+    return summary
+
+def save(output_dir:str, filename:str = 'instrumentation.json'):
+    '''
+    Write the collected histograms and counters to the given directory.
+    '''
+    with open(output_dir + r'/' + filename, 'w') as f:
+        json.dump(get_summary(), f, indent=2)
+
+    return
+
+def get_trace():
+    '''
+    Return the collected trace events in the Chrome trace event format,
+    with timestamps in µs since the last reset.
+    '''
+    pid = os.getpid()
+    with _lock:
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in _thread_names.items()
+        ]
+        for name, tid, started_at, duration in _trace_events:
+            event = {
+                'name': name,
+                'cat': name.split('.')[0],
+                'pid': pid,
+                'tid': tid,
+                'ts': (started_at - _trace_started_at) / 1000
+            }
+            if duration is None:
+                event.update({'ph': 'i', 's': 't'})
+            else:
+                event.update({'ph': 'X', 'dur': duration / 1000})
+            events.append(event)
+
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def save_trace(output_dir:str, filename:str = 'trace.json'):
+    '''
+    Write the collected trace events to the given directory.
+    '''
+    with open(output_dir + r'/' + filename, 'w') as f:
+        json.dump(get_trace(), f)
+
+    return
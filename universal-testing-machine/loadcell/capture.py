@@ -0,0 +1,90 @@
+from collections import deque
+
+class TriggerCapture():
+    '''
+    Class capturing the readings of a load cell at full rate around
+    trigger events, such as a specimen failure or a button press.
+
+    The latest readings are kept in a ring buffer: on a trigger, they
+    become the pre-trigger window of a new event, which is completed
+    by the following readings.
+    '''
+    def __init__(self, pre_samples:int = 800, post_samples:int = 400):
+        '''
+        Parameters
+        ----------
+        pre_samples : int, default=800
+            The number of readings kept before each trigger.
+        post_samples : int, default=400
+            The number of readings captured after each trigger.
+        '''
+        self._ring = deque(maxlen=pre_samples)
+        self._post_samples = post_samples
+        self._pending_reason = None
+        self._event = None
+        self.events = []
+
+    def trigger(self, reason:str):
+        '''
+        Trigger an event, whose post-trigger window starts with the next
+        reading. Triggers received while an event is being captured
+        are ignored.
+        '''
+        if self._pending_reason is None and self._event is None:
+            self._pending_reason = reason
+
+        return
+
+    def is_pending(self):
+        '''
+        Return True if an event has been triggered and not completed yet.
+        '''
+        return self._pending_reason is not None or self._event is not None
+
+    def add(self, timing:float, reading:int):
+        '''
+        Add a reading. It is called from the acquisition thread only,
+        so that triggers from other threads need no locking.
+        '''
+        if self._event is None and self._pending_reason is not None:
+            self._start_event(timing)
+
+        if self._event is not None:
+            self._event['timings'].append(timing)
+            self._event['readings'].append(reading)
+            if len(self._event['readings']) - self._event['n_pre_samples'] >= self._post_samples:
+                self._finish_event()
+        else:
+            self._ring.append((timing, reading))
+
+        return
+
+    def _start_event(self, triggered_at:float):
+        self._event = {
+            'reason': self._pending_reason,
+            'triggered_at': triggered_at,
+            'n_pre_samples': len(self._ring),
+            'timings': [timing for timing, _ in self._ring],
+            'readings': [reading for _, reading in self._ring]
+        }
+        self._pending_reason = None
+        self._ring.clear()
+
+        return
+
+    def _finish_event(self):
+        self.events.append(self._event)
+        self._event = None
+
+        return
+
+    def close(self):
+        '''
+        Complete the event being captured, if any, with the
+        readings received so far, and return all the events.
+        '''
+        if self._event is not None:
+            self._finish_event()
+        self._pending_reason = None
+
+        return self.events
@@ -0,0 +1,80 @@
+CHANNELS = ['A', 'B']
+
+class ChannelScheduler():
+    '''
+    Class scheduling the channels of an HX711 converted one after the
+    other, so that a second bridge is read by the same chip.
+
+    The channel of each conversion is selected by the pulses ending the
+    read of the previous one: the channels are requested in blocks, one
+    conversion ahead, and the first conversions after each change of
+    channel, which have not settled yet, are discarded.
+    '''
+    def __init__(self, schedule:dict, settling_conversions:int = 1):
+        '''
+        Parameters
+        ----------
+        schedule : dict
+            The number of settled conversions of each channel, in turn,
+            e.g. {'A': 16, 'B': 4}.
+        settling_conversions : int, default=1
+            The number of conversions discarded after a change of channel.
+        '''
+        for channel, n_conversions in schedule.items():
+            if channel not in CHANNELS or n_conversions <= 0:
+                raise ValueError('The schedule has to give a positive number of conversions to channel "A" or "B". '
+                                 'Received: {}'.format(schedule))
+
+        self._schedule = list(schedule.items())
+        self._settling_conversions = settling_conversions
+        self.reset()
+
+    def reset(self):
+        self._block_idx = 0
+        self._n_requested = 0
+        # The channel of the conversion before the first one is unknown
+        self._previous_channel = None
+        self._n_settling = 0
+
+        return
+
+    def get_channels(self):
+        return [channel for channel, _ in self._schedule]
+
+    def _get_block_size(self, block_idx:int):
+        channel, n_conversions = self._schedule[block_idx]
+        previous_channel, _ = self._schedule[block_idx - 1]
+
+        if channel != previous_channel:
+            return n_conversions + self._settling_conversions
+        else:
+            return n_conversions
+
+    def get_channel(self):
+        '''
+        Return the channel to request for the conversion after the one being read.
+        '''
+        return self._schedule[self._block_idx][0]
+
+    def advance(self):
+        '''
+        Move to the next conversion, once the requested channel has been selected.
+        '''
+        self._n_requested += 1
+        if self._n_requested >= self._get_block_size(self._block_idx):
+            self._block_idx = (self._block_idx + 1) % len(self._schedule)
+            self._n_requested = 0
+
+        return
+
+    def is_settled(self, channel:str):
+        '''
+        Return True if a conversion of the given channel, read after
+        the previous one, has settled.
+        '''
+        if channel != self._previous_channel:
+            self._previous_channel = channel
+            self._n_settling = 0
+        self._n_settling += 1
+
+        return channel in CHANNELS and self._n_settling > self._settling_conversions
@@ -0,0 +1,222 @@
+import os
+import numpy as np
+
+class LoadCellGroup():
+    '''
+    Class reading several load cells, each one on its own HX711 chip,
+    as a single one, e.g. for fixtures sharing the load among them.
+
+    Each load cell is read concurrently by its own acquisition thread.
+    The first one gives the timeline of the batches and of the final
+    data, onto which the forces of the others are interpolated, as
+    additional columns, and summed into the total force.
+    '''
+    def __init__(self, loadcells:list):
+        '''
+        Parameters
+        ----------
+        loadcells : list
+            The LoadCell instances, each one with its own data and clock
+            pins, and a name of its own for the calibration file.
+        '''
+        if len(loadcells) == 0:
+            raise ValueError('A load cell group needs at least one load cell. '
+                             'Received: {}'.format(loadcells))
+
+        self._loadcells = loadcells
+        self._reference = loadcells[0]
+
+    def get_loadcells(self):
+        return self._loadcells
+
+    @property
+    def is_calibrated(self):
+        return all(my_loadcell.is_calibrated is True for my_loadcell in self._loadcells)
+
+    @is_calibrated.setter
+    def is_calibrated(self, is_calibrated:bool):
+        for my_loadcell in self._loadcells:
+            my_loadcell.is_calibrated = is_calibrated
+
+    def get_calibration(self):
+        '''
+        Return the calibration of each load cell, with the sum of
+        their limits as the limit of the group.
+        '''
+        if self.is_calibrated:
+            calibrations = [my_loadcell.get_calibration() for my_loadcell in self._loadcells]
+            calibration = {
+                'loadcell_limit': {
+                    'value': sum(loadcell_calibration['loadcell_limit']['value'] for loadcell_calibration in calibrations),
+                    'unit': 'N'
+                },
+                'loadcells': calibrations,
+                'date': calibrations[0]['date']
+            }
+        else:
+            calibration = None
+
+        return calibration
+
+    def set_calibration(self, calibration:dict):
+        '''
+        Set the calibration of each load cell, as returned by
+        get_calibration(). A calibration of a single load cell, e.g. the
+        one stored with the parameters of a previous test, is set to each
+        load cell of the group.
+        '''
+        if 'loadcells' not in calibration:
+            for my_loadcell in self._loadcells:
+                my_loadcell.set_calibration(calibration)
+
+            return
+
+        if len(calibration['loadcells']) != len(self._loadcells):
+            raise ValueError('The calibration has to hold one calibration for each load cell of the group. '
+                             'Received: {}'.format(len(calibration['loadcells'])))
+
+        for my_loadcell, loadcell_calibration in zip(self._loadcells, calibration['loadcells']):
+            my_loadcell.set_calibration(loadcell_calibration)
+
+        return
+
+    def get_offset(self, is_force:bool = False):
+        return sum(my_loadcell.get_offset(is_force=is_force) for my_loadcell in self._loadcells)
+
+    def get_statistics(self, is_force:bool = True):
+        '''
+        Return the running statistics of the total force, from the ones of
+        each load cell, as LoadCell.get_statistics() does. Their noise is
+        taken as independent. As the extremes of the load cells are not
+        simultaneous, the min and max are the sums of theirs, i.e. the
+        bounds of the total force.
+        '''
+        statistics = [my_loadcell.get_statistics(is_force=is_force) for my_loadcell in self._loadcells]
+
+        def _sum(key:str):
+            values = [loadcell_statistics[key] for loadcell_statistics in statistics]
+            return sum(values) if None not in values else None
+
+        return {
+            'count': min(loadcell_statistics['count'] for loadcell_statistics in statistics),
+            'mean': _sum('mean'),
+            'variance': _sum('variance'),
+            'min': _sum('min'),
+            'max': _sum('max'),
+            'ewm': _sum('ewm'),
+            'ewm_variance': _sum('ewm_variance'),
+            'rejected': sum(loadcell_statistics['rejected'] for loadcell_statistics in statistics)
+        }
+
+    def start_reading(self):
+        for my_loadcell in self._loadcells:
+            my_loadcell.start_reading()
+
+        return
+
+    def stop_reading(self, is_resampled:bool = False):
+        '''
+        Stop reading and return the readings of the first load cell,
+        with the forces of each load cell, as F_0, F_1, and so on,
+        and their sum as F.
+        '''
+        data = self._reference.stop_reading(is_resampled=is_resampled)
+        timings = data['t'].to_numpy(dtype=float)
+
+        forces = [data['F'].to_numpy(dtype=float)]
+        for my_loadcell in self._loadcells[1:]:
+            loadcell_data = my_loadcell.stop_reading()
+            if len(loadcell_data) > 0:
+                forces.append(np.interp(timings, loadcell_data['t'].to_numpy(dtype=float), loadcell_data['F'].to_numpy(dtype=float)))
+            else:
+                forces.append(np.full(len(timings), np.nan))
+
+        return self._add_forces(data, forces)
+
+    def _add_forces(self, data, forces:list):
+        for idx, force in enumerate(forces):
+            data['F_' + str(idx)] = force
+        data['F'] = np.sum(forces, axis=0)
+
+        return data
+
+    def is_batch_ready(self, batch_index:int, batch_size:int = 15):
+        return self._reference.is_batch_ready(batch_index, batch_size=batch_size)
+
+    def get_batch(self, batch_index:int, batch_size:int = 15, kernel_size:int = 5):
+        '''
+        Return the next batch of the first load cell, with the forces
+        of the others interpolated at its timestamps, as stop_reading()
+        does, and the index of the following batch.
+        '''
+        batch, batch_index = self._reference.get_batch(batch_index, batch_size=batch_size, kernel_size=kernel_size)
+        timings = batch['t'].to_numpy(dtype=float)
+
+        forces = [batch['F'].to_numpy(dtype=float)]
+        for my_loadcell in self._loadcells[1:]:
+            forces.append(my_loadcell.get_forces_at(timings, kernel_size=kernel_size))
+
+        return self._add_forces(batch, forces), batch_index
+
+    def discard_readings(self, batch_index:int, is_spilling:bool = True):
+        self._reference.discard_readings(batch_index, is_spilling=is_spilling)
+
+        # The others keep the readings around the first one kept, to be interpolated
+        first_timing = self._reference.get_first_timing()
+        if first_timing is not None:
+            for my_loadcell in self._loadcells[1:]:
+                my_loadcell.discard_readings_before(first_timing, is_spilling=is_spilling)
+
+        return
+
+    def set_watchdog(self, watchdog = None):
+        '''
+        Set the WatchdogGroup whose watchdogs check the readings of each
+        load cell, in the same order. If None, the readings are not checked.
+        '''
+        for idx, my_loadcell in enumerate(self._loadcells):
+            my_loadcell.set_watchdog(watchdog.watchdogs[idx] if watchdog is not None else None)
+
+        return
+
+    def set_spill_path(self, path:str = None):
+        # Each load cell spills its readings to a file of its own
+        for idx, my_loadcell in enumerate(self._loadcells):
+            if path is not None and idx > 0:
+                root, extension = os.path.splitext(path)
+                my_loadcell.set_spill_path('{}_{}{}'.format(root, idx, extension))
+            else:
+                my_loadcell.set_spill_path(path)
+
+        return
+
+    # Capture, replay, channels and auxiliary sensors follow the first load cell
+    def start_capture(self, pre_samples:int = 800, post_samples:int = 400):
+        return self._reference.start_capture(pre_samples=pre_samples, post_samples=post_samples)
+
+    def trigger_capture(self, reason:str):
+        return self._reference.trigger_capture(reason)
+
+    def set_capture_origin(self, t0:float = None):
+        return self._reference.set_capture_origin(t0)
+
+    def is_capture_pending(self):
+        return self._reference.is_capture_pending()
+
+    def stop_capture(self):
+        return self._reference.stop_capture()
+
+    def set_source(self, source = None):
+        return self._reference.set_source(source)
+
+    def is_exhausted(self):
+        return self._reference.is_exhausted()
+
+    def set_channels(self, schedule:dict = None, settling_conversions:int = 1):
+        return self._reference.set_channels(schedule, settling_conversions=settling_conversions)
+
+    def get_channel_rates(self):
+        return self._reference.get_channel_rates()
+
+    def set_sensor_hub(self, sensor_hub = None):
+        return self._reference.set_sensor_hub(sensor_hub)
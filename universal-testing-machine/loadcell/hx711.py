@@ -6,7 +6,7 @@ This file holds HX711 class
 import statistics as stat
 import time
 
-import RPi.GPIO as GPIO
+from backend.backend import GPIO, clock
 
 
 class HX711:
@@ -80,10 +80,25 @@ class HX711:
         else:
             raise ValueError('Parameter "channel" has to be "A" or "B". '
                              'Received: {}'.format(channel))
-        # after changing channel or gain it has to wait 50 ms to allow adjustment.
-        # the data before is garbage and cannot be used.
-        self._read()
-        time.sleep(0.5)
+        # after changing channel or gain the data before is garbage and cannot be used.
+        self._wait_for_settling()
+
+    def request_channel(self, channel):
+        """
+        request_channel method sets the channel selected at the end
+        of the next reading, for the conversion after it, without
+        waiting for the settling. It is meant for interleaved readings
+        of both channels, where the unsettled conversions are discarded.
+
+        Args:
+            channel(str): the channel to request. Options ('A' || 'B')
+        Raises:
+            ValueError: if channel is not 'A' or 'B'
+        """
+        if channel not in ('A', 'B'):
+            raise ValueError('Parameter "channel" has to be "A" or "B". '
+                             'Received: {}'.format(channel))
+        self._wanted_channel = channel
 
     def set_gain_A(self, gain):
         """
@@ -102,10 +117,30 @@ class HX711:
         else:
             raise ValueError('gain has to be 128 or 64. '
                              'Received: {}'.format(gain))
-        # after changing channel or gain it has to wait 50 ms to allow adjustment.
-        # the data before is garbage and cannot be used.
+        # after changing channel or gain the data before is garbage and cannot be used.
+        self._wait_for_settling()
+
+    def _wait_for_settling(self, timeout=1):
+        """
+        _wait_for_settling discards the conversion following a change
+        of channel or gain and then waits for the first valid conversion,
+        instead of sleeping for a fixed time.
+
+        Args:
+            timeout(float): Optional, by default 1 s. Maximum time to wait
+                for a valid conversion.
+
+        Returns: bool True if a valid conversion was received within the timeout.
+        """
         self._read()
-        time.sleep(0.5)
+        started_at = time.perf_counter()
+        while time.perf_counter() - started_at < timeout:
+            if self._read() is not False:
+                return True
+        if self._debug_mode:
+            print('No valid conversion within {} s after setting '
+                  'channel and gain\n'.format(timeout))
+        return False
 
     def zero(self, readings=30):
         """
@@ -354,7 +389,7 @@ class HX711:
         GPIO.output(self._pd_sck, False)  # start by setting the pd_sck to 0
         ready_counter = 0
         while (not self._ready() and ready_counter <= 40):
-            time.sleep(0.01)  # sleep for 10 ms because data is not ready
+            clock.sleep(0.01)  # sleep for 10 ms because data is not ready
             ready_counter += 1
             if ready_counter == 50:  # if counter reached max value then return False
                 if self._debug_mode:
@@ -1,28 +1,41 @@
+import os
+import time
+import tempfile
 from datetime import datetime
 from statistics import mean, median
-import time
-import RPi.GPIO as GPIO
+from backend.backend import GPIO, clock
 from loadcell.hx711 import HX711
+from loadcell.capture import TriggerCapture
+from loadcell.channels import ChannelScheduler
+from loadcell.running import RunningStatistics
+from loadcell import timebase
+from sensors import sensors
+from utility import stream
+from instrumentation import instrumentation
 import constants
-import scipy
-import scipy.signal
-from scipy import constants as scipy_constants
 from threading import Thread
 import numpy as np
-import pandas as pd
+from bisect import bisect_left, bisect_right
 import json
 
-#HACK#
-import random
-def read_placeholder():
-    time.sleep(0.0125)
-    return random.randint(100000, 111111)
-
 class LoadCell():
-    def __init__(self, dat_pin:int, clk_pin:int):
+    def __init__(self, dat_pin:int, clk_pin:int, name:str = None):
 
         GPIO.setmode(GPIO.BCM)
         self._hx711 = HX711(dout_pin=dat_pin, pd_sck_pin=clk_pin)
+        self._source = self._hx711
+        self._watchdog = None
+        self._sensor_hub = None
+        self._channel_scheduler = None
+        self._capture = None
+        self._capture_origin = None
+        # Updated at each reading of channel A, the force one
+        self._statistics = RunningStatistics(
+            time_constant=constants.STATISTICS_TIME_CONSTANT,
+            rejection_threshold=constants.STATISTICS_REJECTION_THRESHOLD,
+            confirming_values=constants.STATISTICS_CONFIRMING_READINGS
+        )
+        self._spill_path = None
         
         # Calibration attributes
         self.is_calibrated = False
@@ -31,7 +44,9 @@ class LoadCell():
         self._y_intercept = None
         self._calibrating_mass = None
         self._offset = constants.CLAMP_GRAMS
-        self._calibration_filename = 'load_cell_calibration.json'
+        # Load cells in a group are told apart by their name
+        self.name = name
+        self._calibration_filename = 'load_cell_calibration.json' if name is None else 'load_cell_{}_calibration.json'.format(name)
 
         # Reading attributes
         self._is_reading = False
@@ -39,11 +54,34 @@ class LoadCell():
         self._timings = None
         self._started_reading_at = None
         self._read_thread = None
+        self._read_at = None
+        self._n_discarded = 0
+        self._spill = None
+        self._clock_fit = None
+        self._n_fitted = 0
+        self._channel_readings = None
+        self._channel_timings = None
+        self._n_channel_discarded = None
+        self._channel_spills = None
+        self._channel_rates = None
+        self._sensor_spills = None
+        self._sensor_spilled_until = None
 
     def _reset_reading_attributes(self):
         self._is_reading = False
         self._readings = None
         self._timings = None
+        self._read_at = None
+        self._n_discarded = 0
+        self._spill = None
+        self._clock_fit = None
+        self._n_fitted = 0
+        self._channel_readings = None
+        self._channel_timings = None
+        self._n_channel_discarded = None
+        self._channel_spills = None
+        self._sensor_spills = None
+        self._sensor_spilled_until = None
         self._started_reading_at = None
         self._read_thread = None
 
@@ -52,10 +90,25 @@ class LoadCell():
     def _init_reading_attributes(self):
         self._readings = []
         self._timings = []
+        # Real times of the readings, to measure how long they wait to be consumed
+        self._read_at = [] if instrumentation.is_enabled() else None
+        # The timestamps of the batches are corrected as they are consumed
+        self._clock_fit = timebase.ClockFit(rate=constants.HX711_RATE)
+        self._statistics.reset()
+        # The settled conversions of the channels other than A are stored apart
+        if self._channel_scheduler is not None:
+            self._channel_scheduler.reset()
+            self._channel_readings = {channel: [] for channel in self._channel_scheduler.get_channels() if channel != 'A'}
+            self._channel_timings = {channel: [] for channel in self._channel_readings}
+            self._n_channel_discarded = {channel: 0 for channel in self._channel_readings}
+            self._channel_spills = {}
+        # The values of the sensors are spilled along with the readings, as their streams only keep the latest ones
+        self._sensor_spills = {}
+        self._sensor_spilled_until = {}
         self._is_reading = True
 
-        self._read_thread = Thread(target=self._read)
-        self._started_reading_at = time.time()
+        self._read_thread = Thread(target=self._read, name='loadcell')
+        self._started_reading_at = clock.time()
 
         return
 
@@ -109,21 +162,22 @@ class LoadCell():
         self._save_calibration(calibration_dir=calibration_dir)
         return
 
-    def _get_raw_data_mean(self, n_readings:int = 1, kernel_size:int = 5, fake:bool = False):
+    def _get_raw_data_mean(self, n_readings:int = 1, kernel_size:int = 5):
+        # The statistics describe the last point read, e.g. its noise, until the next reading starts
+        self._statistics.reset()
         if n_readings == 1:
-            if fake is False: 
-                mean_value = self._hx711.get_raw_data_mean(readings=1)
-            else:
-                mean_value = read_placeholder()
+            mean_value = self._hx711.get_raw_data_mean(readings=1)
+            if mean_value is not False:
+                self._statistics.add(mean_value, clock.time())
         else:
+            import scipy.signal
+
             readings = []
 
-            if fake is False:
-                for _ in range(n_readings):
-                    readings.append(self._hx711.get_raw_data_mean(readings=1))
-            else:
-                for _ in range(n_readings):
-                    readings.append(read_placeholder())
+            for _ in range(n_readings):
+                readings.append(self._hx711.get_raw_data_mean(readings=1))
+                if readings[-1] is not False:
+                    self._statistics.add(readings[-1], clock.time())
         
             readings = scipy.signal.medfilt(readings, kernel_size=kernel_size)
             mean_value = mean(readings)
@@ -133,7 +187,7 @@ class LoadCell():
     def get_offset(self, is_force:bool = False):
         offset = self._offset
         if is_force is True:
-            offset = (offset / 1000) * scipy_constants.g
+            offset = (offset / 1000) * constants.STANDARD_GRAVITY
         
         return offset
 
@@ -143,15 +197,48 @@ class LoadCell():
 
         return
 
-    def stop_reading(self):
+    def stop_reading(self, is_resampled:bool = False):
+        '''
+        Stop reading and return the readings as a DataFrame. The timestamps
+        are corrected according to the rate and phase of the ADC, fitted
+        to all of them.
+
+        Parameters
+        ----------
+        is_resampled : bool, default=False
+            If True, the readings are resampled onto a uniform grid
+            at the fitted rate, e.g. for spectral analyses.
+        '''
+        import pandas as pd
+
+        self._channel_rates = self.get_channel_rates()
+
+        # The acquisition thread is done with the readings once joined
+        self._is_reading = False
+        if self._read_thread is not None:
+            self._read_thread.join()
+
         readings = np.array(self._readings)
         timings = np.array(self._timings)
+        channel_timings, channel_readings = self._page_in_channels()
+        sensor_values = self._page_in_sensors()
+
+        # The discarded readings are paged back in from the spill file
+        if self._spill is not None:
+            spilled_timings, spilled_readings = self._spill.read()
+            self._spill.remove()
+            timings = np.concatenate([spilled_timings, timings])
+            readings = np.concatenate([spilled_readings, readings])
         
         self._reset_reading_attributes()
+
+        _, timings, clock_fit = timebase.fit(timings, rate=constants.HX711_RATE)
+        if is_resampled and clock_fit.is_locked():
+            timings, readings = timebase.resample(timings, readings, clock_fit.get_rate())
         
-        weights = self._slope * readings + self._y_intercept
-        forces = (weights / 1000) * scipy_constants.g - self.get_offset(is_force=True)
-        data = {'t': timings, 'readings': readings, 'F': forces}
+        data = {'t': timings, 'readings': readings, 'F': self._get_forces(readings)}
+        data = self._join_channels(data, timings, channel_timings, channel_readings)
+        data = self._join_sensors(data, timings, sensor_values)
 
         # TODO: eventualmente aggiungere qui vari filtri e post elaborazione dei dati
         
@@ -160,30 +247,469 @@ class LoadCell():
 
         return df
 
+    def _get_forces(self, readings:np.ndarray):
+        weights = self._slope * readings + self._y_intercept
+        forces = (weights / 1000) * constants.STANDARD_GRAVITY - self.get_offset(is_force=True)
+
+        return forces
+
+    def get_statistics(self, is_force:bool = True):
+        '''
+        Return the running statistics of the readings since the last
+        start_reading(), as RunningStatistics.get() does, in constant time.
+
+        Parameters
+        ----------
+        is_force : bool, default=True
+            If True and the load cell is calibrated, the statistics are
+            given in N, N² for the variances, otherwise in raw counts.
+        '''
+        statistics = self._statistics.get()
+        if is_force and self.is_calibrated and statistics['count'] > 0:
+            # Forces are linear in the readings
+            scale = (self._slope / 1000) * constants.STANDARD_GRAVITY
+            for key in ['mean', 'ewm']:
+                statistics[key] = self._get_forces(statistics[key])
+            statistics['min'], statistics['max'] = sorted([self._get_forces(statistics['min']), self._get_forces(statistics['max'])])
+            for key in ['variance', 'ewm_variance']:
+                if statistics[key] is not None:
+                    statistics[key] = statistics[key] * scale ** 2
+
+        return statistics
+
+    def start_capture(self, pre_samples:int = 800, post_samples:int = 400):
+        '''
+        Start capturing the readings at full rate around the
+        triggers given through trigger_capture().
+        '''
+        self._capture = TriggerCapture(pre_samples=pre_samples, post_samples=post_samples)
+        self._capture_origin = None
+
+        return
+
+    def set_capture_origin(self, t0:float = None):
+        '''
+        Set the time, given in seconds, the test data is given relative to,
+        so that the triggers of the captured events are given in the same
+        time base. If None, they are given in the time base of the readings.
+        '''
+        self._capture_origin = t0
+
+        return
+
+    def trigger_capture(self, reason:str):
+        if self._capture is not None:
+            self._capture.trigger(reason)
+
+        return
+
+    def is_capture_pending(self):
+        return self._capture is not None and self._capture.is_pending()
+
+    def stop_capture(self):
+        '''
+        Stop capturing and return the captured events, one after the
+        other, as a DataFrame, with the time t relative to the trigger
+        and the time of the trigger, triggered_at, relative to the origin
+        set by set_capture_origin(). If capturing was not started, None
+        is returned.
+        '''
+        import pandas as pd
+
+        if self._capture is None:
+            return None
+
+        events = self._capture.close()
+        t0 = self._capture_origin if self._capture_origin is not None else 0
+        self._capture = None
+        self._capture_origin = None
+
+        data = []
+        for idx, event in enumerate(events):
+            readings = np.array(event['readings'])
+            data.append(pd.DataFrame({
+                'event': idx,
+                'reason': event['reason'],
+                'triggered_at': event['triggered_at'] - t0,
+                't': np.array(event['timings']) - event['triggered_at'],
+                'readings': readings,
+                'F': self._get_forces(readings)
+            }))
+
+        if len(data) > 0:
+            data = pd.concat(data, ignore_index=True)
+        else:
+            data = pd.DataFrame(columns=['event', 'reason', 'triggered_at', 't', 'readings', 'F'])
+
+        return data
+
+    def set_source(self, source = None):
+        '''
+        Set the source the readings are acquired from, providing a
+        _read() method as the HX711 does. If None, the HX711 is used.
+        A source running out of readings, e.g. a recording, provides an
+        is_exhausted() method as well.
+        '''
+        self._source = source if source is not None else self._hx711
+
+        return
+
+    def is_exhausted(self):
+        '''
+        Return True if the source of the readings has run out of them.
+        The HX711 never does.
+        '''
+        return hasattr(self._source, 'is_exhausted') and self._source.is_exhausted()
+
+    def set_watchdog(self, watchdog = None):
+        '''
+        Set the Watchdog checking each reading as soon as it is
+        acquired. If None, the readings are not checked.
+        '''
+        self._watchdog = watchdog
+
+        return
+
+    def set_sensor_hub(self, sensor_hub = None):
+        '''
+        Set the SensorHub whose streams are joined onto the readings, as
+        additional columns of the batches and of the final data. If None,
+        the readings only are returned.
+        '''
+        self._sensor_hub = sensor_hub
+
+        return
+
+    def set_channels(self, schedule:dict = None, settling_conversions:int = 1):
+        '''
+        Set the channels of the HX711 read in turn, from the next
+        start_reading(). The readings of channel A are the ones
+        converted to forces, while the settled readings of the other
+        channel are joined onto them, as of the latest one, as the
+        readings_B column of the batches and of the final data.
+
+        Parameters
+        ----------
+        schedule : dict, default=None
+            The number of settled conversions of each channel, in turn,
+            e.g. {'A': 16, 'B': 4}. If None, channel A only is read.
+        settling_conversions : int, default=1
+            The number of conversions discarded after a change of channel.
+        '''
+        if schedule is not None and 'A' not in schedule:
+            raise ValueError('The schedule has to include channel "A", read by the load cell. '
+                             'Received: {}'.format(schedule))
+
+        self._channel_scheduler = ChannelScheduler(schedule, settling_conversions=settling_conversions) if schedule is not None else None
+
+        return
+
+    def get_channel_rates(self):
+        '''
+        Return the effective rate of the settled readings of each channel,
+        given in SPS, while reading or for the latest readings. If channel A
+        only is read, None is returned.
+        '''
+        if self._channel_scheduler is None:
+            return None
+        if not self._is_reading:
+            return self._channel_rates
+
+        elapsed_time = clock.time() - self._started_reading_at
+        if elapsed_time <= 0:
+            return None
+
+        rates = {'A': (self._n_discarded + len(self._readings)) / elapsed_time}
+        for channel, readings in self._channel_readings.items():
+            rates[channel] = (self._n_channel_discarded[channel] + len(readings)) / elapsed_time
+
+        return rates
+
+    def _join_channels(self, data, timings:np.ndarray, channel_timings:dict, channel_readings:dict):
+        if channel_readings is not None:
+            for channel, readings in channel_readings.items():
+                # Readings are appended by the acquisition thread, the first ones are taken as a whole
+                n_readings = min(len(readings), len(channel_timings[channel]))
+                if len(timings) > 0:
+                    # Only the readings from the latest one before the timings are converted
+                    first_idx = max(bisect_right(channel_timings[channel], np.min(timings), 0, n_readings) - 1, 0)
+                    last_idx = bisect_right(channel_timings[channel], np.max(timings), 0, n_readings)
+                else:
+                    first_idx, last_idx = 0, 0
+                data['readings_' + channel] = sensors.join_asof(timings, np.array(channel_timings[channel][first_idx:last_idx]), np.array(readings[first_idx:last_idx]))
+
+        return data
+
+    def _page_in_channels(self):
+        '''
+        Return the timings and the readings of each channel other than A,
+        as arrays, with the discarded ones paged back in from their spill files.
+        '''
+        if self._channel_readings is None:
+            return None, None
+
+        channel_timings = {}
+        channel_readings = {}
+        for channel, readings in self._channel_readings.items():
+            n_readings = min(len(readings), len(self._channel_timings[channel]))
+            timings = np.array(self._channel_timings[channel][:n_readings])
+            readings = np.array(readings[:n_readings])
+            if channel in self._channel_spills:
+                spilled_timings, spilled_readings = self._channel_spills[channel].read()
+                self._channel_spills[channel].remove()
+                timings = np.concatenate([spilled_timings, timings])
+                readings = np.concatenate([spilled_readings, readings])
+            channel_timings[channel] = timings
+            channel_readings[channel] = readings
+
+        return channel_timings, channel_readings
+
+    def _page_in_sensors(self):
+        '''
+        Return the timestamps and the values of each sensor stream spilled
+        to disk, together with the ones kept by the stream since, as pairs
+        of arrays by name.
+        '''
+        if self._sensor_hub is None or self._sensor_spills is None:
+            return None
+
+        sensor_values = {}
+        for name, spill in self._sensor_spills.items():
+            spilled_timestamps, spilled_values = spill.read()
+            spill.remove()
+            timestamps, values = self._sensor_hub.get_stream(name).get(since=self._sensor_spilled_until[name])
+            is_kept = timestamps > self._sensor_spilled_until[name]
+            sensor_values[name] = (np.concatenate([spilled_timestamps, timestamps[is_kept]]), np.concatenate([spilled_values, values[is_kept]]))
+
+        return sensor_values
+
+    def _join_sensors(self, data, timings:np.ndarray, sensor_values:dict = None):
+        if self._sensor_hub is not None:
+            for name, values in self._sensor_hub.align(timings, sensor_values).items():
+                data[name] = values
+
+        return data
+
     def _read(self):
+        # Channels are switched on the HX711 only, not on replayed readings
+        is_scheduled = self._channel_scheduler is not None and self._source is self._hx711
+
+        channel = 'A'
         while self._is_reading:
+            # Only the failed reads are skipped: the checks on the readings, e.g. by the watchdog, must not fail silently
             try:
-                #HACK#
-                self._readings.append(self._hx711._read())
-                # self._readings.append(read_placeholder())
-                self._timings.append(time.time())
+                if is_scheduled:
+                    # The channel of the conversion being read was requested at the previous read
+                    channel = self._hx711.get_current_channel()
+                    self._hx711.request_channel(self._channel_scheduler.get_channel())
+                with instrumentation.span('hx711.read'):
+                    reading = self._source._read()
             except:
-                pass
+                reading = False
+
+            if reading is False:
+                instrumentation.count('loadcell.invalid_readings')
+                continue
+
+            timing = clock.time()
+            if is_scheduled:
+                self._channel_scheduler.advance()
+                if not self._channel_scheduler.is_settled(channel):
+                    instrumentation.count('loadcell.unsettled_readings')
+                    continue
+            if channel != 'A':
+                self._channel_readings[channel].append(reading)
+                self._channel_timings[channel].append(timing)
+                continue
+            self._timings.append(timing)
+            if self._read_at is not None:
+                self._read_at.append(time.perf_counter_ns())
+            # Appended last, as is_batch_ready() counts the readings
+            self._readings.append(reading)
+            self._statistics.add(reading, timing)
+            instrumentation.count('loadcell.samples')
+            if self._watchdog is not None:
+                self._watchdog.check(reading)
+            if self._capture is not None:
+                self._capture.add(timing, reading)
+
+        # Single readings, e.g. of the offset, are taken from channel A
+        if is_scheduled:
+            self._hx711.select_channel('A')
+
+        return
+
+    def set_spill_path(self, path:str = None):
+        '''
+        Set the binary file the discarded readings are spilled to,
+        from the next start_reading(). If None, a temporary file is used.
+        '''
+        self._spill_path = path
+
+        return
+
+    def _create_spill_path(self):
+        fd, path = tempfile.mkstemp(prefix='utm_readings_', suffix='.bin')
+        os.close(fd)
+
+        return path
+
+    def discard_readings(self, batch_index:int, is_spilling:bool = True):
+        '''
+        Discard the readings before the given batch index, once
+        consumed, so that the memory employed by long tests is bounded.
+        Batch indexes keep counting the discarded readings.
+
+        Parameters
+        ----------
+        batch_index : int
+            The index of the first reading to keep.
+        is_spilling : bool, default=True
+            If True, the discarded readings are spilled to disk and
+            stop_reading() pages them back in, otherwise they are
+            dropped and stop_reading() returns the others only.
+        '''
+        n_readings = batch_index - self._n_discarded
+        if self._readings is not None and n_readings > 0:
+            if is_spilling:
+                if self._spill is None:
+                    self._spill = stream.SpillFile(self._spill_path if self._spill_path is not None else self._create_spill_path())
+                self._spill.write(self._timings[:n_readings], self._readings[:n_readings])
+            del self._readings[:n_readings]
+            del self._timings[:n_readings]
+            if self._read_at is not None:
+                del self._read_at[:n_readings]
+            self._n_discarded = batch_index
+            self._discard_channel_readings(is_spilling=is_spilling)
+            if is_spilling:
+                self._spill_sensor_values()
+
+        return
+
+    def _discard_channel_readings(self, is_spilling:bool = True):
+        # The readings of the other channels are kept from the latest one before the first reading kept
+        if self._channel_readings is not None and len(self._timings) > 0:
+            for channel, readings in self._channel_readings.items():
+                timings = self._channel_timings[channel]
+                n_readings = max(bisect_right(timings, self._timings[0], 0, min(len(readings), len(timings))) - 1, 0)
+                if n_readings > 0:
+                    if is_spilling:
+                        if channel not in self._channel_spills:
+                            self._channel_spills[channel] = stream.SpillFile(self._get_named_spill_path(channel))
+                        self._channel_spills[channel].write(timings[:n_readings], readings[:n_readings])
+                    del readings[:n_readings]
+                    del timings[:n_readings]
+                    self._n_channel_discarded[channel] += n_readings
 
         return
 
+    def _spill_sensor_values(self):
+        # The values up to the first reading kept are spilled, once, while the streams still keep them
+        if self._sensor_hub is not None and self._sensor_spills is not None and len(self._timings) > 0:
+            for name in self._sensor_hub.get_names():
+                since = self._sensor_spilled_until.get(name)
+                timestamps, values = self._sensor_hub.get_stream(name).get(since=since, until=self._timings[0])
+                if since is not None:
+                    is_new = timestamps > since
+                    timestamps, values = timestamps[is_new], values[is_new]
+                if len(timestamps) > 0:
+                    if name not in self._sensor_spills:
+                        self._sensor_spills[name] = stream.SpillFile(self._get_named_spill_path(name), dtype=np.float64)
+                    self._sensor_spills[name].write(timestamps, values)
+                    self._sensor_spilled_until[name] = timestamps[-1]
+
+        return
+
+    def _get_named_spill_path(self, name:str):
+        if self._spill_path is not None:
+            root, extension = os.path.splitext(self._spill_path)
+            path = '{}_{}{}'.format(root, name, extension)
+        else:
+            path = self._create_spill_path()
+
+        return path
+
+    def discard_readings_before(self, timing:float, is_spilling:bool = True):
+        '''
+        Discard the readings taken before the given time, given in
+        seconds, as discard_readings() does.
+        '''
+        if self._timings is not None:
+            self.discard_readings(self._n_discarded + bisect_left(self._timings, timing), is_spilling=is_spilling)
+
+        return
+
+    def get_first_timing(self):
+        '''
+        Return the time of the first reading not discarded yet, if any.
+        '''
+        if self._timings is not None and len(self._timings) > 0:
+            return self._timings[0]
+        else:
+            return None
+
+    def get_forces_at(self, timings:np.ndarray, kernel_size:int = 5):
+        '''
+        Return the forces, given in N, interpolated at the given times,
+        given in seconds, from the readings not discarded yet, filtered
+        as the batches are. Times beyond the readings are given the
+        force of the nearest one, or NaN if there is none.
+
+        The timestamps of the readings are corrected as the ones of the
+        batches are, e.g. of the first load cell of a group, so that both
+        are in the same time base.
+        '''
+        import scipy.signal
+
+        timings = np.asarray(timings, dtype=float)
+        n_readings = min(len(self._readings), len(self._timings)) if self._readings is not None else 0
+        if n_readings == 0:
+            return np.full(timings.shape, np.nan)
+
+        # The readings not consumed as batches are fitted as they are interpolated
+        if self._clock_fit is None:
+            self._clock_fit = timebase.ClockFit(rate=constants.HX711_RATE)
+        first_idx = max(self._n_fitted - self._n_discarded, 0)
+        if n_readings > first_idx:
+            self._clock_fit.add(np.array(self._timings[first_idx:n_readings]))
+            self._n_fitted = self._n_discarded + n_readings
+        reading_timings = self._clock_fit.correct(np.array(self._timings[:n_readings]))
+
+        readings = np.array(self._readings[:n_readings], dtype=float)
+        if n_readings >= kernel_size:
+            readings = scipy.signal.medfilt(readings, kernel_size)
+
+        return np.interp(timings, reading_timings, self._get_forces(readings))
+
     def is_batch_ready(self, batch_index:int, batch_size:int = 15):
         if self._readings is not None:
-            if len(self._readings) - batch_index >= batch_size:
+            if self._n_discarded + len(self._readings) - batch_index >= batch_size:
                 return True
             else:
                 return False
         else:
             return False
 
+    @instrumentation.instrumented('loadcell.get_batch')
     def get_batch(self, batch_index:int, batch_size:int = 15, kernel_size:int = 5):
-        batch = np.array(self._readings[batch_index:batch_index + batch_size])
-        batch_timings = np.array(self._timings[batch_index:batch_index + batch_size])
+        import scipy.signal
+        import pandas as pd
+
+        start = batch_index - self._n_discarded
+        batch = np.array(self._readings[start:start + batch_size])
+        batch_timings = np.array(self._timings[start:start + batch_size])
+        # Readings set other than by start_reading(), e.g. by the benchmarks, are fitted as well
+        if self._clock_fit is None:
+            self._clock_fit = timebase.ClockFit(rate=constants.HX711_RATE)
+        batch_indexes = self._clock_fit.add(batch_timings)
+        self._n_fitted = batch_index + len(batch_timings)
+        if self._clock_fit.is_locked():
+            batch_timings = self._clock_fit.get_timings(batch_indexes)
+        if self._read_at is not None:
+            # The batch is ready since its last reading. Readings consumed by the test
+            # loop are not followed to the motor commands: the chain from a reading to
+            # the PWM being turned off is measured through the watchdog only, from its trip
+            instrumentation.record('latency.sample_to_batch', time.perf_counter_ns() - self._read_at[start + batch_size - 1])
         batch_index += batch_size
         
         batch_median = median(batch)
@@ -196,8 +722,7 @@ class LoadCell():
         
         batch = scipy.signal.medfilt(batch, kernel_size)
 
-        batch = self._slope * batch + self._y_intercept
-        batch = (batch / 1000) * scipy_constants.g - self.get_offset(is_force=True)
-        batch = pd.DataFrame({'t': batch_timings, 'F': batch})
+        batch = self._join_channels({'t': batch_timings, 'F': self._get_forces(batch)}, batch_timings, self._channel_timings, self._channel_readings)
+        batch = pd.DataFrame(self._join_sensors(batch, batch_timings))
 
         return batch, batch_index
\ No newline at end of file
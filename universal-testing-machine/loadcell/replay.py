@@ -0,0 +1,61 @@
+import numpy as np
+from backend.backend import clock
+
+class ReplaySource():
+    '''
+    Class replaying the raw readings of a recorded test, in place of
+    the HX711, as a sample source of a LoadCell.
+    '''
+    def __init__(self, path:str, speed:float = 1):
+        '''
+        Parameters
+        ----------
+        path : str
+            The CSV file of the recorded test. It must provide the
+            't' and 'readings' columns.
+        speed : float, default=1
+            The replay speed with respect to the recording. Samples are
+            paced on the backend clock, so that 1 replays in real time
+            and N replays N times faster. If 0, samples are replayed
+            as fast as possible.
+        '''
+        import pandas as pd
+
+        data = pd.read_csv(path, usecols=['t', 'readings']).dropna()
+        self._timings = data['t'].to_numpy(dtype=float)
+        self._readings = data['readings'].to_numpy(dtype=np.int64)
+        self._speed = speed
+        self._index = 0
+        self._started_at = None
+
+    def __len__(self):
+        return len(self._readings)
+
+    def is_exhausted(self):
+        '''
+        Return True once every recorded reading has been replayed.
+        '''
+        return self._index >= len(self._readings)
+
+    def _read(self):
+        '''
+        Return the next recorded reading, once it is due. When the
+        recording is over, False is returned as for an invalid reading.
+        '''
+        if self.is_exhausted():
+            clock.sleep(0.01)
+            return False
+
+        if self._started_at is None:
+            self._started_at = clock.time()
+
+        if self._speed > 0:
+            due_at = self._started_at + (self._timings[self._index] - self._timings[0]) / self._speed
+            delay = due_at - clock.time()
+            if delay > 0:
+                clock.sleep(delay)
+
+        reading = int(self._readings[self._index])
+        self._index += 1
+
+        return reading
@@ -0,0 +1,152 @@
+import math
+import threading
+
+class RunningStatistics():
+    '''
+    Class maintaining the statistics of a stream of values, updated in
+    constant time at each value (Welford), so that they can be read at
+    any time without scanning the values again.
+
+    Besides the count, mean, variance, min and max of all the values,
+    an exponentially weighted mean and variance follow the latest ones,
+    with a time constant, so that the current level and noise are
+    available as well as the drift from the mean.
+
+    Values far from the weighted mean, such as corrupted readings, can
+    be rejected before they are added, unless they are confirmed by the
+    following ones, as for a genuine change of the level: they are then
+    added as well, the first ones included.
+    '''
+    # The number of values added before any is rejected, so that the weighted variance has settled
+    MIN_VALUES = 10
+
+    def __init__(self, time_constant:float = 1, rejection_threshold:float = None, confirming_values:int = 2):
+        '''
+        Parameters
+        ----------
+        time_constant : float, default=1
+            The time constant of the exponentially weighted mean and
+            variance, given in seconds. The weights are computed from the
+            time elapsed between values, so that dropped values are
+            accounted for.
+        rejection_threshold : float, default=None
+            The distance from the weighted mean, as a multiple of the
+            weighted standard deviation, beyond which values are rejected.
+            If None, no value is rejected.
+        confirming_values : int, default=2
+            The number of consecutive values beyond the threshold after
+            which they are added, as a change of the level rather than
+            corrupted values.
+        '''
+        if time_constant <= 0:
+            raise ValueError('The time constant has to be positive. '
+                             'Received: {}'.format(time_constant))
+        if rejection_threshold is not None and rejection_threshold <= 0:
+            raise ValueError('The rejection threshold has to be positive. '
+                             'Received: {}'.format(rejection_threshold))
+
+        self._time_constant = time_constant
+        self._rejection_threshold = rejection_threshold
+        self._confirming_values = confirming_values
+        # Values are added by the acquisition thread and read by the others
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._n = 0
+            self._mean = 0
+            self._moment = 0
+            self._min = None
+            self._max = None
+            self._ewm = None
+            self._ewm_variance = 0
+            self._last_timing = None
+            self._n_outliers = 0
+            self._outliers = []
+            self._n_rejected = 0
+
+        return
+
+    def _is_outlier(self, value:float):
+        if self._rejection_threshold is None or self._n < self.MIN_VALUES or self._ewm_variance <= 0:
+            return False
+
+        return abs(value - self._ewm) > self._rejection_threshold * math.sqrt(self._ewm_variance)
+
+    def add(self, value:float, timing:float):
+        '''
+        Add a value, read at the given time, given in seconds, unless
+        it is rejected. Values beyond the threshold are kept apart until
+        they are confirmed, and added then, or rejected.
+        '''
+        with self._lock:
+            if self._is_outlier(value):
+                self._n_outliers += 1
+            else:
+                self._n_outliers = 0
+                self._n_rejected += len(self._outliers)
+                self._outliers = []
+
+            if 0 < self._n_outliers < self._confirming_values:
+                self._outliers.append((value, timing))
+            else:
+                # The values confirmed by this one are added first, in order
+                for outlier_value, outlier_timing in self._outliers:
+                    self._add(outlier_value, outlier_timing)
+                self._outliers = []
+                self._add(value, timing)
+
+        return
+
+    def _add(self, value:float, timing:float):
+        self._n += 1
+        delta = value - self._mean
+        self._mean += delta / self._n
+        self._moment += delta * (value - self._mean)
+
+        if self._n == 1:
+            self._min = value
+            self._max = value
+            self._ewm = value
+        else:
+            self._min = min(self._min, value)
+            self._max = max(self._max, value)
+
+            # West's update of the weighted mean and variance
+            alpha = 1 - math.exp(-max(timing - self._last_timing, 0) / self._time_constant)
+            delta = value - self._ewm
+            increment = alpha * delta
+            self._ewm += increment
+            self._ewm_variance = (1 - alpha) * (self._ewm_variance + delta * increment)
+        self._last_timing = timing
+
+        return
+
+    def get(self):
+        '''
+        Return the statistics of the values added so far.
+
+        Returns
+        -------
+        statistics : dict
+            The count, mean, variance (of the sample), min and max of all
+            the values, the exponentially weighted mean (ewm) and
+            variance (ewm_variance) of the latest ones, and the number of
+            rejected values. The values are None until enough values
+            are added. The values kept apart until they are confirmed
+            are not accounted for yet.
+        '''
+        with self._lock:
+            statistics = {
+                'count': self._n,
+                'mean': self._mean if self._n > 0 else None,
+                'variance': self._moment / (self._n - 1) if self._n > 1 else None,
+                'min': self._min,
+                'max': self._max,
+                'ewm': self._ewm,
+                'ewm_variance': self._ewm_variance if self._n > 1 else None,
+                'rejected': self._n_rejected
+            }
+
+        return statistics
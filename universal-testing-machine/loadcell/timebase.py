@@ -0,0 +1,372 @@
+import numpy as np
+
+# The readings the rate and phase are seeded from, together, before the fit is used
+MIN_READINGS = 128
+# The latest readings, from which the band of the delays is estimated and the lock is checked
+RECENT_READINGS = 64
+# The relative error of the expected rate, if given, and the periods searched within it
+PERIOD_TOLERANCE = 0.05
+PERIOD_STEPS = 200
+# The ratio of the latest readings given a conversion not after the previous one, above which
+# the fit is lost and seeded again from the following readings
+MAX_MISORDERED_RATIO = 0.02
+
+class ClockFit():
+    '''
+    Class reconstructing the time base of a load cell from the
+    timestamps of its readings.
+
+    The readings are converted by the ADC at a fixed rate, but they are
+    timestamped once read, with the scheduling jitter of the acquisition
+    thread on top. Each reading is given the index of its conversion, so
+    that dropped conversions are skipped, and the timestamps are regressed
+    against the indexes, streaming, to estimate the rate and phase of the
+    ADC.
+
+    The rate and phase are seeded from the first MIN_READINGS readings
+    together, whatever the size of the batches they are added in. Once
+    too many of the latest readings are given their conversions out of
+    order, the fit is lost and seeded again from the following readings.
+    '''
+    def __init__(self, rate:float = None, max_chunk_size:int = 256):
+        '''
+        Parameters
+        ----------
+        rate : float, default=None
+            The expected rate of the ADC, given in Hz, e.g. 10 or 80 for
+            the HX711, used to seed the fit only, so that the dropped
+            conversions are skipped from the start. If None, it is
+            estimated from the first readings, assuming none is dropped.
+        max_chunk_size : int, default=256
+            The maximum number of readings indexed at once, before the fit
+            is updated. Fewer are indexed while the fit is converging.
+        '''
+        self._period = 1 / rate if rate is not None else None
+        self._max_chunk_size = max_chunk_size
+
+        # Timestamps are taken relative to the first one, for the sake of precision
+        self._reference = None
+        self._n_seeds = 0
+        self._n_added = 0
+        self._seeded_from = 0
+        self._lost_at = 0
+        self._reset()
+
+    def _reset(self):
+        self._pending_timings = np.array([])
+        self._pending_from = None
+        self._last_index = -1
+        self._recent_indexes = np.array([], dtype=np.int64)
+        self._recent_timings = np.array([])
+        self._recent_misordered = np.array([], dtype=bool)
+
+        # Running means and co-moments of indexes and timestamps
+        self._n = 0
+        self._mean_index = 0
+        self._mean_timing = 0
+        self._index_moment = 0
+        self._cross_moment = 0
+        self._residual_moment = 0
+
+        return
+
+    def is_fitted(self):
+        return self._n >= MIN_READINGS and self._index_moment > 0
+
+    def is_locked(self):
+        '''
+        Return True if the fit can be used to correct the timestamps,
+        i.e. the readings are given their conversions in order. Otherwise,
+        the delays are too scattered for the time base to be reconstructed.
+        '''
+        return self.is_fitted() and not self._is_lost()
+
+    def _is_lost(self):
+        return np.count_nonzero(self._recent_misordered) > MAX_MISORDERED_RATIO * len(self._recent_misordered)
+
+    def get_n_seeds(self):
+        '''
+        Return the number of times the fit has been seeded, i.e. lost and
+        seeded again, plus one once it is first seeded.
+        '''
+        return self._n_seeds
+
+    def get_seeded_from(self):
+        '''
+        Return the number of readings added before the first one the
+        current fit was seeded from.
+        '''
+        return self._seeded_from
+
+    def get_max_chunk_size(self):
+        return self._max_chunk_size
+
+    def get_lost_at(self):
+        '''
+        Return the number of readings added when the fit was last lost.
+        '''
+        return self._lost_at
+
+    def get_rate(self):
+        '''
+        Return the estimated rate of the ADC, given in Hz.
+        '''
+        return 1 / self._get_period() if self._get_period() is not None else None
+
+    def get_jitter(self):
+        '''
+        Return the standard deviation of the timestamps
+        from the fit, given in seconds.
+        '''
+        return np.sqrt(self._residual_moment / self._n) if self._n > 0 else None
+
+    def _get_period(self):
+        if self.is_fitted():
+            return self._cross_moment / self._index_moment
+        else:
+            return self._period
+
+    def _get_phase(self):
+        return self._mean_timing - self._get_period() * self._mean_index
+
+    def add(self, timings:np.ndarray):
+        '''
+        Add the timestamps of the next readings, given in seconds,
+        updating the fit.
+
+        Returns
+        -------
+        indexes : ndarray
+            The index of the conversion of each reading.
+        '''
+        timings = np.asarray(timings, dtype=float)
+        if len(timings) == 0:
+            return np.array([], dtype=np.int64)
+
+        if self._reference is None:
+            self._reference = timings[0]
+        timings = timings - self._reference
+
+        indexes = np.empty(len(timings), dtype=np.int64)
+        start = 0
+        while start < len(timings):
+            # The first readings are fitted together, then the fit is updated more and more rarely
+            chunk_size = int(min(max(1, self._n // 8), self._max_chunk_size)) if self.is_fitted() else MIN_READINGS - len(self._pending_timings)
+            chunk = slice(start, start + chunk_size)
+            indexes[chunk] = self._add_chunk(timings[chunk])
+            start = start + chunk_size
+
+        return indexes
+
+    def _add_chunk(self, timings:np.ndarray):
+        n_readings = len(timings)
+        if not self.is_fitted():
+            # The readings are kept until enough of them seed the fit, given provisional indexes meanwhile
+            if len(self._pending_timings) == 0:
+                self._pending_from = self._n_added
+            self._pending_timings = np.concatenate([self._pending_timings, timings])
+            self._n_added = self._n_added + n_readings
+            if len(self._pending_timings) < MIN_READINGS:
+                return self._get_provisional_indexes(timings)
+
+            timings = self._pending_timings
+            self._pending_timings = np.array([])
+            if self._period is None:
+                # No conversion is assumed to be dropped among the first readings
+                indexes = np.arange(len(timings))
+            else:
+                period, middle = self._get_middle_phase(timings)
+                indexes = np.rint((timings - middle) / period).astype(np.int64)
+            self._n_seeds = self._n_seeds + 1
+            self._seeded_from = self._pending_from
+        else:
+            indexes = self.get_indexes(timings)
+            self._n_added = self._n_added + n_readings
+        is_misordered = np.diff(indexes, prepend=self._last_index) <= 0
+        self._last_index = int(indexes[-1])
+
+        self._update(indexes, timings)
+
+        self._recent_indexes = np.concatenate([self._recent_indexes, indexes])[-RECENT_READINGS:]
+        self._recent_timings = np.concatenate([self._recent_timings, timings])[-RECENT_READINGS:]
+        self._recent_misordered = np.concatenate([self._recent_misordered, is_misordered])[-RECENT_READINGS:]
+
+        if self._is_lost():
+            self._lost_at = self._n_added
+            self._reset()
+
+        return indexes[-n_readings:]
+
+    def _get_provisional_indexes(self, timings:np.ndarray):
+        if self._period is not None:
+            return np.rint(timings / self._period).astype(np.int64)
+        else:
+            return np.arange(len(self._pending_timings) - len(timings), len(self._pending_timings))
+
+    def get_indexes(self, timings:np.ndarray):
+        '''
+        Return the index of the conversion of each of the given timestamps,
+        given in seconds relative to the first one added, according to the
+        current fit.
+        '''
+        # Readings are late by less than a period, as a newer conversion replaces an unread one:
+        # each one is given the conversion it is closest to, once the middle of the delays is removed
+        return np.rint((timings - self._get_phase() - self._get_middle_residual()) / self._get_period()).astype(np.int64)
+
+    def correct(self, timings:np.ndarray):
+        '''
+        Return the given timestamps, given in seconds, as the timestamps
+        of their conversions according to the current fit, or as they
+        are if the fit is not locked.
+        '''
+        timings = np.asarray(timings, dtype=float)
+        if not self.is_locked() or len(timings) == 0:
+            return timings
+
+        return self.get_timings(self.get_indexes(timings - self._reference))
+
+    def _get_middle_phase(self, timings:np.ndarray):
+        '''
+        Return the period, and the middle of the band of the delays, given
+        in seconds, searched for among the periods within PERIOD_TOLERANCE
+        of the expected one: at the right period, the phases of the readings
+        so far leave the widest gap, and the band is the arc left by it.
+        '''
+        timings = np.concatenate([self._recent_timings, timings])
+        # Sorted by their distance from the expected period, which is preferred on ties
+        deviations = np.linspace(0, PERIOD_TOLERANCE, PERIOD_STEPS // 2 + 1)
+        deviations = np.stack([deviations, -deviations], axis=1).ravel()[1:]
+        periods = self._period * (1 + deviations)
+
+        phases = np.sort(np.mod(timings[np.newaxis, :], periods[:, np.newaxis]) / periods[:, np.newaxis], axis=1)
+        gaps = np.concatenate([np.diff(phases, axis=1), phases[:, :1] + 1 - phases[:, -1:]], axis=1)
+        widest_idxs = np.argmax(gaps, axis=1)
+        best_idx = np.argmax(gaps[np.arange(len(periods)), widest_idxs])
+
+        phases = phases[best_idx]
+        widest_idx = widest_idxs[best_idx]
+        if widest_idx == len(phases) - 1:
+            middle = (phases[0] + phases[-1]) / 2
+        else:
+            middle = (phases[widest_idx + 1] + phases[widest_idx] + 1) / 2
+
+        return periods[best_idx], middle * periods[best_idx]
+
+    def _get_middle_residual(self):
+        '''
+        Return the middle of the band of the latest residuals. Unlike
+        their mean, it is not biased by a tail of delayed readings, and the
+        second extremes are robust to a reading given the wrong conversion.
+        '''
+        residuals = self._recent_timings - (self._get_phase() + self._get_period() * self._recent_indexes)
+        if len(residuals) < 4:
+            return 0
+
+        residuals = np.partition(residuals, [1, len(residuals) - 2])
+
+        return (residuals[1] + residuals[-2]) / 2
+
+    def _update(self, indexes:np.ndarray, timings:np.ndarray):
+        '''
+        Merge the means and co-moments of a chunk into the running ones
+        (Chan et al.), so that the fit is exact at any length.
+        '''
+        n = len(indexes)
+        if n == 0:
+            return
+
+        mean_index = np.mean(indexes)
+        mean_timing = np.mean(timings)
+        index_moment = np.sum((indexes - mean_index) ** 2)
+        cross_moment = np.sum((indexes - mean_index) * (timings - mean_timing))
+
+        total = self._n + n
+        delta_index = mean_index - self._mean_index
+        delta_timing = mean_timing - self._mean_timing
+        self._index_moment = self._index_moment + index_moment + delta_index ** 2 * self._n * n / total
+        self._cross_moment = self._cross_moment + cross_moment + delta_index * delta_timing * self._n * n / total
+        self._mean_index = self._mean_index + delta_index * n / total
+        self._mean_timing = self._mean_timing + delta_timing * n / total
+        self._n = total
+
+        if self.is_fitted():
+            residuals = timings - (self._get_phase() + self._get_period() * indexes)
+            self._residual_moment = self._residual_moment + np.sum(residuals ** 2)
+
+        return
+
+    def get_timings(self, indexes:np.ndarray):
+        '''
+        Return the timestamps of the given conversions, given
+        in seconds, according to the current fit.
+        '''
+        indexes = np.asarray(indexes, dtype=float)
+        if not self.is_fitted():
+            raise ValueError('The clock cannot be fitted to less than {} readings. '
+                             'Received: {}'.format(MIN_READINGS, self._n))
+
+        return self._reference + self._get_phase() + self._get_period() * indexes
+
+def fit(timings:np.ndarray, rate:float = None):
+    '''
+    Fit the time base to all the timestamps of a reading session at once.
+
+    Returns
+    -------
+    indexes : ndarray
+        The index of the conversion of each reading.
+    corrected_timings : ndarray
+        The corrected timestamps, on the final fit since it was last
+        seeded, given in seconds, or the original ones if the fit is not
+        locked. The readings before are fitted apart.
+    clock_fit : ClockFit
+        The fitted clock.
+    '''
+    timings = np.asarray(timings, dtype=float)
+    clock_fit = ClockFit(rate=rate)
+    if len(timings) == 0:
+        return np.array([], dtype=np.int64), timings, clock_fit
+
+    indexes = clock_fit.add(timings)
+
+    seeded_from = clock_fit.get_seeded_from()
+    if clock_fit.is_locked() and np.count_nonzero(np.diff(indexes[seeded_from:]) <= 0) <= MAX_MISORDERED_RATIO * len(indexes[seeded_from:]):
+        n_unfitted = seeded_from
+        corrected_timings = clock_fit.get_timings(indexes[seeded_from:])
+    else:
+        n_unfitted = len(timings)
+        corrected_timings = np.array([])
+
+    if clock_fit.get_lost_at() > 0:
+        # The readings before the fit was lost, but for the ones possibly given their
+        # conversions out of order by then, are fitted apart, the others are left as they are
+        n_previous = max(clock_fit.get_lost_at() - RECENT_READINGS - clock_fit.get_max_chunk_size(), 0)
+        previous_indexes, previous_timings, _ = fit(timings[:n_previous], rate=rate)
+        indexes = np.concatenate([previous_indexes, indexes[n_previous:]])
+        corrected_timings = np.concatenate([previous_timings, timings[n_previous:n_unfitted], corrected_timings])
+    else:
+        corrected_timings = np.concatenate([timings[:n_unfitted], corrected_timings])
+
+    return indexes, corrected_timings, clock_fit
+
+def resample(timings:np.ndarray, values:np.ndarray, rate:float):
+    '''
+    Resample the values onto a uniform grid at the given rate, given in Hz,
+    spanning the same interval as the timestamps, by linear interpolation.
+
+    Returns
+    -------
+    uniform_timings : ndarray
+        The timestamps of the grid, given in seconds.
+    uniform_values : ndarray
+        The values at the timestamps of the grid.
+    '''
+    timings = np.asarray(timings, dtype=float)
+    if len(timings) == 0:
+        return timings, np.asarray(values, dtype=float)
+
+    n_samples = int(np.floor((timings[-1] - timings[0]) * rate)) + 1
+    uniform_timings = timings[0] + np.arange(n_samples) / rate
+    uniform_values = np.interp(uniform_timings, timings, np.asarray(values, dtype=float))
+
+    return uniform_timings, uniform_values
@@ -0,0 +1,187 @@
+import threading
+import constants
+from instrumentation import instrumentation
+
+OVERLOAD = 'overload'
+FAILURE = 'failure'
+
+class Watchdog():
+    '''
+    Class watching the raw readings of a load cell, as they are
+    acquired, for an overload or a failure of the specimen.
+
+    The thresholds are converted to raw counts once, according to the
+    calibration, so that each reading is checked with a few comparisons.
+    '''
+    def __init__(self, calibration:dict, force_offset:float, on_trip, overload_ratio:float = 1, failure_ratio:float = 0.5, min_peak_ratio:float = 0.1, confirming_readings:int = 2):
+        '''
+        Parameters
+        ----------
+        calibration : dict
+            The load cell calibration, as returned by LoadCell.get_calibration().
+        force_offset : float
+            The force read when no specimen is clamped, given in N.
+        on_trip : callable
+            The function called, with the reason (OVERLOAD or FAILURE),
+            from the acquisition thread the first time the watchdog trips.
+        overload_ratio : float, default=1
+            The force tripping the watchdog for overload, as a
+            ratio of the load cell limit.
+        failure_ratio : float, default=0.5
+            The drop of the force from its peak tripping the watchdog
+            for failure, as a ratio of the peak.
+        min_peak_ratio : float, default=0.1
+            The peak force, as a ratio of the load cell limit, below
+            which failures are not detected, so that the noise at no
+            load is not mistaken for a failure.
+        confirming_readings : int, default=2
+            The number of consecutive readings beyond a threshold
+            required to trip, so that a single corrupted reading
+            is not mistaken for an overload or a failure.
+        '''
+        slope = calibration['slope']
+        y_intercept = calibration['y_intercept']
+        limit = calibration['loadcell_limit']['value']
+        if slope == 0:
+            raise ValueError('The calibration slope has to be non-zero. '
+                             'Received: {}'.format(slope))
+
+        def _get_counts(force:float):
+            return (((force + force_offset) / constants.STANDARD_GRAVITY) * 1000 - y_intercept) / slope
+
+        # Loads are compared as counts from the zero-force reading, growing with the force
+        self._sign = 1 if slope > 0 else -1
+        self._zero_counts = _get_counts(0)
+        self._counts_per_newton = abs(_get_counts(1) - self._zero_counts)
+        self._overload_counts = overload_ratio * limit * self._counts_per_newton
+        self._min_peak_counts = min_peak_ratio * limit * self._counts_per_newton
+        self._failure_ratio = failure_ratio
+        self._confirming_readings = confirming_readings
+        self._on_trip = on_trip
+
+        self._peak_counts = 0
+        self._n_overload_readings = 0
+        self._n_failure_readings = 0
+        self._last_load = 0
+        self._is_failure_armed = True
+        self.reason = None
+
+    def is_tripped(self):
+        return self.reason is not None
+
+    def get_peak_force(self):
+        '''
+        Return the peak force read so far, given in N.
+        '''
+        return self._peak_counts / self._counts_per_newton
+
+    def set_failure_armed(self, is_armed:bool):
+        '''
+        Arm or disarm the detection of failures, so that the planned
+        unloading segments of a cyclic test are not mistaken for one.
+        Once armed again, the drop is measured from the peak reached
+        since then. Overloads are always detected.
+        '''
+        if is_armed and not self._is_failure_armed:
+            self._peak_counts = 0
+            self._n_failure_readings = 0
+        self._is_failure_armed = is_armed
+
+        return
+
+    def check(self, reading:int):
+        '''
+        Check a raw reading, tripping the watchdog on an overload
+        or on a failure of the specimen.
+        '''
+        if self.reason is not None:
+            return
+
+        load = self._sign * (reading - self._zero_counts)
+        if load >= self._overload_counts:
+            self._n_overload_readings += 1
+            self._n_failure_readings = 0
+            if self._n_overload_readings >= self._confirming_readings:
+                self._trip(OVERLOAD)
+            return
+
+        self._n_overload_readings = 0
+        if self._is_failure_armed and self._peak_counts >= self._min_peak_counts and load <= self._peak_counts * (1 - self._failure_ratio):
+            self._n_failure_readings += 1
+            if self._n_failure_readings >= self._confirming_readings:
+                self._trip(FAILURE)
+        else:
+            self._n_failure_readings = 0
+            # The peak is updated once the previous reading is confirmed not to be corrupted
+            self._peak_counts = max(self._peak_counts, min(load, self._last_load))
+
+        self._last_load = load
+
+        return
+
+    def _trip(self, reason:str):
+        self.reason = reason
+        instrumentation.mark('watchdog.' + reason)
+        instrumentation.trigger(reason)
+        self._on_trip(reason)
+
+        return
+
+class WatchdogGroup():
+    '''
+    Class gathering the watchdogs of the load cells of a LoadCellGroup,
+    each one checking the readings of its own load cell against its
+    own limit. The test is stopped once, when the first one trips.
+    '''
+    def __init__(self, calibrations:list, force_offsets:list, on_trip, **kwargs):
+        '''
+        Parameters
+        ----------
+        calibrations : list
+            The calibration of each load cell, as returned by LoadCell.get_calibration().
+        force_offsets : list
+            The force read by each load cell when no specimen is clamped, given in N.
+        on_trip : callable
+            The function called, with the reason (OVERLOAD or FAILURE),
+            the first time one of the watchdogs trips.
+        **kwargs
+            The thresholds of the watchdogs, as taken by Watchdog.
+        '''
+        self._on_trip = on_trip
+        self._is_tripped = False
+        self._lock = threading.Lock()
+        self.watchdogs = [Watchdog(calibration, force_offset, on_trip=self._trip, **kwargs) for calibration, force_offset in zip(calibrations, force_offsets)]
+
+    @property
+    def reason(self):
+        for watchdog in self.watchdogs:
+            if watchdog.reason is not None:
+                return watchdog.reason
+
+        return None
+
+    def is_tripped(self):
+        return self.reason is not None
+
+    def set_failure_armed(self, is_armed:bool):
+        for watchdog in self.watchdogs:
+            watchdog.set_failure_armed(is_armed)
+
+        return
+
+    def get_peak_force(self):
+        '''
+        Return the sum of the peak forces read so far by each load cell, given in N.
+        '''
+        return sum(watchdog.get_peak_force() for watchdog in self.watchdogs)
+
+    def _trip(self, reason:str):
+        # The watchdogs are checked by different acquisition threads
+        with self._lock:
+            is_first_trip = not self._is_tripped
+            self._is_tripped = True
+
+        if is_first_trip:
+            self._on_trip(reason)
+
+        return
@@ -0,0 +1,278 @@
+import threading
+import numpy as np
+from backend.backend import clock
+
+INTERPOLATE = 'interpolate'
+ASOF = 'asof'
+
+class SensorStream():
+    '''
+    Class buffering the timestamped values of a sensor, such as an
+    optical encoder or a video extensometer, acquired independently
+    of the load cell.
+
+    The latest values are kept in a ring buffer of fixed capacity, as
+    numpy arrays, so that they are joined onto the timestamps of the
+    readings of the load cell without any conversion.
+    '''
+    def __init__(self, name:str, capacity:int = 65536, unit:str = None):
+        '''
+        Parameters
+        ----------
+        name : str
+            The name of the stream, used as the column of the joined values.
+        capacity : int, default=65536
+            The number of values kept, the oldest being overwritten.
+        unit : str, default=None
+            The unit of the values, e.g. 'mm'.
+        '''
+        if capacity <= 0:
+            raise ValueError('The capacity of a sensor stream has to be positive. '
+                             'Received: {}'.format(capacity))
+
+        self.name = name
+        self.unit = unit
+        self._capacity = capacity
+
+        # Values are added by the acquisition thread of the sensor and read by the test loop
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._timestamps = np.empty(self._capacity)
+            self._values = np.empty(self._capacity)
+            self._n = 0
+
+        return
+
+    def __len__(self):
+        return min(self._n, self._capacity)
+
+    def add(self, timestamp:float, value:float):
+        '''
+        Add a value, read at the given time, given in seconds.
+        Timestamps are expected in increasing order.
+        '''
+        with self._lock:
+            idx = self._n % self._capacity
+            self._timestamps[idx] = timestamp
+            self._values[idx] = value
+            self._n += 1
+
+        return
+
+    def add_many(self, timestamps:np.ndarray, values:np.ndarray):
+        '''
+        Add an array of values, read at the given times, given in seconds,
+        e.g. the frames of a video extensometer processed at once.
+        '''
+        timestamps = np.asarray(timestamps, dtype=float)[-self._capacity:]
+        values = np.asarray(values, dtype=float)[-self._capacity:]
+
+        with self._lock:
+            idxs = (self._n + np.arange(len(timestamps))) % self._capacity
+            self._timestamps[idxs] = timestamps
+            self._values[idxs] = values
+            self._n += len(timestamps)
+
+        return
+
+    def get(self, since:float = None, until:float = None):
+        '''
+        Return the timestamps and the values kept, in chronological order,
+        optionally restricted to the given interval, given in seconds.
+        '''
+        with self._lock:
+            if self._n <= self._capacity:
+                segments = [slice(0, self._n)]
+            else:
+                # The oldest value is the next one to be overwritten
+                start = self._n % self._capacity
+                segments = [slice(start, self._capacity), slice(0, start)]
+
+            # Each segment is sorted, so only the values in the interval are copied
+            timestamps = []
+            values = []
+            for segment in segments:
+                segment_timestamps = self._timestamps[segment]
+                first_idx = np.searchsorted(segment_timestamps, since, side='left') if since is not None else 0
+                last_idx = np.searchsorted(segment_timestamps, until, side='right') if until is not None else len(segment_timestamps)
+                timestamps.append(segment_timestamps[first_idx:last_idx])
+                values.append(self._values[segment][first_idx:last_idx])
+            timestamps = np.concatenate(timestamps)
+            values = np.concatenate(values)
+
+        return timestamps, values
+
+class SensorPoller():
+    '''
+    Class acquiring a SensorStream by polling a sensor at a given
+    rate, on a thread of its own, timestamping each value with the
+    clock of the backend as the load cell does.
+    '''
+    def __init__(self, stream:SensorStream, read, rate:float):
+        '''
+        Parameters
+        ----------
+        stream : SensorStream
+            The stream the values are added to.
+        read : callable
+            The function returning the current value of the sensor,
+            or None if no new value is available.
+        rate : float
+            The polling rate, given in Hz.
+        '''
+        self.stream = stream
+        self._read = read
+        self._period = 1 / rate
+        self._is_polling = False
+        self._thread = None
+
+    def start(self):
+        self._is_polling = True
+        self._thread = threading.Thread(target=self._poll, name='sensor.' + self.stream.name, daemon=True)
+        self._thread.start()
+
+        return
+
+    def stop(self):
+        self._is_polling = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        return
+
+    def _poll(self):
+        next_poll = clock.time()
+        while self._is_polling:
+            value = self._read()
+            if value is not None:
+                self.stream.add(clock.time(), value)
+
+            next_poll = next_poll + self._period
+            clock.sleep(max(next_poll - clock.time(), 0))
+
+        return
+
+class SensorHub():
+    '''
+    Class joining the streams of the auxiliary sensors onto the
+    timeline of the load cell.
+
+    Each stream is joined either by linear interpolation, for sensors
+    sampling a continuous quantity, or as of the latest value, for
+    sensors reporting discrete events or counts.
+    '''
+    def __init__(self):
+        self._streams = {}
+
+    def add_stream(self, stream:SensorStream, method:str = INTERPOLATE, tolerance:float = None):
+        '''
+        Parameters
+        ----------
+        stream : SensorStream
+            The stream to join, as a column named after it.
+        method : str, default=INTERPOLATE
+            INTERPOLATE or ASOF.
+        tolerance : float, default=None
+            The maximum time, given in seconds, between a timestamp and
+            the values joined onto it. Farther timestamps are given NaN.
+        '''
+        if method not in [INTERPOLATE, ASOF]:
+            raise ValueError('The join method has to be "{}" or "{}". '
+                             'Received: {}'.format(INTERPOLATE, ASOF, method))
+
+        self._streams[stream.name] = (stream, method, tolerance)
+
+        return
+
+    def remove_stream(self, name:str):
+        self._streams.pop(name, None)
+
+        return
+
+    def get_stream(self, name:str):
+        return self._streams[name][0]
+
+    def get_names(self):
+        return list(self._streams.keys())
+
+    def align(self, timestamps:np.ndarray, values:dict = None):
+        '''
+        Join every stream onto the given timestamps, given in seconds
+        and in increasing order.
+
+        Parameters
+        ----------
+        timestamps : ndarray
+            The timestamps to join the streams onto.
+        values : dict, default=None
+            The timestamps and the values of some of the streams, by name,
+            as pairs of arrays, joined in place of the ones kept by the
+            streams, e.g. once paged back in from disk.
+
+        Returns
+        -------
+        channels : dict
+            The joined values of each stream, by name, as arrays as long as
+            the timestamps, with NaN where no value could be joined.
+        '''
+        timestamps = np.asarray(timestamps, dtype=float)
+
+        channels = {}
+        for name, (stream, method, tolerance) in self._streams.items():
+            if len(timestamps) > 0:
+                margin = tolerance if tolerance is not None else np.inf
+                if values is not None and name in values:
+                    stream_timestamps, stream_values = values[name]
+                else:
+                    stream_timestamps, stream_values = stream.get(since=timestamps[0] - margin, until=timestamps[-1] + margin)
+                if method == INTERPOLATE:
+                    channels[name] = interpolate(timestamps, stream_timestamps, stream_values, tolerance=tolerance)
+                else:
+                    channels[name] = join_asof(timestamps, stream_timestamps, stream_values, tolerance=tolerance)
+            else:
+                channels[name] = np.array([])
+
+        return channels
+
+def interpolate(timestamps:np.ndarray, stream_timestamps:np.ndarray, values:np.ndarray, tolerance:float = None):
+    '''
+    Linearly interpolate the values of a stream onto the given timestamps.
+    Timestamps outside of the stream, or farther than the tolerance,
+    given in seconds, from both of the values around them, are given NaN.
+    '''
+    timestamps = np.asarray(timestamps, dtype=float)
+    if len(stream_timestamps) == 0:
+        return np.full(timestamps.shape, np.nan)
+
+    joined = np.interp(timestamps, stream_timestamps, values, left=np.nan, right=np.nan)
+    if tolerance is not None:
+        next_idxs = np.clip(np.searchsorted(stream_timestamps, timestamps, side='left'), 0, len(stream_timestamps) - 1)
+        previous_idxs = np.clip(next_idxs - 1, 0, len(stream_timestamps) - 1)
+        distances = np.minimum(np.abs(stream_timestamps[next_idxs] - timestamps), np.abs(timestamps - stream_timestamps[previous_idxs]))
+        joined[distances > tolerance] = np.nan
+
+    return joined
+
+def join_asof(timestamps:np.ndarray, stream_timestamps:np.ndarray, values:np.ndarray, tolerance:float = None):
+    '''
+    Join the latest value of a stream at or before each of the given
+    timestamps. Timestamps before the stream, or later than the
+    tolerance, given in seconds, after the latest value, are given NaN.
+    '''
+    timestamps = np.asarray(timestamps, dtype=float)
+    if len(stream_timestamps) == 0:
+        return np.full(timestamps.shape, np.nan)
+
+    previous_idxs = np.searchsorted(stream_timestamps, timestamps, side='right') - 1
+    is_joined = previous_idxs >= 0
+    if tolerance is not None:
+        is_joined &= timestamps - stream_timestamps[np.maximum(previous_idxs, 0)] <= tolerance
+
+    joined = np.full(timestamps.shape, np.nan)
+    joined[is_joined] = np.asarray(values, dtype=float)[previous_idxs[is_joined]]
+
+    return joined
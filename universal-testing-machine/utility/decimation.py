@@ -0,0 +1,101 @@
+import numpy as np
+
+class LogTimeDecimator():
+    '''
+    Class storing a signal with a sample density decaying
+    logarithmically with the time elapsed since the start, or since
+    the last significant change of the signal.
+
+    Samples are grouped into buckets whose width is a fixed ratio of
+    the elapsed time, so that the number of buckets grows with the
+    logarithm of the duration. Until the width is shorter than the
+    sampling period, each sample gets its own bucket, i.e. early
+    transients are stored at full resolution. For each bucket, the
+    mean time and the mean, min and max of the signal are stored.
+    '''
+    def __init__(self, ratio:float = 0.001, change_threshold:float = None):
+        '''
+        Parameters
+        ----------
+        ratio : float, default=0.001
+            The width of each bucket as a ratio of the time elapsed
+            when it starts.
+        change_threshold : float, default=None
+            The deviation of a sample from the mean of the current
+            bucket restarting the elapsed time, back to full resolution.
+            If None, the elapsed time is measured from the first sample.
+        '''
+        self._ratio = ratio
+        self._change_threshold = change_threshold
+        self._reference_t = None
+
+        # Current bucket
+        self._n = 0
+        self._t_sum = 0
+        self._x_sum = 0
+        self._x_min = None
+        self._x_max = None
+        self._ends_at = None
+
+        self._buckets = {'t': [], 'F': [], 'F_min': [], 'F_max': [], 'n': []}
+
+    def __len__(self):
+        return len(self._buckets['t']) + (1 if self._n > 0 else 0)
+
+    def _close_bucket(self):
+        if self._n > 0:
+            self._buckets['t'].append(self._t_sum / self._n)
+            self._buckets['F'].append(self._x_sum / self._n)
+            self._buckets['F_min'].append(self._x_min)
+            self._buckets['F_max'].append(self._x_max)
+            self._buckets['n'].append(self._n)
+
+        self._n = 0
+        self._t_sum = 0
+        self._x_sum = 0
+        self._x_min = None
+        self._x_max = None
+        self._ends_at = None
+
+        return
+
+    def add(self, timings:np.ndarray, values:np.ndarray):
+        '''
+        Add a batch of samples, in chronological order.
+        '''
+        for t, x in zip(timings, values):
+            if self._reference_t is None:
+                self._reference_t = t
+
+            if self._n > 0:
+                if self._change_threshold is not None and abs(x - self._x_sum / self._n) > self._change_threshold:
+                    self._close_bucket()
+                    self._reference_t = t
+                elif t >= self._ends_at:
+                    self._close_bucket()
+
+            if self._n == 0:
+                self._ends_at = t + self._ratio * (t - self._reference_t)
+                self._x_min = x
+                self._x_max = x
+
+            self._n += 1
+            self._t_sum += t
+            self._x_sum += x
+            if x < self._x_min:
+                self._x_min = x
+            elif x > self._x_max:
+                self._x_max = x
+
+        return
+
+    def get_data(self):
+        '''
+        Return the stored buckets as a DataFrame with columns
+        't', 'F' (mean), 'F_min', 'F_max' and 'n' (number of samples).
+        '''
+        import pandas as pd
+
+        self._close_bucket()
+
+        return pd.DataFrame(self._buckets)
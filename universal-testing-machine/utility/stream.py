@@ -0,0 +1,95 @@
+import os
+import numpy as np
+
+class BatchWriter():
+    '''
+    Class appending the batches consumed by a test loop to a CSV file,
+    so that results are stored while the test is still running.
+    '''
+    def __init__(self, path:str):
+        '''
+        Parameters
+        ----------
+        path : str
+            The path of the CSV file to write. If it already exists,
+            it is overwritten.
+        '''
+        self._path = path
+        self._file = None
+        self._columns = None
+
+    def write(self, batch):
+        '''
+        Append a batch to the file.
+
+        Parameters
+        ----------
+        batch : DataFrame
+            The batch to append. Every batch is expected to have
+            the same columns as the first one.
+        '''
+        if self._file is None:
+            self._file = open(self._path, 'w', newline='')
+            self._columns = list(batch.columns)
+            batch.to_csv(self._file, index=False)
+        else:
+            batch.to_csv(self._file, index=False, header=False, columns=self._columns)
+
+        return
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+        return
+
+class SpillFile():
+    '''
+    Class spilling timed readings to a binary file, so that they
+    are not kept in memory, and reading them back at once.
+    '''
+    def __init__(self, path:str, dtype = np.int64):
+        '''
+        Parameters
+        ----------
+        path : str
+            The path of the binary file to write. If it already
+            exists, it is overwritten.
+        dtype : data-type, default=np.int64
+            The type of the readings, e.g. np.float64 for the values
+            of a sensor stream.
+        '''
+        self._dtype = np.dtype([('t', np.float64), ('readings', dtype)])
+        self._path = path
+        self._file = open(path, 'wb')
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def write(self, timings:list, readings:list):
+        records = np.empty(len(readings), dtype=self._dtype)
+        records['t'] = timings
+        records['readings'] = readings
+        records.tofile(self._file)
+        self._length += len(records)
+
+        return
+
+    def read(self):
+        '''
+        Return the timings and the readings written so far.
+        '''
+        self._file.flush()
+        records = np.fromfile(self._path, dtype=self._dtype, count=self._length)
+
+        return records['t'], records['readings']
+
+    def remove(self):
+        self._file.close()
+        os.remove(self._path)
+
+        return